@@ -38,6 +38,7 @@ from cryptography.fernet import InvalidToken
 # AWX
 from awx.api.filters import FieldLookupBackend
 from awx.main.models import *  # noqa
+from awx.main.models.rbac import reset_rbac_generation
 from awx.main.access import access_registry
 from awx.main.utils import * # noqa
 from awx.main.utils.db import get_all_field_names
@@ -180,6 +181,14 @@ class APIView(views.APIView):
             self.__init_request_error__ = exc
         return drf_request
 
+    def perform_authentication(self, request):
+        # the RBAC generation is read from the database once a request
+        reset_rbac_generation()
+        super(APIView, self).perform_authentication(request)
+        # role changes this user made in an earlier request are visible
+        # to this one, whether or not they have been applied in the background
+        Role.apply_pending_ancestry_changes(request.user)
+
     def finalize_response(self, request, response, *args, **kwargs):
         '''
         Log warning for 400 requests.  Add header with elapsed time.
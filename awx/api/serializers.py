@@ -703,7 +703,8 @@ class UnifiedJobSerializer(BaseSerializer):
         fields = ('*', 'unified_job_template', 'launch_type', 'status',
                   'failed', 'started', 'finished', 'elapsed', 'job_args',
                   'job_cwd', 'job_env', 'job_explanation', 'execution_node',
-                  'result_traceback', 'event_processing_finished')
+                  'result_traceback', 'event_processing_finished',
+                  'emitted_events', 'saved_events', 'phase_timing', 'resource_usage')
         extra_kwargs = {
             'unified_job_template': {
                 'source': 'unified_job_template_id',
@@ -793,13 +794,16 @@ class UnifiedJobSerializer(BaseSerializer):
 class UnifiedJobListSerializer(UnifiedJobSerializer):
 
     class Meta:
-        fields = ('*', '-job_args', '-job_cwd', '-job_env', '-result_traceback', '-event_processing_finished')
+        fields = ('*', '-job_args', '-job_cwd', '-job_env', '-result_traceback', '-event_processing_finished',
+                  '-emitted_events', '-saved_events', '-phase_timing', '-resource_usage')
 
     def get_field_names(self, declared_fields, info):
         field_names = super(UnifiedJobListSerializer, self).get_field_names(declared_fields, info)
         # Meta multiple inheritance and -field_name options don't seem to be
         # taking effect above, so remove the undesired fields here.
-        return tuple(x for x in field_names if x not in ('job_args', 'job_cwd', 'job_env', 'result_traceback', 'event_processing_finished'))
+        return tuple(x for x in field_names if x not in ('job_args', 'job_cwd', 'job_env', 'result_traceback', 'event_processing_finished',
+                                                         'emitted_events', 'saved_events', 'phase_timing',
+                                                         'resource_usage'))
 
     def get_types(self):
         if type(self) is UnifiedJobListSerializer:
@@ -3560,7 +3564,8 @@ class WorkflowJobSerializer(LabelsListMixin, UnifiedJobSerializer):
     class Meta:
         model = WorkflowJob
         fields = ('*', 'workflow_job_template', 'extra_vars', 'allow_simultaneous',
-                  '-execution_node', '-event_processing_finished',)
+                  '-execution_node', '-event_processing_finished', '-emitted_events', '-saved_events',
+                  '-phase_timing', '-resource_usage',)
 
     def get_related(self, obj):
         res = super(WorkflowJobSerializer, self).get_related(obj)
@@ -4292,6 +4297,28 @@ class JobLaunchSerializer(BaseSerializer):
         return accepted
 
 
+class JobTemplateBulkLaunchSerializer(serializers.Serializer):
+
+    launches = serializers.ListField(
+        child=serializers.DictField(),
+        help_text=_("Launches to make, each the `job_template` id to launch and "
+                    "the same data a POST to its launch endpoint accepts.")
+    )
+
+    def validate_launches(self, value):
+        if not value:
+            raise serializers.ValidationError(_('At least one launch is required.'))
+        if len(value) > settings.BULK_JOB_LAUNCH_MAX:
+            raise serializers.ValidationError(
+                _('No more than %d launches may be made at once.') % settings.BULK_JOB_LAUNCH_MAX
+            )
+        for launch in value:
+            job_template = launch.get('job_template')
+            if isinstance(job_template, bool) or not isinstance(job_template, six.integer_types):
+                raise serializers.ValidationError(_('Each launch must include an integer job_template.'))
+        return value
+
+
 class WorkflowJobLaunchSerializer(BaseSerializer):
 
     can_start_without_user_input = serializers.BooleanField(read_only=True)
@@ -4571,7 +4598,7 @@ class InstanceSerializer(BaseSerializer):
         read_only_fields = ('uuid', 'hostname', 'version')
         fields = ("id", "type", "url", "related", "uuid", "hostname", "created", "modified", 'capacity_adjustment',
                   "version", "capacity", "consumed_capacity", "percent_capacity_remaining", "jobs_running",
-                  "cpu", "memory", "cpu_capacity", "mem_capacity", "enabled")
+                  "cpu", "memory", "cpu_capacity", "mem_capacity", "load", "enabled")
 
     def get_related(self, obj):
         res = super(InstanceSerializer, self).get_related(obj)
@@ -24,6 +24,7 @@ from awx.api.views import (
     HostAnsibleFactsDetail,
     JobCredentialsList,
     JobExtraCredentialsList,
+    JobTemplateBulkLaunch,
     JobTemplateCredentialsList,
     JobTemplateExtraCredentialsList,
     SchedulePreview,
@@ -122,6 +123,7 @@ v2_urls = [
     url(r'^hosts/(?P<pk>[0-9]+)/ansible_facts/$', HostAnsibleFactsDetail.as_view(), name='host_ansible_facts_detail'),
     url(r'^jobs/(?P<pk>[0-9]+)/extra_credentials/$', JobExtraCredentialsList.as_view(), name='job_extra_credentials_list'),
     url(r'^jobs/(?P<pk>[0-9]+)/credentials/$', JobCredentialsList.as_view(), name='job_credentials_list'),
+    url(r'^job_templates/bulk_launch/$', JobTemplateBulkLaunch.as_view(), name='job_template_bulk_launch'),
     url(r'^job_templates/(?P<pk>[0-9]+)/extra_credentials/$', JobTemplateExtraCredentialsList.as_view(), name='job_template_extra_credentials_list'),
     url(r'^job_templates/(?P<pk>[0-9]+)/credentials/$', JobTemplateCredentialsList.as_view(), name='job_template_credentials_list'),
     url(r'^schedules/preview/$', SchedulePreview.as_view(), name='schedule_rrule'),
@@ -17,9 +17,10 @@ import six
 
 # Django
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import FieldError, ObjectDoesNotExist
 from django.db.models import Q, Count, F
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import smart_text
 from django.utils.safestring import mark_safe
@@ -90,7 +91,7 @@ from awx.api.renderers import * # noqa
 from awx.api.serializers import * # noqa
 from awx.api.metadata import RoleMetadata, JobTypeMetadata
 from awx.main.constants import ACTIVE_STATES
-from awx.main.scheduler.tasks import run_job_complete
+from awx.main.scheduler.tasks import run_job_complete, run_task_manager
 from awx.api.exceptions import ActiveJobConflict
 
 logger = logging.getLogger('awx.api.views')
@@ -167,6 +168,18 @@ class UnifiedJobDeletionMixin(object):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class UnifiedJobEventsMixin(object):
+    '''
+    List the events of a job with its event queryset, which only scans the
+    partitions of a partitioned event table its events can be in.
+    '''
+    def get_queryset(self):
+        parent = self.get_parent_object()
+        self.check_parent_access(parent)
+        qs = self.request.user.get_queryset(self.model).distinct()
+        return qs & parent.get_event_queryset().distinct()
+
+
 class InstanceGroupMembershipMixin(object):
     '''
     Manages signaling celery to reload its queue configuration on Instance Group membership changes
@@ -465,96 +478,76 @@ class DashboardView(APIView):
 
     def get(self, request, format=None):
         ''' Show Dashboard Details '''
+        key = 'awx_dashboard_{}_{}'.format(request.version, request.user.pk)
+        data = cache.get(key)
+        if data is None:
+            data = self.get_dashboard_data(request)
+            cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+        return Response(data)
+
+    def get_dashboard_data(self, request):
+        counts = None
+        if request.user.is_superuser or request.user.is_system_auditor:
+            counts = DashboardAggregate.totals()
+        if counts is None:
+            counts = dashboard_counts(lambda model: get_user_queryset(request.user, model))
+
         data = OrderedDict()
         data['related'] = {'jobs_graph': reverse('api:dashboard_jobs_graph_view', request=request)}
-        user_inventory = get_user_queryset(request.user, Inventory)
-        inventory_with_failed_hosts = user_inventory.filter(hosts_with_active_failures__gt=0)
-        user_inventory_external = user_inventory.filter(has_inventory_sources=True)
-        failed_inventory = sum(i.inventory_sources_with_failures for i in user_inventory)
         data['inventories'] = {'url': reverse('api:inventory_list', request=request),
-                               'total': user_inventory.count(),
-                               'total_with_inventory_source': user_inventory_external.count(),
-                               'job_failed': inventory_with_failed_hosts.count(),
-                               'inventory_failed': failed_inventory}
-        user_inventory_sources = get_user_queryset(request.user, InventorySource)
-        ec2_inventory_sources = user_inventory_sources.filter(source='ec2')
-        ec2_inventory_failed = ec2_inventory_sources.filter(status='failed')
+                               'total': counts['inventories'],
+                               'total_with_inventory_source': counts['inventories_with_inventory_source'],
+                               'job_failed': counts['inventories_job_failed'],
+                               'inventory_failed': counts['inventories_inventory_failed']}
         data['inventory_sources'] = {}
         data['inventory_sources']['ec2'] = {'url': reverse('api:inventory_source_list', request=request) + "?source=ec2",
                                             'failures_url': reverse('api:inventory_source_list', request=request) + "?source=ec2&status=failed",
                                             'label': 'Amazon EC2',
-                                            'total': ec2_inventory_sources.count(),
-                                            'failed': ec2_inventory_failed.count()}
+                                            'total': counts['ec2_inventory_sources'],
+                                            'failed': counts['ec2_inventory_sources_failed']}
 
-        user_groups = get_user_queryset(request.user, Group)
-        groups_job_failed = (Group.objects.filter(hosts_with_active_failures__gt=0) | Group.objects.filter(groups_with_active_failures__gt=0)).count()
-        groups_inventory_failed = Group.objects.filter(inventory_sources__last_job_failed=True).count()
         data['groups'] = {'url': reverse('api:group_list', request=request),
                           'failures_url': reverse('api:group_list', request=request) + "?has_active_failures=True",
-                          'total': user_groups.count(),
-                          'job_failed': groups_job_failed,
-                          'inventory_failed': groups_inventory_failed}
+                          'total': counts['groups'],
+                          'job_failed': counts['groups_job_failed'],
+                          'inventory_failed': counts['groups_inventory_failed']}
 
-        user_hosts = get_user_queryset(request.user, Host)
-        user_hosts_failed = user_hosts.filter(has_active_failures=True)
         data['hosts'] = {'url': reverse('api:host_list', request=request),
                          'failures_url': reverse('api:host_list', request=request) + "?has_active_failures=True",
-                         'total': user_hosts.count(),
-                         'failed': user_hosts_failed.count()}
+                         'total': counts['hosts'],
+                         'failed': counts['hosts_failed']}
 
-        user_projects = get_user_queryset(request.user, Project)
-        user_projects_failed = user_projects.filter(last_job_failed=True)
         data['projects'] = {'url': reverse('api:project_list', request=request),
                             'failures_url': reverse('api:project_list', request=request) + "?last_job_failed=True",
-                            'total': user_projects.count(),
-                            'failed': user_projects_failed.count()}
-
-        git_projects = user_projects.filter(scm_type='git')
-        git_failed_projects = git_projects.filter(last_job_failed=True)
-        svn_projects = user_projects.filter(scm_type='svn')
-        svn_failed_projects = svn_projects.filter(last_job_failed=True)
-        hg_projects = user_projects.filter(scm_type='hg')
-        hg_failed_projects = hg_projects.filter(last_job_failed=True)
+                            'total': counts['projects'],
+                            'failed': counts['projects_failed']}
+
         data['scm_types'] = {}
-        data['scm_types']['git'] = {'url': reverse('api:project_list', request=request) + "?scm_type=git",
-                                    'label': 'Git',
-                                    'failures_url': reverse('api:project_list', request=request) + "?scm_type=git&last_job_failed=True",
-                                    'total': git_projects.count(),
-                                    'failed': git_failed_projects.count()}
-        data['scm_types']['svn'] = {'url': reverse('api:project_list', request=request) + "?scm_type=svn",
-                                    'label': 'Subversion',
-                                    'failures_url': reverse('api:project_list', request=request) + "?scm_type=svn&last_job_failed=True",
-                                    'total': svn_projects.count(),
-                                    'failed': svn_failed_projects.count()}
-        data['scm_types']['hg'] = {'url': reverse('api:project_list', request=request) + "?scm_type=hg",
-                                   'label': 'Mercurial',
-                                   'failures_url': reverse('api:project_list', request=request) + "?scm_type=hg&last_job_failed=True",
-                                   'total': hg_projects.count(),
-                                   'failed': hg_failed_projects.count()}
-
-        user_jobs = get_user_queryset(request.user, Job)
-        user_failed_jobs = user_jobs.filter(failed=True)
+        for scm_type, label in (('git', 'Git'), ('svn', 'Subversion'), ('hg', 'Mercurial')):
+            data['scm_types'][scm_type] = {
+                'url': reverse('api:project_list', request=request) + "?scm_type=" + scm_type,
+                'label': label,
+                'failures_url': reverse('api:project_list', request=request) + "?scm_type=" + scm_type + "&last_job_failed=True",
+                'total': counts[scm_type + '_projects'],
+                'failed': counts[scm_type + '_projects_failed'],
+            }
+
         data['jobs'] = {'url': reverse('api:job_list', request=request),
                         'failure_url': reverse('api:job_list', request=request) + "?failed=True",
-                        'total': user_jobs.count(),
-                        'failed': user_failed_jobs.count()}
-
-        user_list = get_user_queryset(request.user, User)
-        team_list = get_user_queryset(request.user, Team)
-        credential_list = get_user_queryset(request.user, Credential)
-        job_template_list = get_user_queryset(request.user, JobTemplate)
-        organization_list = get_user_queryset(request.user, Organization)
+                        'total': counts['jobs'],
+                        'failed': counts['jobs_failed']}
+
         data['users'] = {'url': reverse('api:user_list', request=request),
-                         'total': user_list.count()}
+                         'total': counts['users']}
         data['organizations'] = {'url': reverse('api:organization_list', request=request),
-                                 'total': organization_list.count()}
+                                 'total': counts['organizations']}
         data['teams'] = {'url': reverse('api:team_list', request=request),
-                         'total': team_list.count()}
+                         'total': counts['teams']}
         data['credentials'] = {'url': reverse('api:credential_list', request=request),
-                               'total': credential_list.count()}
+                               'total': counts['credentials']}
         data['job_templates'] = {'url': reverse('api:job_template_list', request=request),
-                                 'total': job_template_list.count()}
-        return Response(data)
+                                 'total': counts['job_templates']}
+        return data
 
 
 class DashboardJobsGraphView(APIView):
@@ -566,7 +559,36 @@ class DashboardJobsGraphView(APIView):
         period = request.query_params.get('period', 'month')
         job_type = request.query_params.get('job_type', 'all')
 
-        user_unified_jobs = get_user_queryset(request.user, UnifiedJob)
+        start_date = now()
+        if period == 'month':
+            end_date = start_date - dateutil.relativedelta.relativedelta(months=1)
+            interval = 'days'
+        elif period == 'week':
+            end_date = start_date - dateutil.relativedelta.relativedelta(weeks=1)
+            interval = 'days'
+        elif period == 'day':
+            end_date = start_date - dateutil.relativedelta.relativedelta(days=1)
+            interval = 'hours'
+        else:
+            return Response({'error': _('Unknown period "%s"') % str(period)}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = 'awx_dashboard_jobs_graph_{}_{}_{}'.format(request.user.pk, period, job_type)
+        dashboard_data = cache.get(key)
+        if dashboard_data is None:
+            if request.user.is_superuser or request.user.is_system_auditor:
+                series = JobOutcomeRollup.time_series(end_date, start_date, interval, job_type=job_type)
+            else:
+                series = self.get_time_series(request.user, end_date, start_date, interval, job_type)
+            dashboard_data = {"jobs": {"successful": [], "failed": []}}
+            for outcome in ('successful', 'failed'):
+                for element in series[outcome]:
+                    dashboard_data['jobs'][outcome].append([time.mktime(element[0].timetuple()),
+                                                            element[1]])
+            cache.set(key, dashboard_data, settings.DASHBOARD_CACHE_TIMEOUT)
+        return Response(dashboard_data)
+
+    def get_time_series(self, user, start, end, interval, job_type):
+        user_unified_jobs = get_user_queryset(user, UnifiedJob)
 
         success_query = user_unified_jobs.filter(status='successful')
         failed_query = user_unified_jobs.filter(status='failed')
@@ -583,28 +605,10 @@ class DashboardJobsGraphView(APIView):
 
         success_qss = qsstats.QuerySetStats(success_query, 'finished')
         failed_qss = qsstats.QuerySetStats(failed_query, 'finished')
-
-        start_date = now()
-        if period == 'month':
-            end_date = start_date - dateutil.relativedelta.relativedelta(months=1)
-            interval = 'days'
-        elif period == 'week':
-            end_date = start_date - dateutil.relativedelta.relativedelta(weeks=1)
-            interval = 'days'
-        elif period == 'day':
-            end_date = start_date - dateutil.relativedelta.relativedelta(days=1)
-            interval = 'hours'
-        else:
-            return Response({'error': _('Unknown period "%s"') % str(period)}, status=status.HTTP_400_BAD_REQUEST)
-
-        dashboard_data = {"jobs": {"successful": [], "failed": []}}
-        for element in success_qss.time_series(end_date, start_date, interval=interval):
-            dashboard_data['jobs']['successful'].append([time.mktime(element[0].timetuple()),
-                                                         element[1]])
-        for element in failed_qss.time_series(end_date, start_date, interval=interval):
-            dashboard_data['jobs']['failed'].append([time.mktime(element[0].timetuple()),
-                                                     element[1]])
-        return Response(dashboard_data)
+        return {
+            'successful': success_qss.time_series(start, end, interval=interval),
+            'failed': failed_qss.time_series(start, end, interval=interval),
+        }
 
 
 class InstanceList(ListAPIView):
@@ -1418,7 +1422,7 @@ class ProjectUpdateDetail(UnifiedJobDeletionMixin, RetrieveDestroyAPIView):
     serializer_class = ProjectUpdateSerializer
 
 
-class ProjectUpdateEventsList(SubListAPIView):
+class ProjectUpdateEventsList(UnifiedJobEventsMixin, SubListAPIView):
 
     model = ProjectUpdateEvent
     serializer_class = ProjectUpdateEventSerializer
@@ -1432,7 +1436,7 @@ class ProjectUpdateEventsList(SubListAPIView):
         return super(ProjectUpdateEventsList, self).finalize_response(request, response, *args, **kwargs)
 
 
-class SystemJobEventsList(SubListAPIView):
+class SystemJobEventsList(UnifiedJobEventsMixin, SubListAPIView):
 
     model = SystemJobEvent
     serializer_class = SystemJobEventSerializer
@@ -1446,7 +1450,7 @@ class SystemJobEventsList(SubListAPIView):
         return super(SystemJobEventsList, self).finalize_response(request, response, *args, **kwargs)
 
 
-class InventoryUpdateEventsList(SubListAPIView):
+class InventoryUpdateEventsList(UnifiedJobEventsMixin, SubListAPIView):
 
     model = InventoryUpdateEvent
     serializer_class = InventoryUpdateEventSerializer
@@ -2958,44 +2962,7 @@ class JobTemplateDetail(RelatedJobsPreventDeleteMixin, RetrieveUpdateDestroyAPIV
     always_allow_superuser = False
 
 
-class JobTemplateLaunch(RetrieveAPIView):
-
-    model = JobTemplate
-    obj_permission_type = 'start'
-    metadata_class = JobTypeMetadata
-    serializer_class = JobLaunchSerializer
-    always_allow_superuser = False
-
-    def update_raw_data(self, data):
-        try:
-            obj = self.get_object()
-        except PermissionDenied:
-            return data
-        extra_vars = data.pop('extra_vars', None) or {}
-        if obj:
-            needed_passwords = obj.passwords_needed_to_start
-            if needed_passwords:
-                data['credential_passwords'] = {}
-                for p in needed_passwords:
-                    data['credential_passwords'][p] = u''
-            else:
-                data.pop('credential_passwords')
-            for v in obj.variables_needed_to_start:
-                extra_vars.setdefault(v, u'')
-            if extra_vars:
-                data['extra_vars'] = extra_vars
-            modified_ask_mapping = JobTemplate.get_ask_mapping()
-            modified_ask_mapping.pop('extra_vars')
-            for field, ask_field_name in modified_ask_mapping.items():
-                if not getattr(obj, ask_field_name):
-                    data.pop(field, None)
-                elif field == 'inventory':
-                    data[field] = getattrd(obj, "%s.%s" % (field, 'id'), None)
-                elif field == 'credentials':
-                    data[field] = [cred.id for cred in obj.credentials.all()]
-                else:
-                    data[field] = getattr(obj, field)
-        return data
+class JobTemplateLaunchMixin(object):
 
     def modernize_launch_payload(self, data, obj):
         '''
@@ -3075,6 +3042,68 @@ class JobTemplateLaunch(RetrieveAPIView):
 
         return (modern_data, ignored_fields)
 
+    def sanitize_for_response(self, data):
+        '''
+        Model objects cannot be serialized by DRF,
+        this replaces objects with their ids for inclusion in response
+        '''
+
+        def display_value(val):
+            if hasattr(val, 'id'):
+                return val.id
+            else:
+                return val
+
+        sanitized_data = {}
+        for field_name, value in data.items():
+            if isinstance(value, (set, list)):
+                sanitized_data[field_name] = []
+                for sub_value in value:
+                    sanitized_data[field_name].append(display_value(sub_value))
+            else:
+                sanitized_data[field_name] = display_value(value)
+
+        return sanitized_data
+
+
+class JobTemplateLaunch(JobTemplateLaunchMixin, RetrieveAPIView):
+
+    model = JobTemplate
+    obj_permission_type = 'start'
+    metadata_class = JobTypeMetadata
+    serializer_class = JobLaunchSerializer
+    always_allow_superuser = False
+
+    def update_raw_data(self, data):
+        try:
+            obj = self.get_object()
+        except PermissionDenied:
+            return data
+        extra_vars = data.pop('extra_vars', None) or {}
+        if obj:
+            needed_passwords = obj.passwords_needed_to_start
+            if needed_passwords:
+                data['credential_passwords'] = {}
+                for p in needed_passwords:
+                    data['credential_passwords'][p] = u''
+            else:
+                data.pop('credential_passwords')
+            for v in obj.variables_needed_to_start:
+                extra_vars.setdefault(v, u'')
+            if extra_vars:
+                data['extra_vars'] = extra_vars
+            modified_ask_mapping = JobTemplate.get_ask_mapping()
+            modified_ask_mapping.pop('extra_vars')
+            for field, ask_field_name in modified_ask_mapping.items():
+                if not getattr(obj, ask_field_name):
+                    data.pop(field, None)
+                elif field == 'inventory':
+                    data[field] = getattrd(obj, "%s.%s" % (field, 'id'), None)
+                elif field == 'credentials':
+                    data[field] = [cred.id for cred in obj.credentials.all()]
+                else:
+                    data[field] = getattr(obj, field)
+        return data
 
     def post(self, request, *args, **kwargs):
         obj = self.get_object()
@@ -3111,28 +3140,99 @@ class JobTemplateLaunch(RetrieveAPIView):
             return Response(data, status=status.HTTP_201_CREATED)
 
 
-    def sanitize_for_response(self, data):
-        '''
-        Model objects cannot be serialized by DRF,
-        this replaces objects with their ids for inclusion in response
-        '''
+class JobTemplateBulkLaunch(JobTemplateLaunchMixin, GenericAPIView):
 
-        def display_value(val):
-            if hasattr(val, 'id'):
-                return val.id
-            else:
-                return val
+    model = JobTemplate
+    obj_permission_type = 'start'
+    serializer_class = JobTemplateBulkLaunchSerializer
+    always_allow_superuser = False
 
-        sanitized_data = {}
-        for field_name, value in data.items():
-            if isinstance(value, (set, list)):
-                sanitized_data[field_name] = []
-                for sub_value in value:
-                    sanitized_data[field_name].append(display_value(sub_value))
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        launches = serializer.validated_data['launches']
+
+        launches_by_template = OrderedDict()
+        for index, launch in enumerate(launches):
+            launches_by_template.setdefault(launch['job_template'], []).append(index)
+        templates = JobTemplate.objects.select_related('inventory', 'project').in_bulk(launches_by_template.keys())
+
+        results = [None] * len(launches)
+        launched = False
+        for pk, indexes in launches_by_template.items():
+            obj = templates.get(pk)
+            error = None
+            if obj is None or not request.user.can_access(JobTemplate, 'read', obj):
+                error = dict(status=status.HTTP_404_NOT_FOUND, errors={'detail': _('Not found.')})
             else:
-                sanitized_data[field_name] = display_value(value)
+                try:
+                    # also checks the license, and the features the template needs
+                    if not request.user.can_access(JobTemplate, 'start', obj):
+                        raise PermissionDenied()
+                except (PermissionDenied, LicenseForbids) as exc:
+                    error = dict(status=exc.status_code, errors={'detail': exc.detail})
+            if error:
+                for index in indexes:
+                    results[index] = error
+                continue
 
-        return sanitized_data
+            pending = []
+            launch_kwargs = []
+            prompts_allowed = {}
+            for index in indexes:
+                data = launches[index].copy()
+                data.pop('job_template')
+                obj._deprecated_credential_launch = False
+                try:
+                    modern_data, ignored_fields = self.modernize_launch_payload(data=data, obj=obj)
+                except ParseError as exc:
+                    results[index] = dict(status=status.HTTP_400_BAD_REQUEST, errors=exc.detail)
+                    continue
+
+                launch_serializer = JobLaunchSerializer(data=modern_data, context={'template': obj})
+                if not launch_serializer.is_valid():
+                    results[index] = dict(status=status.HTTP_400_BAD_REQUEST, errors=launch_serializer.errors)
+                    continue
+                ignored_fields.update(launch_serializer._ignored_fields)
+                validated_data = launch_serializer.validated_data
+
+                # launches prompting for the same inventory and credentials need the same access
+                prompts = (getattr(validated_data.get('inventory'), 'pk', None),
+                           frozenset(cred.pk for cred in validated_data.get('credentials', [])))
+                if prompts not in prompts_allowed:
+                    prompts_allowed[prompts] = request.user.can_access(
+                        JobLaunchConfig, 'add', validated_data, template=obj
+                    )
+                if not prompts_allowed[prompts]:
+                    results[index] = dict(status=status.HTTP_403_FORBIDDEN,
+                                          errors={'detail': PermissionDenied.default_detail})
+                    continue
+
+                passwords = validated_data.pop('credential_passwords', {})
+                validated_data['_deprecated_credential_launch'] = obj._deprecated_credential_launch
+                pending.append((index, passwords, ignored_fields))
+                launch_kwargs.append(validated_data)
+            obj._deprecated_credential_launch = False
+
+            new_jobs = obj.create_unified_jobs(launch_kwargs)
+            for (index, passwords, ignored_fields), new_job in zip(pending, new_jobs):
+                if new_job.mark_pending(**passwords):
+                    launched = True
+                    results[index] = OrderedDict([
+                        ('status', status.HTTP_201_CREATED),
+                        ('job', new_job.id),
+                        ('ignored_fields', self.sanitize_for_response(ignored_fields)),
+                    ])
+                else:
+                    results[index] = dict(status=status.HTTP_400_BAD_REQUEST,
+                                          errors=dict(passwords_needed_to_start=new_job.passwords_needed_to_start))
+                    new_job.delete()
+
+        if launched:
+            # one task manager run picks up every job launched above
+            connection.on_commit(lambda: run_task_manager.delay())
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
 
 class JobTemplateSchedulesList(SubListCreateAPIView):
@@ -4454,7 +4554,7 @@ class JobJobEventsList(BaseJobEventsList):
     def get_queryset(self):
         job = self.get_parent_object()
         self.check_parent_access(job)
-        qs = job.job_events
+        qs = job.get_event_queryset()
         qs = qs.select_related('host')
         qs = qs.prefetch_related('hosts', 'children')
         return qs.all()
@@ -4646,7 +4746,7 @@ class HostAdHocCommandEventsList(BaseAdHocCommandEventsList):
 #    parent_model = Group
 
 
-class AdHocCommandAdHocCommandEventsList(BaseAdHocCommandEventsList):
+class AdHocCommandAdHocCommandEventsList(UnifiedJobEventsMixin, BaseAdHocCommandEventsList):
 
     parent_model = AdHocCommand
 
@@ -1,12 +1,14 @@
 # Python
 from collections import namedtuple
 import contextlib
+import copy
 import logging
 import sys
 import threading
 import time
 import StringIO
 import traceback
+from uuid import uuid4
 
 import six
 
@@ -57,7 +59,15 @@ SETTING_CACHE_TIMEOUT = 60
 # Flag indicating whether to store field default values in the cache.
 SETTING_CACHE_DEFAULTS = True
 
-__all__ = ['SettingsWrapper', 'get_settings_to_cache', 'SETTING_CACHE_NOTSET']
+# Cache key holding the version of the database-backed settings.  Deleting it
+# (or letting it expire) discards every process's snapshot of setting values.
+SETTING_CACHE_VERSION_KEY = '_awx_conf_version'
+
+# Check the settings version at least this often (in seconds), in addition to
+# at the start of every request and task.
+SETTING_SNAPSHOT_TIMEOUT = 5
+
+__all__ = ['SettingsWrapper', 'get_settings_to_cache', 'SETTING_CACHE_NOTSET', 'SETTING_CACHE_VERSION_KEY']
 
 
 @contextlib.contextmanager
@@ -238,6 +248,8 @@ class SettingsWrapper(UserSettingsHolder):
         self.__dict__['_awx_conf_preload_expires'] = None
         self.__dict__['_awx_conf_preload_lock'] = threading.RLock()
         self.__dict__['_awx_conf_init_readonly'] = False
+        self.__dict__['_awx_conf_snapshot'] = (None, {})
+        self.__dict__['_awx_conf_snapshot_checked'] = threading.local()
         self.__dict__['cache'] = EncryptedCacheProxy(cache, registry)
         self.__dict__['registry'] = registry
 
@@ -388,6 +400,46 @@ class SettingsWrapper(UserSettingsHolder):
                     value, name, exc_info=True)
         return empty
 
+    def _get_version(self):
+        version = self.cache.cache.get(SETTING_CACHE_VERSION_KEY)
+        if version is None:
+            version = uuid4().hex
+            if not self.cache.cache.add(SETTING_CACHE_VERSION_KEY, version, timeout=SETTING_CACHE_TIMEOUT):
+                version = self.cache.cache.get(SETTING_CACHE_VERSION_KEY) or version
+        return version
+
+    def _get_snapshot(self):
+        """
+        Return the validated values of the database-backed settings read in
+        this process since the settings version last changed.  The version is
+        the only thing read from the cache, once per request or task (see
+        ``expire_snapshot``) or SETTING_SNAPSHOT_TIMEOUT.
+        """
+        version, snapshot = self._awx_conf_snapshot
+        checked = getattr(self._awx_conf_snapshot_checked, 'time', None)
+        if version is None or checked is None or checked + SETTING_SNAPSHOT_TIMEOUT < time.time():
+            current_version = self._get_version()
+            self._awx_conf_snapshot_checked.time = time.time()
+            if current_version != version:
+                snapshot = {}
+                self.__dict__['_awx_conf_snapshot'] = (current_version, snapshot)
+        return snapshot
+
+    def expire_snapshot(self):
+        """
+        Check the settings version again on the next read in this thread, so
+        that a new request or task sees settings changed since the last one.
+        """
+        self._awx_conf_snapshot_checked.time = None
+
+    def invalidate_snapshot(self):
+        """
+        Discard this process's snapshot, and (by deleting the version) the
+        snapshot of every process sharing the cache, when settings change.
+        """
+        self.cache.cache.delete(SETTING_CACHE_VERSION_KEY)
+        self.__dict__['_awx_conf_snapshot'] = (None, {})
+
     def _get_default(self, name):
         return getattr(self.default_settings, name)
 
@@ -399,7 +451,13 @@ class SettingsWrapper(UserSettingsHolder):
         value = empty
         if name in self.all_supported_settings:
             with _log_database_error():
-                value = self._get_local(name)
+                snapshot = self._get_snapshot()
+                if name not in snapshot:
+                    snapshot[name] = self._get_local(name)
+                value = snapshot[name]
+                if isinstance(value, (dict, list, set)):
+                    # callers may modify the value they're given
+                    value = copy.deepcopy(value)
         if value is not empty:
             return value
         return self._get_default(name)
@@ -31,6 +31,7 @@ def handle_setting_change(key, for_delete=False):
     # NOTE: This block is probably duplicated.
     cache_keys = set([Setting.get_cache_key(k) for k in setting_keys])
     cache.delete_many(cache_keys)
+    settings._awx_conf_settings.invalidate_snapshot()
 
     # Send setting_changed signal with new value for each setting.
     for setting_key in setting_keys:
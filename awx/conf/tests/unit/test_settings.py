@@ -15,7 +15,7 @@ import pytest
 import six
 
 from awx.conf import models, fields
-from awx.conf.settings import SettingsWrapper, EncryptedCacheProxy, SETTING_CACHE_NOTSET
+from awx.conf.settings import SettingsWrapper, EncryptedCacheProxy, SETTING_CACHE_NOTSET, SETTING_CACHE_VERSION_KEY
 from awx.conf.registry import SettingsRegistry
 
 from awx.main.utils import encrypt_field, decrypt_field
@@ -404,6 +404,61 @@ def test_settings_use_cache(settings, mocker):
     getattr(settings, 'AWX_VAR')
 
 
+def test_settings_snapshot(settings):
+    "setting values are only read from the cache when the settings version changes"
+    settings.registry.register(
+        'AWX_VAR',
+        field_class=fields.CharField,
+        category=_('System'),
+        category_slug='system'
+    )
+    settings.cache.set('AWX_VAR', 'foobar')
+    settings.cache.set('_awx_conf_preload_expires', 100)
+    assert settings.AWX_VAR == 'foobar'
+    version = settings.cache.get(SETTING_CACHE_VERSION_KEY)
+    assert version
+
+    settings.cache.set('AWX_VAR', 'changed')
+    assert settings.AWX_VAR == 'foobar'
+    settings._awx_conf_settings.expire_snapshot()
+    assert settings.AWX_VAR == 'foobar'
+
+    # another process changed the setting
+    settings.cache.delete(SETTING_CACHE_VERSION_KEY)
+    assert settings.AWX_VAR == 'foobar'
+    settings._awx_conf_settings.expire_snapshot()
+    assert settings.AWX_VAR == 'changed'
+    assert settings.cache.get(SETTING_CACHE_VERSION_KEY) != version
+
+
+def test_settings_snapshot_invalidated(settings):
+    settings.registry.register(
+        'AWX_VAR',
+        field_class=fields.CharField,
+        category=_('System'),
+        category_slug='system'
+    )
+    settings.cache.set('AWX_VAR', 'foobar')
+    settings.cache.set('_awx_conf_preload_expires', 100)
+    assert settings.AWX_VAR == 'foobar'
+    settings.cache.set('AWX_VAR', 'changed')
+    settings._awx_conf_settings.invalidate_snapshot()
+    assert settings.AWX_VAR == 'changed'
+
+
+def test_settings_snapshot_values_are_copies(settings):
+    settings.registry.register(
+        'AWX_LIST',
+        field_class=fields.StringListField,
+        category=_('System'),
+        category_slug='system'
+    )
+    settings.cache.set('AWX_LIST', ['a'])
+    settings.cache.set('_awx_conf_preload_expires', 100)
+    settings.AWX_LIST.append('b')
+    assert settings.AWX_LIST == ['a']
+
+
 def test_settings_use_an_encrypted_cache(settings, mocker):
     settings.registry.register(
         'AWX_ENCRYPTED',
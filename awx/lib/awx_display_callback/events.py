@@ -21,6 +21,7 @@ from __future__ import (absolute_import, division, print_function)
 import base64
 import contextlib
 import datetime
+import fcntl
 import json
 import multiprocessing
 import os
@@ -38,12 +39,20 @@ class IsolatedFileWrite:
     '''
     Stand-in class that will write partial event data to a file as a
     replacement for memcache when a job is running on an isolated host.
+
+    If `AWX_ISOLATED_EVENT_LOG` is set, every event is appended to that one
+    file as a newline-terminated `<length>:<json>` record, so the controller
+    can pull it incrementally; otherwise each event gets its own
+    `<uuid>-partial.json` file.
     '''
 
     def __init__(self):
         self.private_data_dir = os.getenv('AWX_ISOLATED_DATA_DIR')
+        self.event_log = os.getenv('AWX_ISOLATED_EVENT_LOG')
 
     def set(self, key, value):
+        if self.event_log:
+            return self.append(value)
         # Strip off the leading memcache key identifying characters :1:ev-
         event_uuid = key[len(':1:ev-'):]
         # Write data in a staging area and then atomic move to pickup directory
@@ -55,6 +64,18 @@ class IsolatedFileWrite:
             f.write(partial_data)
         os.rename(write_location, dropoff_location)
 
+    def append(self, value):
+        # json.dumps escapes non-ASCII characters, so len() counts bytes
+        partial_data = json.dumps(value)
+        record = '{}:{}\n'.format(len(partial_data), partial_data).encode('utf-8')
+        fd = os.open(self.event_log, os.O_WRONLY | os.O_CREAT | os.O_APPEND, stat.S_IRUSR | stat.S_IWUSR)
+        try:
+            # events are emitted from every fork; keep their records whole
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+
 
 class EventContext(object):
     '''
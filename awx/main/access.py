@@ -171,6 +171,8 @@ class BaseAccess(object):
     def __init__(self, user, save_messages=False):
         self.user = user
         self.save_messages = save_messages
+        # role changes made earlier in this request are visible to its checks
+        Role.apply_pending_ancestry_changes()
         if save_messages:
             self.messages = {}
 
@@ -1,8 +1,11 @@
 import base64
 import codecs
+import errno
+import fcntl
 import StringIO
 import json
 import os
+import re
 import shutil
 import stat
 import tempfile
@@ -26,7 +29,8 @@ class IsolatedManager(object):
     def __init__(self, args, cwd, env, stdout_handle, ssh_key_path,
                  expect_passwords={},  cancelled_callback=None, job_timeout=0,
                  idle_timeout=None, extra_update_fields=None,
-                 pexpect_timeout=5, proot_cmd='bwrap'):
+                 pexpect_timeout=5, proot_cmd='bwrap', raw_reads=False,
+                 resource_usage=None):
         """
         :param args:                a list of `subprocess.call`-style arguments
                                     representing a subprocess e.g.,
@@ -54,6 +58,11 @@ class IsolatedManager(object):
         :param pexpect_timeout      a timeout (in seconds) to wait on
                                     `pexpect.spawn().expect()` calls
         :param proot_cmd            the command used to isolate processes, `bwrap`
+        :param raw_reads            if True, the isolated host reads job output
+                                    straight from the pty (see `run.RawReader`)
+        :param resource_usage       a dict which is updated with what the job
+                                    consumed on the isolated host (see
+                                    `run.ResourceSampler`)
         """
         self.args = args
         self.cwd = cwd
@@ -68,6 +77,8 @@ class IsolatedManager(object):
         self.extra_update_fields = extra_update_fields
         self.pexpect_timeout = pexpect_timeout
         self.proot_cmd = proot_cmd
+        self.raw_reads = raw_reads
+        self.resource_usage = resource_usage
         self.started_at = None
 
     @staticmethod
@@ -137,7 +148,9 @@ class IsolatedManager(object):
             'ssh_key_data': None,
             'idle_timeout': self.idle_timeout,
             'job_timeout': self.job_timeout,
-            'pexpect_timeout': self.pexpect_timeout
+            'pexpect_timeout': self.pexpect_timeout,
+            'raw_reads': self.raw_reads,
+            'event_log': settings.AWX_ISOLATED_EVENT_LOG,
         }
 
         # if an ssh private key fifo exists, read its contents and delete it
@@ -274,6 +287,7 @@ class IsolatedManager(object):
         :param interval: an interval (in seconds) to wait between status polls
         """
         interval = interval if interval is not None else settings.AWX_ISOLATED_CHECK_INTERVAL
+        batched = settings.AWX_ISOLATED_BATCH_CHECKS
         extra_vars = {'src': self.private_data_dir}
         args = self._build_args('check_isolated.yml', '%s,' % self.host, extra_vars)
         if self.instance.verbosity:
@@ -303,18 +317,28 @@ class IsolatedManager(object):
                 time.sleep(1)
                 continue
 
-            buff = StringIO.StringIO()
-            logger.debug('Checking on isolated job {} with `check_isolated.yml`.'.format(self.instance.id))
-            status, rc = IsolatedManager.run_pexpect(
-                args, self.awx_playbook_path(), self.management_env, buff,
-                cancelled_callback=self.cancelled_callback,
-                idle_timeout=remaining,
-                job_timeout=remaining,
-                pexpect_timeout=5,
-                proot_cmd=self.proot_cmd
-            )
-            output = buff.getvalue().encode('utf-8')
-            playbook_logger.info('Isolated job {} check:\n{}'.format(self.instance.id, output))
+            if batched:
+                # every job on this host is polled by the same playbook run
+                logger.debug('Checking on isolated job {} with `check_isolated_batch.yml`.'.format(self.instance.id))
+                status, output = IsolatedStatusPoller(self.host).poll(
+                    self.instance.id, self.private_data_dir,
+                    timeout=remaining,
+                    cancelled_callback=self.cancelled_callback,
+                    verbosity=self.instance.verbosity
+                )
+            else:
+                buff = StringIO.StringIO()
+                logger.debug('Checking on isolated job {} with `check_isolated.yml`.'.format(self.instance.id))
+                status, rc = IsolatedManager.run_pexpect(
+                    args, self.awx_playbook_path(), self.management_env, buff,
+                    cancelled_callback=self.cancelled_callback,
+                    idle_timeout=remaining,
+                    job_timeout=remaining,
+                    pexpect_timeout=5,
+                    proot_cmd=self.proot_cmd
+                )
+                output = buff.getvalue().encode('utf-8')
+                playbook_logger.info('Isolated job {} check:\n{}'.format(self.instance.id, output))
 
             path = self.path_to('artifacts', 'stdout')
             if os.path.exists(path):
@@ -337,6 +361,10 @@ class IsolatedManager(object):
                     status = f.readline()
                 with open(rc_path, 'r') as f:
                     rc = int(f.readline())
+            usage_path = self.path_to('artifacts', 'resource_usage')
+            if isinstance(self.resource_usage, dict) and os.path.exists(usage_path):
+                with open(usage_path, 'r') as f:
+                    self.resource_usage.update(json.load(f))
         elif status == 'failed':
             # if we were unable to retrieve job reults from the isolated host,
             # print stdout of the `check_isolated.yml` playbook for clues
@@ -450,20 +478,25 @@ class IsolatedManager(object):
     @staticmethod
     def get_stdout_handle(instance, private_data_dir, event_data_key='job_id'):
         dispatcher = CallbackQueueDispatcher()
+        event_log = IsolatedEventLog(os.path.join(private_data_dir, run.ISOLATED_EVENT_LOG))
 
         def job_event_callback(event_data):
             event_data.setdefault(event_data_key, instance.id)
             if 'uuid' in event_data:
-                filename = '{}-partial.json'.format(event_data['uuid'])
-                partial_filename = os.path.join(private_data_dir, 'artifacts', 'job_events', filename)
-                try:
-                    with codecs.open(partial_filename, 'r', encoding='utf-8') as f:
-                        partial_event_data = json.load(f)
+                partial_event_data = event_log.pop(event_data['uuid'])
+                if partial_event_data is None:
+                    # fall back to the file-per-event format
+                    filename = '{}-partial.json'.format(event_data['uuid'])
+                    partial_filename = os.path.join(private_data_dir, 'artifacts', 'job_events', filename)
+                    try:
+                        with codecs.open(partial_filename, 'r', encoding='utf-8') as f:
+                            partial_event_data = json.load(f)
+                    except IOError:
+                        if event_data.get('event', '') != 'verbose':
+                            logger.error('Missing callback data for event type `{}`, uuid {}, job {}.\nevent_data: {}'.format(
+                                event_data.get('event', ''), event_data['uuid'], instance.id, event_data))
+                if partial_event_data is not None:
                     event_data.update(partial_event_data)
-                except IOError:
-                    if event_data.get('event', '') != 'verbose':
-                        logger.error('Missing callback data for event type `{}`, uuid {}, job {}.\nevent_data: {}'.format(
-                            event_data.get('event', ''), event_data['uuid'], instance.id, event_data))
             dispatcher.dispatch(event_data)
 
         return OutputEventFilter(job_event_callback)
@@ -497,3 +530,283 @@ class IsolatedManager(object):
             self.check()
         self.cleanup()
         return status, rc
+
+
+class IsolatedEventLog(object):
+    '''
+    Reads the partial event data that the display callback on an isolated
+    host appends to `run.ISOLATED_EVENT_LOG`, as newline-terminated
+    `<length>:<json>` records.
+
+    Each `read` picks up from the byte offset where the last one stopped, so
+    the log is only parsed once however often it is pulled back from the
+    isolated host; a record that was only partially copied is left for the
+    next read.  A corrupt record stops reading at the last good record
+    before it.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.events = {}
+        self.corrupt = False
+
+    def pop(self, event_uuid):
+        '''
+        Return (and forget) the partial data for an event, or None if it
+        hasn't been logged.
+        '''
+        if event_uuid not in self.events:
+            self.read()
+        return self.events.pop(event_uuid, None)
+
+    def read(self):
+        if self.corrupt:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except IOError:
+            return
+        pos = 0
+        while True:
+            sep = data.find(':', pos)
+            if sep == -1:
+                break
+            try:
+                length = int(data[pos:sep])
+                if length < 0:
+                    raise ValueError('negative record length {}'.format(length))
+                end = sep + 1 + length
+                if end >= len(data):
+                    break
+                if data[end] != '\n':
+                    raise ValueError('record is not newline-terminated')
+                partial_event_data = json.loads(data[sep + 1:end])
+                self.events[partial_event_data['uuid']] = partial_event_data
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning('Stopped reading corrupt isolated event log {} at byte {}: {}'.format(
+                    self.path, self.offset + pos, e))
+                self.corrupt = True
+                break
+            # skip the trailing newline
+            pos = end + 1
+        self.offset += pos
+
+
+class IsolatedStatusPoller(object):
+    '''
+    Checks on every job that this node is running on an isolated host with a
+    single `check_isolated_batch.yml` run, rather than one `ansible-playbook`
+    process (and SSH connection) per job.
+
+    Each job's `IsolatedManager.check` runs in its own worker process, so the
+    polls are coordinated through a spool directory per isolated host: a job
+    drops a request file naming its private data dir, and whichever process
+    holds the spool's lock checks on all outstanding requests at once and
+    writes a result file back for each of them.
+    '''
+
+    SPOOL_DIR_NAME = 'awx_isolated_check'
+
+    # the names of the tasks in `check_isolated_batch.yml`
+    IS_ALIVE_TASK = 'Determine if daemon processes are alive.'
+    ARTIFACTS_TASK = 'Copy artifacts from the isolated host.'
+
+    # how often (in seconds) a job waiting on another process' poll checks
+    # whether its result has been written
+    WAIT_INTERVAL = 0.25
+
+    # the most jobs checked on by one playbook run
+    BATCH_SIZE = 10
+
+    def __init__(self, host, spool_dir=None):
+        self.host = host
+        if spool_dir is None:
+            spool_dir = os.path.join(settings.AWX_PROOT_BASE_PATH, self.SPOOL_DIR_NAME,
+                                     re.sub(r'[^\w.-]', '_', host))
+        self.spool_dir = spool_dir
+
+    def path_to(self, *args):
+        return os.path.join(self.spool_dir, *args)
+
+    def poll(self, job_id, private_data_dir, timeout=0, cancelled_callback=None, verbosity=0):
+        '''
+        Check on a single job, sharing the playbook run with any other jobs
+        on the same host that are waiting to be checked.
+
+        Returns (status, output), where status is `successful` if the job has
+        finished and its artifacts have been copied back, `failed` if it is
+        still running (or the host could not be reached), and `canceled` if
+        `cancelled_callback` fired while waiting.
+
+        :param timeout: give up after this many seconds (0 waits forever)
+        :param verbosity: the verbosity of the job; a playbook run checking
+                          on several jobs is as verbose as the most verbose
+        '''
+        if not os.path.isdir(self.spool_dir):
+            try:
+                os.makedirs(self.spool_dir, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        request_path = self.path_to('{}.request'.format(job_id))
+        result_path = self.path_to('{}.result'.format(job_id))
+        self._remove(result_path)
+        self._write(request_path, {'src': private_data_dir, 'verbosity': verbosity or 0})
+        deadline = time.time() + timeout if timeout else None
+        try:
+            while True:
+                result = self._read(result_path)
+                if result is None and self._run_batch():
+                    result = self._read(result_path)
+                if result is not None:
+                    return result['status'], result['output']
+                if cancelled_callback and cancelled_callback():
+                    return 'canceled', ''
+                if deadline is not None and time.time() > deadline:
+                    return 'failed', 'Timed out waiting on the status of isolated host {}.\n'.format(self.host)
+                time.sleep(self.WAIT_INTERVAL)
+        finally:
+            self._remove(request_path)
+            self._remove(result_path)
+
+    def check(self, srcs, verbosity=0):
+        '''
+        Run `check_isolated_batch.yml` against the host for the given private
+        data dirs, at most BATCH_SIZE of them per run; returns a dict of
+        {src: (status, output)}.
+        '''
+        results = {}
+        for i in range(0, len(srcs), self.BATCH_SIZE):
+            results.update(self._check_batch(srcs[i:i + self.BATCH_SIZE], verbosity))
+        return results
+
+    def _check_batch(self, srcs, verbosity=0):
+        # not verbose, whatever the jobs' verbosity: ansible would print plain
+        # text in among the json
+        args = IsolatedManager._build_args('check_isolated_batch.yml', '%s,' % self.host, {'srcs': srcs})
+        env = IsolatedManager._base_management_env()
+        env['ANSIBLE_STDOUT_CALLBACK'] = 'json'
+
+        buff = StringIO.StringIO()
+        # the jobs' artifacts are copied one job after another, and the json
+        # callback prints nothing until the end, so allow as long for each
+        # job as a check of a single job gets
+        timeout = max(60, 2 * settings.AWX_ISOLATED_CONNECTION_TIMEOUT) * len(srcs)
+        IsolatedManager.run_pexpect(
+            args, IsolatedManager.awx_playbook_path(), env, buff,
+            idle_timeout=timeout, job_timeout=timeout,
+            pexpect_timeout=5
+        )
+        output = buff.getvalue().encode('utf-8')
+        buff.close()
+        log = playbook_logger.info if verbosity else playbook_logger.debug
+        log('Isolated host {} check of {} job(s):\n{}'.format(self.host, len(srcs), output))
+
+        try:
+            host_results = dict(
+                (task['task']['name'], task['hosts'].get(self.host, {}))
+                for task in self._read_json_output(output)['plays'][0]['tasks']
+            )
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            logger.warning('Failed to read status from isolated host {}, output:\n {}'.format(self.host, output))
+            return dict((src, ('failed', output)) for src in srcs)
+        return dict((src, self._job_status(host_results, src)) for src in srcs)
+
+    @staticmethod
+    def _read_json_output(output):
+        # the json callback's output, skipping any lines printed before it
+        # (such as warnings about the config file)
+        start = 0
+        if not output.startswith('{'):
+            start = output.find('\n{')
+            if start == -1:
+                raise ValueError('No JSON in the output')
+            start += 1
+        return json.JSONDecoder().raw_decode(output[start:])[0]
+
+    def _job_status(self, host_results, src):
+        # pick out the loop items that belong to this job; the later tasks
+        # loop over registered results, so their `item` is nested
+        items = {}
+        for name, host_result in host_results.items():
+            for item_result in host_result.get('results', []):
+                item = item_result.get('item')
+                while isinstance(item, dict):
+                    item = item.get('item')
+                if item == src:
+                    items[name] = item_result
+        output = json.dumps(items or host_results, indent=4)
+
+        is_alive = items.get(self.IS_ALIVE_TASK)
+        if is_alive is None or is_alive.get('rc') == 0:
+            # unreachable, or still running
+            return 'failed', output
+        if self.ARTIFACTS_TASK not in items or any(r.get('failed') for r in items.values() if r is not is_alive):
+            return 'failed', output
+        return 'successful', output
+
+    def _run_batch(self):
+        '''
+        If no other process is already polling the host, check on every
+        outstanding request and return True; otherwise return False.
+        '''
+        lock_fd = os.open(self.path_to('.lock'), os.O_RDONLY | os.O_CREAT, stat.S_IRUSR | stat.S_IWUSR)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as e:
+                if e.errno in (errno.EAGAIN, errno.EACCES):
+                    return False
+                raise
+            requests = self._pending_requests()
+            if requests:
+                results = self.check(sorted(set(request['src'] for request in requests.values())),
+                                     verbosity=max(request.get('verbosity', 0) for request in requests.values()))
+                for job_id, request in requests.items():
+                    status, output = results[request['src']]
+                    # the request goes first, so the job's next one isn't lost
+                    self._remove(self.path_to('{}.request'.format(job_id)))
+                    self._write(self.path_to('{}.result'.format(job_id)), {'status': status, 'output': output})
+            return True
+        finally:
+            # closing the descriptor releases the lock
+            os.close(lock_fd)
+
+    def _pending_requests(self):
+        requests = {}
+        for filename in os.listdir(self.spool_dir):
+            job_id, ext = os.path.splitext(filename)
+            if ext != '.request':
+                continue
+            request = self._read(self.path_to(filename))
+            if request is None:
+                continue
+            if not os.path.isdir(request['src']):
+                # the job is gone; its process died before cleaning up
+                self._remove(self.path_to(filename))
+                continue
+            requests[job_id] = request
+        return requests
+
+    def _read(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        # write and rename, so readers never see a partial file
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
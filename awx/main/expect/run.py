@@ -5,12 +5,15 @@ import base64
 import codecs
 import collections
 import cStringIO
+import errno
 import logging
 import json
 import os
 import stat
 import pipes
 import re
+import resource
+import select
 import signal
 import sys
 import thread
@@ -22,6 +25,21 @@ import psutil
 
 logger = logging.getLogger('awx.main.utils.expect')
 
+# the number of bytes requested per read() of the pty when `raw_reads` is set
+RAW_READ_SIZE = 65536
+
+# prompts are only searched for in this many trailing characters of output
+# (the same `searchwindowsize` used for `pexpect.spawn().expect()` calls)
+PROMPT_SEARCH_WINDOW = 100
+
+# the number of seconds between samples of a job's process tree
+RESOURCE_SAMPLE_INTERVAL = 5
+
+# where isolated jobs append their partial event data (relative to the
+# private data dir); this sorts after `artifacts/stdout`, so when both are
+# pulled back by rsync the log is never older than the stdout that refers to it
+ISOLATED_EVENT_LOG = os.path.join('artifacts', 'stdout_events')
+
 
 def args2cmdline(*args):
     return ' '.join([pipes.quote(a) for a in args])
@@ -54,7 +72,8 @@ def open_fifo_write(path, data):
 def run_pexpect(args, cwd, env, logfile,
                 cancelled_callback=None, expect_passwords={},
                 extra_update_fields=None, idle_timeout=None, job_timeout=0,
-                pexpect_timeout=5, proot_cmd='bwrap'):
+                pexpect_timeout=5, proot_cmd='bwrap', raw_reads=False,
+                resource_usage=None):
     '''
     Run the given command using pexpect to capture output and provide
     passwords when requested.
@@ -83,6 +102,13 @@ def run_pexpect(args, cwd, env, logfile,
     :param pexpect_timeout      a timeout (in seconds) to wait on
                                 `pexpect.spawn().expect()` calls
     :param proot_cmd            the command used to isolate processes, `bwrap`
+    :param raw_reads            if True, read output from the pty in large
+                                chunks and write it straight to `logfile`
+                                instead of buffering it through
+                                `pexpect.spawn().expect()`; see `RawReader`
+    :param resource_usage       a dict which is updated with what the process
+                                tree consumed once it exits; see
+                                `ResourceSampler`
 
     Returns a tuple (status, return_code) i.e., `('successful', 0)`
     '''
@@ -109,13 +135,26 @@ def run_pexpect(args, cwd, env, logfile,
     errored = False
     last_stdout_update = time.time()
 
+    raw_reader = RawReader(child, logfile, password_patterns) if raw_reads else None
+    sampler = ResourceSampler(child.pid) if isinstance(resource_usage, dict) else None
+    if sampler:
+        sampler.sample()
+
     job_start = time.time()
     while child.isalive():
-        result_id = child.expect(password_patterns, timeout=pexpect_timeout, searchwindowsize=100)
+        if raw_reader:
+            result_id = raw_reader.read(timeout=pexpect_timeout)
+        else:
+            result_id = child.expect(password_patterns, timeout=pexpect_timeout, searchwindowsize=100)
         password = password_values[result_id]
         if password is not None:
             child.sendline(password)
             last_stdout_update = time.time()
+        # give the logfile a chance to emit any output it is holding back
+        # while the process is quiet
+        logfile.flush()
+        if sampler:
+            sampler.sample()
         if cancelled_callback:
             try:
                 canceled = cancelled_callback()
@@ -135,6 +174,8 @@ def run_pexpect(args, cwd, env, logfile,
         if idle_timeout and (time.time() - last_stdout_update) > idle_timeout:
             child.close(True)
             canceled = True
+    if sampler:
+        resource_usage.update(sampler.finish())
     if errored:
         return 'error', child.exitstatus
     elif canceled:
@@ -145,7 +186,169 @@ def run_pexpect(args, cwd, env, logfile,
         return 'failed', child.exitstatus
 
 
-def run_isolated_job(private_data_dir, secrets, logfile=sys.stdout):
+def rss_high_water_mark(proc):
+    # the kernel keeps the peak RSS of each process it has seen (in kB)
+    try:
+        with open('/proc/{}/status'.format(proc.pid), 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError):
+        pass
+    return proc.memory_info().rss
+
+
+class ResourceSampler(object):
+    '''
+    Measures what the process tree rooted at `pid` consumes.
+
+    CPU time, block IO and peak memory come from `RUSAGE_CHILDREN`, which
+    accumulates every descendant as it is reaped; `peak_rss_bytes` is the
+    peak RSS of the largest process in the tree.  That peak is a high-water
+    mark for everything this process has ever run, though, so when it didn't
+    rise during the run (an earlier job had a larger process), the peak is
+    taken from the high-water marks of the processes sampled while the tree
+    was running instead.
+
+    The process counts come from walking the tree every `interval` seconds,
+    so processes that live for less than that may be missed; they are
+    reported as `approx_peak_processes` and `approx_processes`.
+    '''
+
+    # ru_maxrss is in bytes on macOS, kB elsewhere
+    MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+    def __init__(self, pid, interval=RESOURCE_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.last_sample = 0
+        self.sampled_peak_rss = 0
+        self.peak_processes = 0
+        self.processes = set()
+
+    def sample(self):
+        if time.time() - self.last_sample < self.interval:
+            return
+        self.last_sample = time.time()
+        try:
+            root = psutil.Process(self.pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        for proc in tree:
+            try:
+                self.sampled_peak_rss = max(self.sampled_peak_rss, rss_high_water_mark(proc))
+                # pids can be reused over the course of a long job
+                self.processes.add((proc.pid, proc.create_time()))
+            except psutil.Error:
+                continue
+        self.peak_processes = max(self.peak_processes, len(tree))
+
+    def finish(self):
+        '''
+        Returns the usage of the process tree; call this once its root has
+        been reaped.
+        '''
+        before = self.usage_before
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        if after.ru_maxrss > before.ru_maxrss:
+            peak_rss = after.ru_maxrss * self.MAXRSS_UNIT
+        else:
+            peak_rss = self.sampled_peak_rss
+        return {
+            'cpu_seconds': round(
+                (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime), 3
+            ),
+            # rusage counts blocks of 512 bytes
+            'io_read_bytes': (after.ru_inblock - before.ru_inblock) * 512,
+            'io_write_bytes': (after.ru_oublock - before.ru_oublock) * 512,
+            'peak_rss_bytes': peak_rss,
+            'approx_peak_processes': self.peak_processes,
+            'approx_processes': len(self.processes),
+        }
+
+
+class RawReader(object):
+    '''
+    Reads the output of a `pexpect.spawn` child directly from its pty.
+
+    Unlike `pexpect.spawn().expect()`, output isn't accumulated in pexpect's
+    buffer and re-scanned against every prompt pattern on each read; it is
+    decoded and written to `logfile` as it arrives.  Prompts always leave the
+    cursor at the end of a line, so patterns are only searched for when a read
+    ends mid-line, and then only in the trailing PROMPT_SEARCH_WINDOW
+    characters of output.
+    '''
+
+    def __init__(self, child, logfile, patterns, read_size=RAW_READ_SIZE):
+        self.child = child
+        self.logfile = logfile
+        self.read_size = read_size
+        self.timeout_index = patterns.index(pexpect.TIMEOUT)
+        self.eof_index = patterns.index(pexpect.EOF)
+        self.patterns = [
+            (i, re.compile(p, re.DOTALL) if isinstance(p, basestring) else p)
+            for i, p in enumerate(patterns)
+            if p not in (pexpect.TIMEOUT, pexpect.EOF)
+        ]
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.tail = u''
+
+    def read(self, timeout):
+        '''
+        Read output for up to `timeout` seconds, returning the index of the
+        prompt pattern that matched, or of `pexpect.EOF` / `pexpect.TIMEOUT`
+        (the same values `pexpect.spawn().expect()` returns).
+        '''
+        deadline = time.time() + timeout
+        while True:
+            remaining = max(0, deadline - time.time())
+            try:
+                ready, _, _ = select.select([self.child.child_fd], [], [], remaining)
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if not ready:
+                return self.timeout_index
+            try:
+                data = os.read(self.child.child_fd, self.read_size)
+            except OSError as e:
+                if e.errno != errno.EIO:
+                    raise
+                data = b''  # Linux raises EIO once the child closes the pty
+            if not data:
+                self.child.flag_eof = True
+                return self.eof_index
+            text = self.decoder.decode(data)
+            if text:
+                self.logfile.write(text)
+                self.logfile.flush()
+                match_index = self.search(text)
+                if match_index is not None:
+                    return match_index
+            if remaining == 0:
+                return self.timeout_index
+
+    def search(self, text):
+        if text.endswith('\n'):
+            self.tail = u''
+            return None
+        window = (self.tail + text)[-PROMPT_SEARCH_WINDOW:]
+        best = None
+        for index, pattern in self.patterns:
+            match = pattern.search(window)
+            if match and (best is None or match.start() < best[1].start()):
+                best = (index, match)
+        if best is None:
+            self.tail = window
+            return None
+        self.tail = window[best[1].end():]
+        return best[0]
+
+
+def run_isolated_job(private_data_dir, secrets, logfile=sys.stdout, resource_usage=None):
     '''
     Launch `ansible-playbook`, executing a job packaged by
     `build_isolated_job_data`.
@@ -157,8 +360,11 @@ def run_isolated_job(private_data_dir, secrets, logfile=sys.stdout):
                                   'env': { ... }  # environment variables,
                                   'passwords': { ... } # pexpect password prompts
                                   'ssh_key_data': 'RSA KEY DATA',
+                                  'event_log': True  # use ISOLATED_EVENT_LOG
                               }
     :param logfile:           a file-like object for capturing stdout
+    :param resource_usage:    a dict which is updated with what the job
+                              consumed (see `run_pexpect`)
 
     Returns a tuple (status, return_code) i.e., `('successful', 0)`
     '''
@@ -187,6 +393,7 @@ def run_isolated_job(private_data_dir, secrets, logfile=sys.stdout):
     idle_timeout = secrets.get('idle_timeout', 10)
     job_timeout = secrets.get('job_timeout', 10)
     pexpect_timeout = secrets.get('pexpect_timeout', 5)
+    raw_reads = secrets.get('raw_reads', False)
 
     # Use local callback directory
     callback_dir = os.getenv('AWX_LIB_DIRECTORY')
@@ -199,13 +406,17 @@ def run_isolated_job(private_data_dir, secrets, logfile=sys.stdout):
     else:
         env['ANSIBLE_STDOUT_CALLBACK'] = 'awx_display'
     env['AWX_ISOLATED_DATA_DIR'] = private_data_dir
+    if secrets.get('event_log', False):
+        env['AWX_ISOLATED_EVENT_LOG'] = os.path.join(private_data_dir, ISOLATED_EVENT_LOG)
     env['PYTHONPATH'] = env.get('PYTHONPATH', '') + callback_dir + ':'
 
     return run_pexpect(args, cwd, env, logfile,
                        expect_passwords=expect_passwords,
                        idle_timeout=idle_timeout,
                        job_timeout=job_timeout,
-                       pexpect_timeout=pexpect_timeout)
+                       pexpect_timeout=pexpect_timeout,
+                       raw_reads=raw_reads,
+                       resource_usage=resource_usage)
 
 
 def handle_termination(pid, args, proot_cmd, is_cancel=True):
@@ -252,12 +463,15 @@ def __run__(private_data_dir):
     os.mknod(stdout_filename, stat.S_IFREG | stat.S_IRUSR | stat.S_IWUSR)
     stdout_handle = codecs.open(stdout_filename, 'w', encoding='utf-8')
 
+    resource_usage = {}
     status, rc = run_isolated_job(
         private_data_dir,
         json.loads(base64.b64decode(buff.getvalue())),
-        stdout_handle
+        stdout_handle,
+        resource_usage=resource_usage
     )
     for filename, data in [
+        ('resource_usage', json.dumps(resource_usage)),
         ('status', status),
         ('rc', rc),
     ]:
@@ -5,14 +5,13 @@
 import datetime
 import logging
 
-import six
-
 # Django
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils.timezone import now
 
 # AWX
 from awx.main.models import ActivityStream
+from awx.main.utils.deletion import ChunkedDeletion
 
 
 class Command(BaseCommand):
@@ -28,6 +27,12 @@ class Command(BaseCommand):
         parser.add_argument('--dry-run', dest='dry_run', action='store_true',
                             default=False, help='Dry run mode (show items that would '
                             'be removed)')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=5000, metavar='N',
+                            help='Remove N events per transaction')
+        parser.add_argument('--workers', dest='workers', type=int, default=1, metavar='N',
+                            help='Remove events from N time ranges in parallel')
+        parser.add_argument('--rows-per-second', dest='rows_per_second', type=int, default=None, metavar='N',
+                            help='Remove at most N events per second')
 
     def init_logging(self):
         log_levels = dict(enumerate([logging.ERROR, logging.INFO,
@@ -40,27 +45,15 @@ class Command(BaseCommand):
         self.logger.propagate = False
 
     def cleanup_activitystream(self):
-        n_deleted_items = 0
-        pks_to_delete = set()
-        for asobj in ActivityStream.objects.iterator():
-            asobj_disp = '"%s" id: %s' % (six.text_type(asobj), asobj.id)
-            if asobj.timestamp >= self.cutoff:
-                if self.dry_run:
-                    self.logger.info("would skip %s" % asobj_disp)
-            else:
-                if self.dry_run:
-                    self.logger.info("would delete %s" % asobj_disp)
-                else:
-                    pks_to_delete.add(asobj.pk)
-            # Cleanup objects in batches instead of deleting each one individually.
-            if len(pks_to_delete) >= 500:
-                ActivityStream.objects.filter(pk__in=pks_to_delete).delete()
-                n_deleted_items += len(pks_to_delete)
-                pks_to_delete.clear()
-        if len(pks_to_delete):
-            ActivityStream.objects.filter(pk__in=pks_to_delete).delete()
-            n_deleted_items += len(pks_to_delete)
-        self.logger.log(99, "Removed %d items", n_deleted_items)
+        deletion = ChunkedDeletion(ActivityStream.objects.all(), 'timestamp', self.cutoff,
+                                   chunk_size=self.chunk_size, workers=self.workers,
+                                   rows_per_second=self.rows_per_second)
+        if self.dry_run:
+            self.logger.log(99, "Would remove %d items", deletion.count())
+            return
+        n_deleted_items, elapsed = deletion.run()
+        self.logger.log(99, "Removed %d items in %.2fs (%d items/s)", n_deleted_items, elapsed,
+                        n_deleted_items / elapsed if elapsed else 0)
 
     def handle(self, *args, **options):
         self.verbosity = int(options.get('verbosity', 1))
@@ -68,4 +61,9 @@ class Command(BaseCommand):
         self.days = int(options.get('days', 30))
         self.cutoff = now() - datetime.timedelta(days=self.days)
         self.dry_run = bool(options.get('dry_run', False))
+        self.chunk_size = int(options.get('chunk_size', 5000))
+        self.workers = int(options.get('workers', 1))
+        self.rows_per_second = options.get('rows_per_second')
+        if self.chunk_size < 1 or self.workers < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1.')
         self.cleanup_activitystream()
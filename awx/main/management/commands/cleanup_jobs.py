@@ -5,27 +5,41 @@
 import datetime
 import logging
 
-import six
-
 # Django
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db.models import Min, Q
 from django.utils.timezone import now
 
 # AWX
 from awx.main.models import (
     Job, AdHocCommand, ProjectUpdate, InventoryUpdate,
-    SystemJob, WorkflowJob, Notification
+    SystemJob, WorkflowJob, Notification, Host, Label,
+    Project, InventorySource, JobEvent, AdHocCommandEvent,
+    ProjectUpdateEvent, InventoryUpdateEvent, SystemJobEvent
 )
+from awx.main.models.unified_jobs import EVENT_CLOCK_ALLOWANCE
 from awx.main.signals import ( # noqa
     emit_update_inventory_on_created_or_deleted,
     emit_update_inventory_computed_fields,
     disable_activity_stream,
-    disable_computed_fields
+    disable_computed_fields,
+    _update_host_last_jhs
 )
+from awx.main.utils.deletion import ChunkedDeletion, bulk_delete
+from awx.main.utils.partitions import drop_partitions, foreign_key_references, is_partitioned
 from django.db.models.signals import post_save, post_delete, m2m_changed # noqa
 
 
+ACTIVE_STATUSES = ('pending', 'waiting', 'running')
+
+
+def current_and_last_jobs(templates):
+    return (
+        Q(pk__in=templates.filter(current_job__isnull=False).values('current_job')) |
+        Q(pk__in=templates.filter(last_job__isnull=False).values('last_job'))
+    )
+
+
 class Command(BaseCommand):
     '''
     Management command to cleanup old jobs and project updates.
@@ -60,115 +74,91 @@ class Command(BaseCommand):
         parser.add_argument('--workflow-jobs', default=False,
                             action='store_true', dest='only_workflow_jobs',
                             help='Remove workflow jobs')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=100, metavar='N',
+                            help='Remove N jobs (and their events) per transaction. Defaults to 100.')
+        parser.add_argument('--workers', dest='workers', type=int, default=1, metavar='N',
+                            help='Remove jobs from N time ranges in parallel. Defaults to 1.')
+        parser.add_argument('--rows-per-second', dest='rows_per_second', type=int, default=None, metavar='N',
+                            help='Remove at most N jobs of each kind per second.')
+
+    def cleanup(self, model, queryset, delete=bulk_delete, event_model=None):
+        '''
+        Remove the objects of `queryset` created before the cutoff, returning
+        how many objects of `model` were skipped and removed.
+        '''
+        if event_model is not None:
+            self.drop_event_partitions(model, queryset, event_model)
+        total = model.objects.count()
+        deletion = ChunkedDeletion(queryset, 'created', self.cutoff, chunk_size=self.chunk_size,
+                                   workers=self.workers, rows_per_second=self.rows_per_second,
+                                   delete=delete)
+        if self.dry_run:
+            deleted = deletion.count()
+        else:
+            deleted, elapsed = deletion.run()
+            self.logger.info('deleted %d %s in %.2fs (%d/s)', deleted, model._meta.verbose_name_plural,
+                             elapsed, deleted / elapsed if elapsed else 0)
+        return total - deleted, deleted
+
+    def drop_event_partitions(self, model, queryset, event_model):
+        # a partitioned event table has its expired events dropped a partition
+        # at a time, rather than deleted with their jobs; partitions that may
+        # hold events of the jobs that are kept (newer jobs, and the older
+        # ones `queryset` leaves out) are left for the jobs' deletion
+        table = event_model._meta.db_table
+        if not is_partitioned(table):
+            return
+        kept = model.objects.exclude(pk__in=queryset.filter(created__lt=self.cutoff).values('pk'))
+        oldest_kept = kept.aggregate(oldest=Min('created'))['oldest']
+        cutoff = min(self.cutoff, oldest_kept or self.cutoff) - EVENT_CLOCK_ALLOWANCE
+        dropped = drop_partitions(table, cutoff, dry_run=self.dry_run,
+                                  references=foreign_key_references(event_model))
+        if dropped:
+            self.logger.info('%s %d partitions of %s: %s', 'would drop' if self.dry_run else 'dropped',
+                             len(dropped), table, ', '.join(dropped))
+
+    def delete_unified_jobs(self, model, pks):
+        # do what the delete signals of unified jobs do, for the whole chunk
+        # (workers run in their own threads)
+        with disable_activity_stream():
+            label_pks = set(Label.objects.filter(unifiedjob_labels__in=pks).values_list('pk', flat=True))
+            host_pks = []
+            if model is Job:
+                host_pks = list(Host.objects.filter(last_job__in=pks).values_list('pk', flat=True))
+            deleted = bulk_delete(model, pks)
+            Label.objects.filter(pk__in=label_pks, unifiedjob_labels__isnull=True,
+                                 unifiedjobtemplate_labels__isnull=True).delete()
+            for host in Host.objects.filter(pk__in=host_pks):
+                _update_host_last_jhs(host)
+        return deleted
 
     def cleanup_jobs(self):
-        #jobs_qs = Job.objects.exclude(status__in=('pending', 'running'))
-        #jobs_qs = jobs_qs.filter(created__lte=self.cutoff)
-        skipped, deleted = 0, 0
-        jobs = Job.objects.filter(created__lt=self.cutoff)
-        for job in jobs.iterator():
-            job_display = '"%s" (%d host summaries, %d events)' % \
-                          (six.text_type(job),
-                           job.job_host_summaries.count(), job.job_events.count())
-            if job.status in ('pending', 'waiting', 'running'):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s job %s', action_text, job.status, job_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, job_display)
-                if not self.dry_run:
-                    job.delete()
-                deleted += 1
-
-        skipped += Job.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
+        return self.cleanup(Job, Job.objects.exclude(status__in=ACTIVE_STATUSES), self.delete_unified_jobs,
+                            event_model=JobEvent)
 
     def cleanup_ad_hoc_commands(self):
-        skipped, deleted = 0, 0
-        ad_hoc_commands = AdHocCommand.objects.filter(created__lt=self.cutoff)
-        for ad_hoc_command in ad_hoc_commands.iterator():
-            ad_hoc_command_display = '"%s" (%d events)' % \
-                (six.text_type(ad_hoc_command),
-                 ad_hoc_command.ad_hoc_command_events.count())
-            if ad_hoc_command.status in ('pending', 'waiting', 'running'):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s ad hoc command %s', action_text, ad_hoc_command.status, ad_hoc_command_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, ad_hoc_command_display)
-                if not self.dry_run:
-                    ad_hoc_command.delete()
-                deleted += 1
-
-        skipped += AdHocCommand.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
+        return self.cleanup(AdHocCommand, AdHocCommand.objects.exclude(status__in=ACTIVE_STATUSES),
+                            self.delete_unified_jobs, event_model=AdHocCommandEvent)
 
     def cleanup_project_updates(self):
-        skipped, deleted = 0, 0
-        project_updates = ProjectUpdate.objects.filter(created__lt=self.cutoff)
-        for pu in project_updates.iterator():
-            pu_display = '"%s" (type %s)' % (six.text_type(pu), six.text_type(pu.launch_type))
-            if pu.status in ('pending', 'waiting', 'running'):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s project update %s', action_text, pu.status, pu_display)
-                skipped += 1
-            elif pu in (pu.project.current_update, pu.project.last_update) and pu.project.scm_type:
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s', action_text, pu_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, pu_display)
-                if not self.dry_run:
-                    pu.delete()
-                deleted += 1
-
-        skipped += ProjectUpdate.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
+        # the current and last updates of SCM projects are kept
+        project_updates = ProjectUpdate.objects.exclude(status__in=ACTIVE_STATUSES).exclude(
+            current_and_last_jobs(Project.objects.exclude(scm_type=''))
+        )
+        return self.cleanup(ProjectUpdate, project_updates, self.delete_unified_jobs,
+                            event_model=ProjectUpdateEvent)
 
     def cleanup_inventory_updates(self):
-        skipped, deleted = 0, 0
-        inventory_updates = InventoryUpdate.objects.filter(created__lt=self.cutoff)
-        for iu in inventory_updates.iterator():
-            iu_display = '"%s" (source %s)' % (six.text_type(iu), six.text_type(iu.source))
-            if iu.status in ('pending', 'waiting', 'running'):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s inventory update %s', action_text, iu.status, iu_display)
-                skipped += 1
-            elif iu in (iu.inventory_source.current_update, iu.inventory_source.last_update) and iu.inventory_source.source:
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s', action_text, iu_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, iu_display)
-                if not self.dry_run:
-                    iu.delete()
-                deleted += 1
-
-        skipped += InventoryUpdate.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
+        # the current and last updates of inventory sources are kept
+        inventory_updates = InventoryUpdate.objects.exclude(status__in=ACTIVE_STATUSES).exclude(
+            current_and_last_jobs(InventorySource.objects.exclude(source=''))
+        )
+        return self.cleanup(InventoryUpdate, inventory_updates, self.delete_unified_jobs,
+                            event_model=InventoryUpdateEvent)
 
     def cleanup_management_jobs(self):
-        skipped, deleted = 0, 0
-        system_jobs = SystemJob.objects.filter(created__lt=self.cutoff)
-        for sj in system_jobs.iterator():
-            sj_display = '"%s" (type %s)' % (six.text_type(sj), six.text_type(sj.job_type))
-            if sj.status in ('pending', 'waiting', 'running'):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s system_job %s', action_text, sj.status, sj_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, sj_display)
-                if not self.dry_run:
-                    sj.delete()
-                deleted += 1
-
-        skipped += SystemJob.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
+        return self.cleanup(SystemJob, SystemJob.objects.exclude(status__in=ACTIVE_STATUSES),
+                            self.delete_unified_jobs, event_model=SystemJobEvent)
 
     def init_logging(self):
         log_levels = dict(enumerate([logging.ERROR, logging.INFO,
@@ -181,53 +171,22 @@ class Command(BaseCommand):
         self.logger.propagate = False
 
     def cleanup_workflow_jobs(self):
-        skipped, deleted = 0, 0
-        workflow_jobs = WorkflowJob.objects.filter(created__lt=self.cutoff)
-        for workflow_job in workflow_jobs.iterator():
-            workflow_job_display = '"{}" ({} nodes)'.format(
-                six.text_type(workflow_job),
-                workflow_job.workflow_nodes.count())
-            if workflow_job.status in ('pending', 'waiting', 'running'):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s job %s', action_text, workflow_job.status, workflow_job_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, workflow_job_display)
-                if not self.dry_run:
-                    workflow_job.delete()
-                deleted += 1
-
-        skipped += WorkflowJob.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
+        return self.cleanup(WorkflowJob, WorkflowJob.objects.exclude(status__in=ACTIVE_STATUSES),
+                            self.delete_unified_jobs)
 
     def cleanup_notifications(self):
-        skipped, deleted = 0, 0
-        notifications = Notification.objects.filter(created__lt=self.cutoff)
-        for notification in notifications.iterator():
-            notification_display = '"{}" (started {}, {} type, {} sent)'.format(
-                six.text_type(notification), six.text_type(notification.created),
-                notification.notification_type, notification.notifications_sent)
-            if notification.status in ('pending',):
-                action_text = 'would skip' if self.dry_run else 'skipping'
-                self.logger.debug('%s %s notification %s', action_text, notification.status, notification_display)
-                skipped += 1
-            else:
-                action_text = 'would delete' if self.dry_run else 'deleting'
-                self.logger.info('%s %s', action_text, notification_display)
-                if not self.dry_run:
-                    notification.delete()
-                deleted += 1
-
-        skipped += Notification.objects.filter(created__gte=self.cutoff).count()
-        return skipped, deleted
-
-    @transaction.atomic
+        return self.cleanup(Notification, Notification.objects.exclude(status='pending'))
+
     def handle(self, *args, **options):
         self.verbosity = int(options.get('verbosity', 1))
         self.init_logging()
         self.days = int(options.get('days', 90))
         self.dry_run = bool(options.get('dry_run', False))
+        self.chunk_size = int(options.get('chunk_size', 100))
+        self.workers = int(options.get('workers', 1))
+        self.rows_per_second = options.get('rows_per_second')
+        if self.chunk_size < 1 or self.workers < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1.')
         try:
             self.cutoff = now() - datetime.timedelta(days=self.days)
         except OverflowError:
@@ -0,0 +1,76 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+
+# Python
+from collections import defaultdict
+from datetime import timedelta
+import six
+
+# Django
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+# AWX
+from awx.main.models import UnifiedJob
+
+# in the order they happen; see BaseTask.run
+PHASES = ('scheduler_wait', 'queue_wait', 'pre_run_hook', 'private_data', 'fact_cache', 'build_args',
+          'credentials', 'proot', 'first_event', 'time_to_first_event', 'event_ingest_lag')
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def aggregate_phase_timing(rows):
+    '''
+    Given (group, phase_timing) pairs, return {group: (job count, {phase:
+    (median, 95th percentile)})}
+    '''
+    timings = defaultdict(list)
+    for group, phase_timing in rows:
+        if phase_timing:
+            timings[group].append(phase_timing)
+    results = {}
+    for group, group_timings in timings.items():
+        phases = {}
+        for phase in PHASES:
+            values = [t[phase] for t in group_timings if phase in t]
+            if values:
+                phases[phase] = (percentile(values, 50), percentile(values, 95))
+        results[group] = (len(group_timings), phases)
+    return results
+
+
+class Command(BaseCommand):
+    '''
+    Summarize the phase timing recorded for recently finished jobs, so that
+    regressions in how long jobs take to launch show up
+    '''
+
+    help = 'Display the median and 95th percentile launch phase timing of recent jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', dest='hours', type=int, default=24,
+                            help='Summarize jobs which finished in this many hours (default: 24)')
+        parser.add_argument('--by', dest='by', choices=('template', 'node'), default='template',
+                            help='Group jobs by unified job template or by execution node')
+
+    def handle(self, *args, **options):
+        group_by = {
+            'template': 'unified_job_template__name',
+            'node': 'execution_node',
+        }[options['by']]
+        rows = UnifiedJob.objects.filter(
+            finished__gte=now() - timedelta(hours=options['hours'])
+        ).values_list(group_by, 'phase_timing')
+
+        results = aggregate_phase_timing(rows.iterator())
+        for group in sorted(results, key=lambda g: g or ''):
+            count, phases = results[group]
+            self.stdout.write(six.text_type('{} ({} jobs)').format(group or '-', count))
+            for phase in PHASES:
+                if phase in phases:
+                    self.stdout.write(six.text_type('  {:<20} p50 {:>9.3f}s  p95 {:>9.3f}s').format(
+                        phase, *phases[phase]))
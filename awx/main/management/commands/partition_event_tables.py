@@ -0,0 +1,50 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+
+# Django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# AWX
+from awx.main.models import (
+    JobEvent, AdHocCommandEvent, ProjectUpdateEvent, InventoryUpdateEvent, SystemJobEvent
+)
+from awx.main.utils.partitions import partition_table, partitioning_supported
+
+
+EVENT_MODELS = (JobEvent, AdHocCommandEvent, ProjectUpdateEvent, InventoryUpdateEvent, SystemJobEvent)
+
+
+class Command(BaseCommand):
+    """
+    Partition the event tables by the time events were created
+    """
+
+    help = (
+        'Partition the event tables by the time events were created, so that '
+        'cleanup_jobs drops expired events a partition at a time rather than '
+        'deleting them row by row.  Requires PostgreSQL 10 or later.  The '
+        'events already recorded are not copied: each table becomes the '
+        '<table>_legacy partition of the events created before the first new '
+        'partition, and is dropped once they have all expired.  Foreign keys '
+        'referring to the event tables are dropped.  Events keep being '
+        'recorded while this runs, except for a moment per table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', dest='days', type=int, default=None, metavar='N',
+                            help='Split the tables into partitions of N days (7 for weeks starting on Mondays). '
+                                 'Defaults to the EVENT_PARTITION_DAYS setting.')
+
+    def handle(self, *args, **options):
+        if not partitioning_supported():
+            raise CommandError('Partitioning the event tables requires PostgreSQL 10 or later.')
+        days = options.get('days') or settings.EVENT_PARTITION_DAYS
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+        for event_model in EVENT_MODELS:
+            table = event_model._meta.db_table
+            if partition_table(table, days, settings.EVENT_PARTITION_DAYS_AHEAD):
+                self.stdout.write('Partitioned {} into partitions of {} days'.format(table, days))
+            else:
+                self.stdout.write('{} is already partitioned'.format(table))
@@ -0,0 +1,130 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+
+# Python
+import time
+from multiprocessing.pool import ThreadPool
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+# AWX
+from awx.main.models.rbac import Role, RoleAncestorEntry, RoleAncestryChange, bump_rbac_generation
+from awx.main.utils.pglock import advisory_lock
+
+
+STAGING_TABLE = 'main_rbac_role_ancestors_rebuild'
+
+# The ancestors of a range of roles: each role is its own ancestor, and the
+# ancestors of its parents are its ancestors.  UNION (rather than UNION ALL)
+# ends the recursion on cycles.
+CLOSURE_SQL = '''
+    WITH RECURSIVE closure(descendent_id, ancestor_id) AS (
+            SELECT id, id FROM %(roles_table)s WHERE id >= %%s AND id < %%s
+        UNION
+            SELECT closure.descendent_id, parents.to_role_id
+              FROM closure
+                   INNER JOIN %(parents_table)s AS parents
+                           ON (parents.from_role_id = closure.ancestor_id)
+    )
+    INSERT INTO %(staging_table)s (descendent_id, ancestor_id, role_field, content_type_id, object_id)
+    SELECT closure.descendent_id,
+           closure.ancestor_id,
+           roles.role_field,
+           COALESCE(roles.content_type_id, 0),
+           COALESCE(roles.object_id, 0)
+      FROM closure
+           INNER JOIN %(roles_table)s AS roles
+                   ON (roles.id = closure.descendent_id)
+'''
+
+SQL_PARAMS = {
+    'ancestors_table': RoleAncestorEntry._meta.db_table,
+    'parents_table': Role.parents.through._meta.db_table,
+    'roles_table': Role._meta.db_table,
+    'staging_table': STAGING_TABLE,
+}
+
+
+def build_partition(bounds):
+    # each thread has its own database connection
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(CLOSURE_SQL % SQL_PARAMS, list(bounds))
+            return cursor.rowcount
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the role ancestry table from the role hierarchy
+    """
+
+    help = (
+        'Rebuild the role ancestry table from scratch, for recovering from '
+        'an inconsistent ancestry table.  Computes the ancestors of ranges of '
+        'roles in parallel, one recursive query per range, then replaces the '
+        'table in one transaction.  Role changes made while this runs may '
+        'not be reflected; run it while the system is idle.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', dest='workers', type=int, default=4,
+                            help='Number of ranges of roles to compute at once')
+        parser.add_argument('--partitions', dest='partitions', type=int, default=None,
+                            help='Number of ranges to split the roles into (default: 4 per worker)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Rebuilding role ancestry requires PostgreSQL.')
+        workers = options.get('workers')
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+        partitions = options.get('partitions') or workers * 4
+
+        with advisory_lock('role_ancestry_lock'):
+            start = time.time()
+            last_change = RoleAncestryChange.objects.order_by('-id').values_list('id', flat=True).first()
+            with connection.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS %(staging_table)s' % SQL_PARAMS)
+                cursor.execute('''
+                    CREATE UNLOGGED TABLE %(staging_table)s (
+                        descendent_id integer NOT NULL,
+                        ancestor_id integer NOT NULL,
+                        role_field text NOT NULL,
+                        content_type_id integer NOT NULL,
+                        object_id integer NOT NULL
+                    )
+                ''' % SQL_PARAMS)
+                cursor.execute('SELECT MIN(id), MAX(id) FROM %(roles_table)s' % SQL_PARAMS)
+                min_id, max_id = cursor.fetchone()
+
+            if min_id is None:
+                bounds = []
+            else:
+                step = max((max_id - min_id + 1) // partitions + 1, 1)
+                bounds = [(lo, lo + step) for lo in range(min_id, max_id + 1, step)]
+            pool = ThreadPool(workers)
+            try:
+                entries = sum(pool.map(build_partition, bounds))
+            finally:
+                pool.close()
+                pool.join()
+            self.stdout.write('Computed {} ancestry entries for {} role ranges in {:.2f}s'.format(
+                entries, len(bounds), time.time() - start))
+
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('TRUNCATE %(ancestors_table)s' % SQL_PARAMS)
+                    cursor.execute('''
+                        INSERT INTO %(ancestors_table)s (descendent_id, ancestor_id, role_field, content_type_id, object_id)
+                        SELECT descendent_id, ancestor_id, role_field, content_type_id, object_id FROM %(staging_table)s
+                    ''' % SQL_PARAMS)
+                    cursor.execute('DROP TABLE %(staging_table)s' % SQL_PARAMS)
+                # the rebuild covers the changes logged before it started
+                if last_change is not None:
+                    RoleAncestryChange.objects.filter(id__lte=last_change).delete()
+                bump_rbac_generation()
+            self.stdout.write('Rebuilt role ancestry in {:.2f}s'.format(time.time() - start))
@@ -0,0 +1,86 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+
+# Python
+from collections import defaultdict
+from datetime import timedelta
+import six
+
+# Django
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+# AWX
+from awx.main.models import UnifiedJob
+
+# see awx.main.expect.run.ResourceSampler
+METRICS = ('cpu_seconds', 'peak_rss_bytes', 'io_read_bytes', 'io_write_bytes', 'approx_peak_processes',
+           'approx_processes')
+
+
+def aggregate_resource_usage(rows):
+    '''
+    Given (group, resource_usage) pairs, return {group: (job count, {metric:
+    (median, 95th percentile, max)})}
+    '''
+    usages = defaultdict(list)
+    for group, resource_usage in rows:
+        if resource_usage:
+            usages[group].append(resource_usage)
+    results = {}
+    for group, group_usages in usages.items():
+        metrics = {}
+        for metric in METRICS:
+            values = sorted(u[metric] for u in group_usages if metric in u)
+            if values:
+                metrics[metric] = (
+                    values[len(values) // 2],
+                    values[min(len(values) - 1, int(len(values) * 0.95))],
+                    values[-1],
+                )
+        results[group] = (len(group_usages), metrics)
+    return results
+
+
+class Command(BaseCommand):
+    '''
+    Summarize what recently finished jobs consumed, for sizing capacity and
+    finding runaway jobs
+    '''
+
+    help = 'Display the resources consumed by recent jobs, per template or per node'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', dest='hours', type=int, default=24,
+                            help='Summarize jobs which finished in this many hours (default: 24)')
+        parser.add_argument('--by', dest='by', choices=('template', 'node'), default='template',
+                            help='Group jobs by unified job template or by execution node')
+        parser.add_argument('--top', dest='top', type=int, default=0,
+                            help='Also list the jobs which used the most CPU time')
+
+    def handle(self, *args, **options):
+        group_by = {
+            'template': 'unified_job_template__name',
+            'node': 'execution_node',
+        }[options['by']]
+        jobs = UnifiedJob.objects.filter(finished__gte=now() - timedelta(hours=options['hours']))
+
+        results = aggregate_resource_usage(jobs.values_list(group_by, 'resource_usage').iterator())
+        for group in sorted(results, key=lambda g: g or ''):
+            count, metrics = results[group]
+            self.stdout.write(six.text_type('{} ({} jobs)').format(group or '-', count))
+            for metric in METRICS:
+                if metric in metrics:
+                    self.stdout.write(six.text_type('  {:<21} p50 {:>14}  p95 {:>14}  max {:>14}').format(
+                        metric, *metrics[metric]))
+
+        if options['top']:
+            usages = [
+                (usage.get('cpu_seconds', 0), pk, name, usage)
+                for pk, name, usage in jobs.values_list('pk', 'name', 'resource_usage').iterator()
+                if usage
+            ]
+            self.stdout.write('Top {} jobs by CPU time:'.format(options['top']))
+            for cpu_seconds, pk, name, usage in sorted(usages, reverse=True)[:options['top']]:
+                self.stdout.write(six.text_type('  {} {}: {}').format(
+                    pk, name, ', '.join('{}={}'.format(m, usage[m]) for m in METRICS if m in usage)))
@@ -6,6 +6,7 @@ import logging
 import os
 import signal
 import time
+from collections import defaultdict
 from uuid import UUID
 from multiprocessing import Process
 from multiprocessing import Queue as MPQueue
@@ -20,12 +21,15 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connection as django_connection
 from django.db import DatabaseError, OperationalError
+from django.db.models import F
 from django.db.utils import InterfaceError, InternalError
 from django.core.cache import cache as django_cache
+from django.utils.timezone import now
 
 # AWX
 from awx.main.models import * # noqa
 from awx.main.consumers import emit_channel_notification
+from awx.main.utils import PhaseTimer
 
 logger = logging.getLogger('awx.main.commands.run_callback_receiver')
 
@@ -45,6 +49,11 @@ class CallbackBrokerWorker(ConsumerMixin):
 
     MAX_RETRIES = 2
 
+    # saved event tallies are written back to the job in batches, whichever
+    # of these limits is reached first
+    SAVED_EVENTS_FLUSH_SIZE = 1000
+    SAVED_EVENTS_FLUSH_INTERVAL = 1
+
     def __init__(self, connection, use_workers=True):
         self.connection = connection
         self.worker_queues = []
@@ -118,9 +127,45 @@ class CallbackBrokerWorker(ConsumerMixin):
         logger.warn("Could not write payload to any queue, attempted order: {}".format(write_attempt_order))
         return None
 
+    def flush_saved_events(self, saved_events):
+        '''
+        Add the number of events persisted since the last flush to each job's
+        `saved_events` counter (see UnifiedJob.event_processing_finished)
+        '''
+        for job_identifier, count in saved_events.items():
+            try:
+                UnifiedJob.objects.filter(
+                    pk=job_identifier, saved_events__isnull=False
+                ).update(saved_events=F('saved_events') + count)
+            except Exception:
+                logger.exception('Worker failed to update saved event count: Job {}'.format(job_identifier))
+        saved_events.clear()
+
+    def record_ingest_lag(self, job_identifier):
+        '''
+        Add how long after the job finished its last event was saved to its
+        `phase_timing`
+        '''
+        row = UnifiedJob.objects.filter(pk=job_identifier).values_list('finished', 'phase_timing').first()
+        if row is None:
+            return
+        finished, phase_timing = row
+        timer = PhaseTimer(phase_timing)
+        # a job whose events are all saved before its final status is, has no lag
+        timer.record('event_ingest_lag', max(0, (now() - finished).total_seconds()) if finished else 0)
+        UnifiedJob.objects.filter(pk=job_identifier).update(phase_timing=timer.timing)
+
     def callback_worker(self, queue_actual, idx):
         signal_handler = WorkerSignalHandler()
+        saved_events = defaultdict(int)
+        last_flush = time.time()
         while not signal_handler.kill_now:
+            if saved_events and (
+                sum(saved_events.values()) >= self.SAVED_EVENTS_FLUSH_SIZE or
+                time.time() - last_flush >= self.SAVED_EVENTS_FLUSH_INTERVAL
+            ):
+                self.flush_saved_events(saved_events)
+                last_flush = time.time()
             try:
                 body = queue_actual.get(block=True, timeout=1)
             except QueueEmpty:
@@ -161,6 +206,8 @@ class CallbackBrokerWorker(ConsumerMixin):
                         break
 
                 if body.get('event') == 'EOF':
+                    self.flush_saved_events(saved_events)
+                    last_flush = time.time()
                     try:
                         logger.info('Event processing is finished for Job {}, sending notifications'.format(job_identifier))
                         # EOF events are sent when stdout for the running task is
@@ -190,12 +237,17 @@ class CallbackBrokerWorker(ConsumerMixin):
                                     uj = UnifiedJob.objects.get(pk=job_identifier)
                     except Exception:
                         logger.exception('Worker failed to emit notifications: Job {}'.format(job_identifier))
+                    try:
+                        self.record_ingest_lag(job_identifier)
+                    except Exception:
+                        logger.exception('Worker failed to record event ingest lag: Job {}'.format(job_identifier))
                     continue
 
                 retries = 0
                 while retries <= self.MAX_RETRIES:
                     try:
                         _save_event_data()
+                        saved_events[job_identifier] += 1
                         break
                     except (OperationalError, InterfaceError, InternalError) as e:
                         if retries >= self.MAX_RETRIES:
@@ -218,6 +270,7 @@ class CallbackBrokerWorker(ConsumerMixin):
                 tb = traceback.format_exc()
                 logger.error('Callback Task Processor Raised Exception: %r', exc)
                 logger.error('Detail: {}'.format(tb))
+        self.flush_saved_events(saved_events)
 
 
 class Command(BaseCommand):
@@ -2,10 +2,12 @@
 # All Rights Reserved
 
 # Django
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
 
 # AWX
 from awx.main.models import UnifiedJob
+from awx.main.tasks import PROJECT_SYNC_STATS
 
 
 class Command(BaseCommand):
@@ -29,5 +31,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         if options['stat'].startswith("jobs_"):
             self.stdout.write(str(self.job_stats(options['stat'][5:])))
+        elif options['stat'] in PROJECT_SYNC_STATS:
+            self.stdout.write(str(cache.get(options['stat'], 0)))
         else:
-            self.stdout.write("Supported stats:  jobs_{state}")
+            self.stdout.write("Supported stats:  jobs_{{state}}, {}".format(', '.join(PROJECT_SYNC_STATS)))
@@ -23,7 +23,9 @@ from django.core.urlresolvers import reverse
 from django.urls import resolve
 
 from awx.main.models import ActivityStream
-from awx.main.utils.named_url_graph import generate_graph, GraphNode
+from awx.main.utils.named_url_graph import (
+    generate_graph, GraphNode, connect_named_url_signals, get_named_url_generation, named_url_cache
+)
 from awx.conf import fields, register
 
 
@@ -32,6 +34,13 @@ analytics_logger = logging.getLogger('awx.analytics.activity_stream')
 perf_logger = logging.getLogger('awx.analytics.performance')
 
 
+class SettingsSnapshotMiddleware(object):
+
+    def process_request(self, request):
+        # a request sees the settings changed since the last request in this thread
+        settings._awx_conf_settings.expire_snapshot()
+
+
 class TimingMiddleware(threading.local):
 
     dest = '/var/lib/awx/profile'
@@ -139,6 +148,7 @@ class URLModificationMiddleware(object):
         models = [m for m in apps.get_app_config('main').get_models() if hasattr(m, 'get_absolute_url')]
         generate_graph(models)
         _customize_graph()
+        connect_named_url_signals(settings.NAMED_URL_GRAPH)
         register(
             'NAMED_URL_FORMATS',
             field_class=fields.DictField,
@@ -164,7 +174,14 @@ class URLModificationMiddleware(object):
         kwargs = {}
         if not node.populate_named_url_query_kwargs(kwargs, named_url):
             return named_url
-        return str(get_object_or_404(node.model, **kwargs).pk)
+        generation = get_named_url_generation()
+        pk = named_url_cache.get(node.model, named_url, generation)
+        if pk is None:
+            pk = str(get_object_or_404(node.model, **kwargs).pk)
+            # without a shared generation, cached lookups could not be invalidated
+            if generation is not None:
+                named_url_cache.set(node.model, named_url, generation, pk)
+        return pk
 
     def _convert_named_url(self, url_path):
         url_units = url_path.split('/')
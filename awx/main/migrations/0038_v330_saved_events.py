@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0037_v330_remove_legacy_fact_cleanup'),
+    ]
+
+    operations = [
+        # existing rows are left null, so event_processing_finished falls back
+        # to counting their events; new jobs start from zero
+        migrations.AddField(
+            model_name='unifiedjob',
+            name='saved_events',
+            field=models.PositiveIntegerField(default=None, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='unifiedjob',
+            name='saved_events',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of events from this job that have been saved to the database (null for jobs that predate event counting).', null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import awx.main.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0038_v330_saved_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unifiedjob',
+            name='phase_timing',
+            field=awx.main.fields.JSONField(default={}, editable=False, help_text='Seconds spent in each phase of launching and running this job, from being dispatched by the task manager to its events being saved.', blank=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import awx.main.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0039_v330_phase_timing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unifiedjob',
+            name='resource_usage',
+            field=awx.main.fields.JSONField(default={}, editable=False, help_text='What the processes run by this job consumed: CPU seconds, block IO bytes, peak resident memory and the number of processes.', blank=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import awx.main.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0040_v330_resource_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='load',
+            field=awx.main.fields.JSONField(default={}, editable=False, help_text='The load average, available memory and consumed capacity observed at the last heartbeat, when capacity is adaptive.', blank=True),
+        ),
+    ]
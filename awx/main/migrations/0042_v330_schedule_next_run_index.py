@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0041_v330_instance_load'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='schedule',
+            name='next_run',
+            field=models.DateTimeField(default=None, help_text='The next time that the scheduled action will run.', null=True, editable=False, db_index=True),
+        ),
+    ]
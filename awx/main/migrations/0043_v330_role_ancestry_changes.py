@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0042_v330_schedule_next_run_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleAncestryChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role_id', models.PositiveIntegerField()),
+                ('removal', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'main_rbac_role_ancestry_changes',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+import awx.main.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0043_v330_role_ancestry_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counts', awx.main.fields.JSONField(default={}, blank=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.CASCADE, to='main.Organization', null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobOutcomeRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('job_type', models.CharField(max_length=16)),
+                ('successful', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='joboutcomerollup',
+            unique_together=set([('hour', 'job_type')]),
+        ),
+    ]
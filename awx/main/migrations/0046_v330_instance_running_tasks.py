@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import awx.main.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0045_v330_cleanup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='running_tasks',
+            field=awx.main.fields.JSONField(default=[], help_text='The ids of the celery tasks running on this instance at its last heartbeat.', editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='instance',
+            name='running_tasks_published',
+            field=models.DateTimeField(default=None, help_text='When this instance last recorded its running tasks.', null=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0046_v330_instance_running_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'main_rbac_generation',
+            },
+        ),
+    ]
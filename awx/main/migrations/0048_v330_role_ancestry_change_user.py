@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0047_v330_rbac_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roleancestrychange',
+            name='user_id',
+            field=models.PositiveIntegerField(default=None, null=True, db_index=True),
+        ),
+    ]
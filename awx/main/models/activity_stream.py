@@ -31,7 +31,7 @@ class ActivityStream(models.Model):
 
     actor = models.ForeignKey('auth.User', null=True, on_delete=models.SET_NULL, related_name='activity_stream')
     operation = models.CharField(max_length=13, choices=OPERATION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     changes = models.TextField(blank=True)
 
     object_relationship_type = models.TextField(blank=True)
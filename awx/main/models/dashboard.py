@@ -0,0 +1,236 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import datetime
+
+# Django
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils.timezone import now
+
+# AWX
+from awx.main.fields import JSONField
+from awx.main.models.credential import Credential
+from awx.main.models.inventory import Group, Host, Inventory, InventorySource, InventoryUpdate
+from awx.main.models.jobs import Job, JobTemplate
+from awx.main.models.organization import Organization, Team
+from awx.main.models.projects import Project, ProjectUpdate
+from awx.main.models.unified_jobs import UnifiedJob
+
+__all__ = ['DashboardAggregate', 'JobOutcomeRollup', 'dashboard_counts']
+
+
+# how long job outcomes are rolled up for; the jobs graph shows up to a month
+JOB_OUTCOME_ROLLUP_DAYS = 32
+
+JOB_OUTCOME_TYPES = [
+    ('playbook_run', Job),
+    ('scm_update', ProjectUpdate),
+    ('inv_sync', InventoryUpdate),
+]
+
+
+def dashboard_metrics(queryset):
+    '''
+    The numbers the dashboard shows, as (name, queryset, organization field,
+    aggregate) tuples, with `queryset(model)` being the objects of `model` to
+    count.  An aggregate of None counts the objects.
+    '''
+    inventories = queryset(Inventory)
+    ec2_inventory_sources = queryset(InventorySource).filter(source='ec2')
+    hosts = queryset(Host)
+    projects = queryset(Project)
+    jobs = queryset(Job)
+    metrics = [
+        ('inventories', inventories, 'organization', None),
+        ('inventories_with_inventory_source', inventories.filter(has_inventory_sources=True), 'organization', None),
+        ('inventories_job_failed', inventories.filter(hosts_with_active_failures__gt=0), 'organization', None),
+        ('inventories_inventory_failed', inventories, 'organization', Sum('inventory_sources_with_failures')),
+        ('ec2_inventory_sources', ec2_inventory_sources, 'inventory__organization', None),
+        ('ec2_inventory_sources_failed', ec2_inventory_sources.filter(status='failed'), 'inventory__organization', None),
+        ('groups', queryset(Group), 'inventory__organization', None),
+        # not limited to the groups the user can see
+        ('groups_job_failed', Group.objects.filter(Q(hosts_with_active_failures__gt=0) | Q(groups_with_active_failures__gt=0)),
+         'inventory__organization', None),
+        ('groups_inventory_failed', Group.objects.filter(inventory_sources__last_job_failed=True),
+         'inventory__organization', None),
+        ('hosts', hosts, 'inventory__organization', None),
+        ('hosts_failed', hosts.filter(has_active_failures=True), 'inventory__organization', None),
+        ('projects', projects, 'organization', None),
+        ('projects_failed', projects.filter(last_job_failed=True), 'organization', None),
+        ('jobs', jobs, 'project__organization', None),
+        ('jobs_failed', jobs.filter(failed=True), 'project__organization', None),
+        ('users', queryset(User), None, None),
+        ('organizations', queryset(Organization), 'id', None),
+        ('teams', queryset(Team), 'organization', None),
+        ('credentials', queryset(Credential), 'organization', None),
+        ('job_templates', queryset(JobTemplate), 'project__organization', None),
+    ]
+    for scm_type in ('git', 'svn', 'hg'):
+        scm_projects = projects.filter(scm_type=scm_type)
+        metrics.append(('{}_projects'.format(scm_type), scm_projects, 'organization', None))
+        metrics.append(('{}_projects_failed'.format(scm_type), scm_projects.filter(last_job_failed=True),
+                        'organization', None))
+    return metrics
+
+
+def dashboard_counts(queryset):
+    '''
+    Counts the dashboard numbers of the given querysets (see
+    `dashboard_metrics`) as they are now.
+    '''
+    counts = {}
+    for name, qs, organization_field, aggregate in dashboard_metrics(queryset):
+        if aggregate is None:
+            counts[name] = qs.count()
+        else:
+            counts[name] = qs.aggregate(value=aggregate)['value'] or 0
+    return counts
+
+
+class DashboardAggregate(models.Model):
+    '''
+    The dashboard numbers of all objects in one organization (or of those
+    in none), as of the last `update_dashboard_aggregates` task.
+    '''
+
+    class Meta:
+        app_label = 'main'
+
+    organization = models.ForeignKey(
+        'Organization',
+        related_name='+',
+        null=True,
+        on_delete=models.CASCADE,
+    )
+    counts = JSONField(
+        blank=True,
+        default={},
+    )
+    modified = models.DateTimeField(
+        auto_now=True,
+    )
+
+    @classmethod
+    def refresh(cls):
+        by_organization = {}
+        for name, qs, organization_field, aggregate in dashboard_metrics(lambda model: model.objects.all()):
+            if organization_field is None:
+                by_organization.setdefault(None, {})[name] = qs.count()
+                continue
+            rows = qs.order_by().values(organization_field).annotate(value=aggregate or Count('id'))
+            for row in rows:
+                organization_counts = by_organization.setdefault(row[organization_field], {})
+                organization_counts[name] = organization_counts.get(name, 0) + (row['value'] or 0)
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(organization_id=organization_id, counts=counts)
+                for organization_id, counts in by_organization.items()
+            ])
+
+    @classmethod
+    def totals(cls):
+        '''
+        The dashboard numbers of all objects, or None if they have not been
+        aggregated yet.
+        '''
+        aggregates = list(cls.objects.values_list('counts', flat=True))
+        if not aggregates:
+            return None
+        totals = dict((name, 0) for name, qs, organization_field, aggregate in
+                      dashboard_metrics(lambda model: model.objects.none()))
+        for counts in aggregates:
+            for name, value in counts.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+
+class JobOutcomeRollup(models.Model):
+    '''
+    The number of jobs of one type that succeeded and failed in one hour, for
+    the dashboard jobs graph.
+    '''
+
+    class Meta:
+        app_label = 'main'
+        unique_together = ('hour', 'job_type')
+
+    hour = models.DateTimeField(
+        db_index=True,
+    )
+    job_type = models.CharField(
+        max_length=16,
+    )
+    successful = models.PositiveIntegerField(
+        default=0,
+    )
+    failed = models.PositiveIntegerField(
+        default=0,
+    )
+
+    @classmethod
+    def refresh(cls):
+        '''
+        Rolls up the jobs that finished since the hour before the last one
+        rolled up (jobs finishing near the end of an hour may have been
+        committed after it was), and forgets hours too old to be graphed.
+        '''
+        cutoff = truncate_datetime(now() - datetime.timedelta(days=JOB_OUTCOME_ROLLUP_DAYS), 'hours')
+        last = cls.objects.aggregate(Max('hour'))['hour__max']
+        since = max(last - datetime.timedelta(hours=1), cutoff) if last else cutoff
+
+        ctypes = ContentType.objects.get_for_models(*[model for job_type, model in JOB_OUTCOME_TYPES])
+        job_types = dict((ctypes[model].id, job_type) for job_type, model in JOB_OUTCOME_TYPES)
+        rows = UnifiedJob.objects.filter(
+            finished__gte=since, status__in=['successful', 'failed']
+        ).order_by().annotate(
+            hour=TruncHour('finished')
+        ).values('hour', 'polymorphic_ctype', 'status').annotate(count=Count('id'))
+
+        rollups = {}
+        for row in rows:
+            key = (row['hour'], job_types.get(row['polymorphic_ctype'], 'other'))
+            if key not in rollups:
+                rollups[key] = cls(hour=key[0], job_type=key[1])
+            setattr(rollups[key], row['status'], getattr(rollups[key], row['status']) + row['count'])
+        with transaction.atomic():
+            cls.objects.filter(Q(hour__lt=cutoff) | Q(hour__gte=since)).delete()
+            cls.objects.bulk_create(rollups.values())
+
+    @classmethod
+    def time_series(cls, start, end, interval, job_type='all'):
+        '''
+        The number of successful and failed jobs in each day or hour
+        (`interval` is 'days' or 'hours') from the one `start` is in to the
+        one `end` is in, like qsstats' `QuerySetStats.time_series` gives.
+        '''
+        step = datetime.timedelta(**{interval: 1})
+        first = truncate_datetime(start, interval)
+        last = truncate_datetime(end, interval)
+        rollups = cls.objects.filter(hour__gte=first, hour__lt=last + step)
+        if job_type in dict(JOB_OUTCOME_TYPES):
+            rollups = rollups.filter(job_type=job_type)
+        successful, failed = {}, {}
+        for rollup in rollups:
+            bucket = truncate_datetime(rollup.hour, interval)
+            successful[bucket] = successful.get(bucket, 0) + rollup.successful
+            failed[bucket] = failed.get(bucket, 0) + rollup.failed
+        series = {'successful': [], 'failed': []}
+        bucket = first
+        while bucket <= last:
+            series['successful'].append((bucket, successful.get(bucket, 0)))
+            series['failed'].append((bucket, failed.get(bucket, 0)))
+            bucket += step
+        return series
+
+
+def truncate_datetime(dt, interval):
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    if interval == 'days':
+        dt = dt.replace(hour=0)
+    return dt
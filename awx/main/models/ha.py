@@ -20,7 +20,9 @@ from awx.main.models.inventory import InventoryUpdate
 from awx.main.models.jobs import Job
 from awx.main.models.projects import ProjectUpdate
 from awx.main.models.unified_jobs import UnifiedJob
-from awx.main.utils import get_cpu_capacity, get_mem_capacity, get_system_task_capacity
+from awx.main.utils import (
+    get_cpu_capacity, get_mem_capacity, get_system_task_capacity, get_observed_load, get_adaptive_capacity
+)
 from awx.main.models.mixins import RelatedJobsMixin
 
 __all__ = ('Instance', 'InstanceGroup', 'JobOrigin', 'TowerScheduleState',)
@@ -68,6 +70,25 @@ class Instance(models.Model):
         default=0,
         editable=False,
     )
+    load = JSONField(
+        blank=True,
+        default={},
+        editable=False,
+        help_text=_('The load average, available memory and consumed capacity observed at the '
+                    'last heartbeat, when capacity is adaptive.'),
+    )
+    running_tasks = JSONField(
+        blank=True,
+        default=[],
+        editable=False,
+        help_text=_('The ids of the celery tasks running on this instance at its last heartbeat.'),
+    )
+    running_tasks_published = models.DateTimeField(
+        null=True,
+        default=None,
+        editable=False,
+        help_text=_('When this instance last recorded its running tasks.'),
+    )
 
     class Meta:
         app_label = 'main'
@@ -104,14 +125,23 @@ class Instance(models.Model):
     def refresh_capacity(self):
         cpu = get_cpu_capacity()
         mem = get_mem_capacity()
-        self.capacity = get_system_task_capacity(self.capacity_adjustment)
+        if settings.AWX_ADAPTIVE_CAPACITY:
+            load = get_observed_load()
+            load['consumed_capacity'] = self.consumed_capacity
+            self.capacity = get_adaptive_capacity(load, load['consumed_capacity'],
+                                                  current=self.capacity or None,
+                                                  scale=self.capacity_adjustment)
+            self.load = load
+        else:
+            self.capacity = get_system_task_capacity(self.capacity_adjustment)
+            self.load = {}
         self.cpu = cpu[0]
         self.memory = mem[0]
         self.cpu_capacity = cpu[1]
         self.mem_capacity = mem[1]
         self.version = awx_application_version
         self.save(update_fields=['capacity', 'version', 'modified', 'cpu',
-                                 'memory', 'cpu_capacity', 'mem_capacity'])
+                                 'memory', 'cpu_capacity', 'mem_capacity', 'load'])
 
     
 
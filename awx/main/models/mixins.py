@@ -18,7 +18,7 @@ from django.db.models.query import QuerySet
 # AWX
 from awx.main.models.base import prevent_search
 from awx.main.models.rbac import (
-    Role, RoleAncestorEntry, get_roles_on_resource
+    Role, RoleAncestorEntry, get_roles_on_resource, get_accessible_ids
 )
 from awx.main.utils import parse_yaml_or_json, get_custom_venv_choices
 from awx.main.utils.encryption import decrypt_value, get_encryption_key, is_encrypted
@@ -66,16 +66,24 @@ class ResourceMixin(models.Model):
                                                  object_id=accessor.id)
 
         if content_types is None:
-            ct_kwarg = dict(content_type_id = ContentType.objects.get_for_model(cls).id)
+            content_types = [ContentType.objects.get_for_model(cls).id]
+            ct_kwarg = dict(content_type_id = content_types[0])
         else:
             ct_kwarg = dict(content_type_id__in = content_types)
 
-        return RoleAncestorEntry.objects.filter(
+        pk_qs = RoleAncestorEntry.objects.filter(
             ancestor__in = ancestor_roles,
             role_field = role_field,
             **ct_kwarg
         ).values_list('object_id').distinct()
 
+        if type(accessor) == User and settings.AWX_RBAC_ACCESSIBLE_ID_CACHE:
+            # a list of ids rather than a subquery in every RBAC-filtered query
+            ids = get_accessible_ids(accessor, role_field, content_types, pk_qs)
+            if ids is not None:
+                return ids
+        return pk_qs
+
 
     @staticmethod
     def _accessible_objects(cls, accessor, role_field):
@@ -10,7 +10,7 @@ import urlparse
 from django.conf import settings
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
-from django.utils.encoding import smart_str, smart_text
+from django.utils.encoding import smart_str
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now, make_aware, get_default_timezone
@@ -36,7 +36,7 @@ from awx.main.models.mixins import (
     RelatedJobsMixin
 )
 from awx.main.utils import update_scm_url
-from awx.main.utils.ansible import skip_directory, could_be_inventory, could_be_playbook
+from awx.main.utils.ansible import ProjectFileCatalog
 from awx.main.fields import ImplicitRoleField
 from awx.main.models.rbac import (
     ROLE_SINGLETON_SYSTEM_ADMINISTRATOR,
@@ -187,40 +187,20 @@ class ProjectOptions(models.Model):
             if not check_if_exists or os.path.exists(smart_str(proj_path)):
                 return proj_path
 
-    @property
-    def playbooks(self):
-        results = []
+    def get_file_catalog(self):
         project_path = self.get_project_path()
         if project_path:
-            for dirpath, dirnames, filenames in os.walk(smart_str(project_path)):
-                if skip_directory(dirpath):
-                    continue
-                for filename in filenames:
-                    playbook = could_be_playbook(project_path, dirpath, filename)
-                    if playbook is not None:
-                        results.append(smart_text(playbook))
-        return sorted(results, key=lambda x: smart_str(x).lower())
+            return ProjectFileCatalog(project_path, catalog_path=project_path + '.catalog')
 
+    @property
+    def playbooks(self):
+        catalog = self.get_file_catalog()
+        return catalog.playbooks if catalog else []
 
     @property
     def inventories(self):
-        results = []
-        project_path = self.get_project_path()
-        if project_path:
-            # Cap the number of results, because it could include lots
-            max_inventory_listing = 50
-            for dirpath, dirnames, filenames in os.walk(smart_str(project_path)):
-                if skip_directory(dirpath):
-                    continue
-                for filename in filenames:
-                    inv_path = could_be_inventory(project_path, dirpath, filename)
-                    if inv_path is not None:
-                        results.append(smart_text(inv_path))
-                        if len(results) > max_inventory_listing:
-                            break
-                if len(results) > max_inventory_listing:
-                    break
-        return sorted(results, key=lambda x: smart_str(x).lower())
+        catalog = self.get_file_catalog()
+        return catalog.inventories if catalog else []
 
     def get_lock_file(self):
         '''
@@ -232,6 +212,17 @@ class ProjectOptions(models.Model):
             return None
         return proj_path + '.lock'
 
+    def get_revision_file(self):
+        '''
+        Like the lock file, this sits next to the project directory; it
+        records the SCM revision most recently checked out into that
+        directory on this node.
+        '''
+        proj_path = self.get_project_path(check_if_exists=False)
+        if not proj_path:
+            return None
+        return proj_path + '.revision'
+
 
 class Project(UnifiedJobTemplate, ProjectOptions, ResourceMixin, CustomVirtualEnvMixin, RelatedJobsMixin):
     '''
@@ -2,19 +2,30 @@
 # All Rights Reserved.
 
 # Python
+import array
 import logging
+import operator
 import threading
 import contextlib
 import re
+import time
+import uuid
 
 # Django
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models, transaction, connection
+from django.db.models import F
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.utils.translation import ugettext_lazy as _
 
+# Django-CRUM
+from crum import get_current_user
+
 # AWX
 from awx.api.versioning import reverse
+from awx.main.utils.pglock import advisory_lock
 from django.contrib.auth.models import User # noqa
 from awx.main.models.base import * # noqa
 
@@ -22,6 +33,8 @@ __all__ = [
     'Role',
     'batch_role_ancestor_rebuilding',
     'get_roles_on_resource',
+    'get_accessible_ids',
+    'bump_rbac_generation',
     'ROLE_SINGLETON_SYSTEM_ADMINISTRATOR',
     'ROLE_SINGLETON_SYSTEM_AUDITOR',
     'role_summary_fields_generator'
@@ -32,6 +45,9 @@ logger = logging.getLogger('awx.main.models.rbac')
 ROLE_SINGLETON_SYSTEM_ADMINISTRATOR='system_administrator'
 ROLE_SINGLETON_SYSTEM_AUDITOR='system_auditor'
 
+RBAC_GENERATION_TTL = 1
+RBAC_ACCESSIBLE_IDS_TIMEOUT = 60 * 10
+
 role_names = {
     'system_administrator': _('System Administrator'),
     'system_auditor': _('System Auditor'),
@@ -291,12 +307,17 @@ class Role(models.Model):
 
         global tls
         batch_role_rebuilding = getattr(tls, 'batch_role_rebuilding', False)
+        applying_changes = getattr(tls, 'applying_ancestry_changes', False)
 
-        if batch_role_rebuilding:
+        if batch_role_rebuilding and not applying_changes:
             getattr(tls, 'additions').update(set(additions))
             getattr(tls, 'removals').update(set(removals))
             return
 
+        if settings.AWX_ROLE_ANCESTRY_ASYNC and not applying_changes:
+            Role.log_ancestry_changes(additions, removals)
+            return
+
         cursor = connection.cursor()
         loop_ct = 0
 
@@ -399,6 +420,75 @@ class Role(models.Model):
                     new_removals.update([row[0] for row in cursor.fetchall()])
                 removals = list(new_removals)
 
+        bump_rbac_generation()
+
+
+    @staticmethod
+    def log_ancestry_changes(additions, removals):
+        '''
+        Records the roles whose ancestors need rebuilding, and the user who
+        changed them, for the `apply_role_ancestry_changes` task to rebuild in
+        the background; until it does, that user's own requests apply them
+        (see `apply_pending_ancestry_changes`).
+        '''
+        from awx.main.tasks import apply_role_ancestry_changes
+        user_id = getattr(get_current_user(), 'pk', None)
+        RoleAncestryChange.objects.bulk_create(
+            [RoleAncestryChange(role_id=role_id, user_id=user_id) for role_id in set(additions)] +
+            [RoleAncestryChange(role_id=role_id, user_id=user_id, removal=True) for role_id in set(removals)]
+        )
+        tls.pending_ancestry_roles = getattr(tls, 'pending_ancestry_roles', set()) | set(additions) | set(removals)
+        connection.on_commit(lambda: apply_role_ancestry_changes.delay())
+
+    @staticmethod
+    def _apply_ancestry_changes(changes_qs, batch_size):
+        applied = 0
+        while True:
+            with transaction.atomic():
+                changes = list(changes_qs.select_for_update().order_by('id').values_list(
+                    'id', 'role_id', 'removal')[:batch_size])
+                if not changes:
+                    break
+                additions = set(role_id for pk, role_id, removal in changes if not removal)
+                removals = set(role_id for pk, role_id, removal in changes if removal)
+                tls.applying_ancestry_changes = True
+                try:
+                    Role.rebuild_role_ancestor_list(list(additions), list(removals))
+                finally:
+                    tls.applying_ancestry_changes = False
+                RoleAncestryChange.objects.filter(id__in=[change[0] for change in changes]).delete()
+            applied += len(changes)
+        return applied
+
+    @staticmethod
+    def apply_role_ancestry_changes(batch_size=10000):
+        '''
+        Rebuilds the ancestors of the roles in the change log, a batch at a
+        time, each batch in a single sweep. Returns the number of changes
+        applied.
+        '''
+        with advisory_lock('role_ancestry_lock'):
+            return Role._apply_ancestry_changes(RoleAncestryChange.objects.all(), batch_size)
+
+    @staticmethod
+    def apply_pending_ancestry_changes(user=None):
+        '''
+        Read-your-writes for AWX_ROLE_ANCESTRY_ASYNC: rebuilds the ancestors
+        of the roles this thread logged changes to, and of those `user`
+        changed in earlier requests, that the background task has not
+        applied yet.  The rest of the change log is left to the task.
+        '''
+        if not settings.AWX_ROLE_ANCESTRY_ASYNC:
+            return
+        conditions = []
+        if getattr(tls, 'pending_ancestry_roles', None):
+            conditions.append(models.Q(role_id__in=tls.pending_ancestry_roles))
+            tls.pending_ancestry_roles = set()
+        if getattr(user, 'pk', None):
+            conditions.append(models.Q(user_id=user.pk))
+        if conditions:
+            Role._apply_ancestry_changes(
+                RoleAncestryChange.objects.filter(reduce(operator.or_, conditions)), 10000)
 
     @staticmethod
     def visible_roles(user):
@@ -453,6 +543,39 @@ class RoleAncestorEntry(models.Model):
     object_id       = models.PositiveIntegerField(null=False)
 
 
+class RoleAncestryChange(models.Model):
+    '''
+    A role whose ancestors are yet to be rebuilt, logged in place of
+    rebuilding them when AWX_ROLE_ANCESTRY_ASYNC is enabled.
+    '''
+
+    class Meta:
+        app_label = 'main'
+        db_table = 'main_rbac_role_ancestry_changes'
+
+    # not a foreign key; the role may be deleted before the change is applied
+    role_id = models.PositiveIntegerField(null=False)
+    removal = models.BooleanField(default=False)
+    # not a foreign key either; whose requests apply the change until the
+    # background task does
+    user_id = models.PositiveIntegerField(null=True, default=None, db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class RoleGeneration(models.Model):
+    '''
+    A single row counting the changes to role ancestry and membership,
+    part of the cache key of every user's accessible ids (see
+    `bump_rbac_generation`).
+    '''
+
+    class Meta:
+        app_label = 'main'
+        db_table = 'main_rbac_generation'
+
+    generation = models.BigIntegerField(default=0)
+
+
 def get_roles_on_resource(resource, accessor):
     '''
     Returns a string list of the roles a accessor has for a given resource.
@@ -479,6 +602,88 @@ def get_roles_on_resource(resource, accessor):
     ]
 
 
+def _commit_rbac_generation():
+    updated = RoleGeneration.objects.filter(pk=1).update(generation=F('generation') + 1)
+    if not updated:
+        RoleGeneration.objects.get_or_create(pk=1, defaults={'generation': 1})
+    reset_rbac_generation()
+
+
+def _rbac_generation_pending():
+    return any(func is _commit_rbac_generation for sids, func in connection.run_on_commit)
+
+
+def reset_rbac_generation():
+    '''
+    Forgets the generation this thread last read, so that the next
+    `get_rbac_generation` reads it from the database again; called at the
+    start of every API request.
+    '''
+    tls.rbac_generation = None
+
+
+def get_rbac_generation():
+    '''
+    Returns the RBAC generation from the database, read at most once a
+    request (or every RBAC_GENERATION_TTL seconds outside of requests).
+    While this thread's transaction has changes the database generation
+    does not reflect yet, a generation of its own is returned.
+    '''
+    memo = getattr(tls, 'rbac_generation', None)
+    if memo is None or time.time() - memo[1] > RBAC_GENERATION_TTL:
+        generation = RoleGeneration.objects.filter(pk=1).values_list('generation', flat=True).first() or 0
+        memo = tls.rbac_generation = (generation, time.time())
+    if _rbac_generation_pending():
+        return '{}.{}'.format(memo[0], tls.rbac_pending_generation)
+    return memo[0]
+
+
+def bump_rbac_generation():
+    '''
+    Starts a new generation of cached accessible ids (see
+    `get_accessible_ids`), called whenever role ancestry or role membership
+    changes.
+
+    The generation lives in the database, so a change made on one node
+    invalidates the ids cached by every node.  It is incremented once the
+    transaction commits, so that ids other processes cached from the old
+    data in the meantime are not used, and so that concurrent transactions
+    don't queue up on the counter row.  Until then this thread uses a
+    generation of its own, so the rest of the transaction sees the change.
+    '''
+    tls.rbac_pending_generation = uuid.uuid4().hex
+    if not _rbac_generation_pending():
+        connection.on_commit(_commit_rbac_generation)
+
+
+def get_accessible_ids(user, role_field, content_type_ids, pk_qs):
+    '''
+    Returns the sorted object ids `user` has `role_field` on for the given
+    content types, as selected by `pk_qs`, from the cache when it holds
+    them for the current RBAC generation.  Returns None when the user has
+    more than AWX_RBAC_ACCESSIBLE_ID_CACHE_MAX of them, in which case the
+    subquery is the better filter.
+    '''
+    key = 'awx_rbac_accessible_ids_{}_{}_{}_{}'.format(
+        get_rbac_generation(), user.pk, role_field,
+        '-'.join(str(ct_id) for ct_id in sorted(content_type_ids)))
+    packed = cache.get(key)
+    if packed is None:
+        limit = settings.AWX_RBAC_ACCESSIBLE_ID_CACHE_MAX
+        ids = sorted(set(row[0] for row in pk_qs[:limit + 1]))
+        if len(ids) > limit:
+            packed = False
+        else:
+            # 4 bytes per id, rather than a pickled list of ints
+            packed = array.array('I', ids).tostring()
+        cache.set(key, packed, RBAC_ACCESSIBLE_IDS_TIMEOUT)
+    if packed is False:
+        return None
+    ids = array.array('I')
+    ids.fromstring(packed)
+    return ids.tolist()
+
+
 def role_summary_fields_generator(content_object, role_field):
     global role_descriptions
     global role_names
@@ -4,6 +4,7 @@
 import datetime
 import logging
 import re
+from collections import namedtuple, OrderedDict
 
 import dateutil.rrule
 import dateutil.parser
@@ -12,6 +13,7 @@ from dateutil.zoneinfo import get_zonefile_instance
 
 # Django
 from django.db import models
+from django.db.models import Case, Value, When
 from django.db.models.query import QuerySet
 from django.utils.timezone import now, make_aware
 from django.utils.translation import ugettext_lazy as _
@@ -33,6 +35,11 @@ __all__ = ['Schedule']
 
 UTC_TIMEZONES = {x: tzutc() for x in dateutil.parser.parserinfo().UTCZONE}
 
+# see Schedule.compile_rrule
+CompiledRRule = namedtuple('CompiledRRule', ['rruleset', 'dtstart', 'dtend'])
+COMPILED_RRULE_CACHE_SIZE = 10000
+_compiled_rrules = OrderedDict()
+
 
 class ScheduleFilterMethods(object):
 
@@ -60,6 +67,37 @@ class ScheduleManager(ScheduleFilterMethods, models.Manager):
     def get_queryset(self):
         return ScheduleQuerySet(self.model, using=self._db)
 
+    def advance_next_run(self, schedules, after=None):
+        '''
+        Move the next_run of each of `schedules` to its first occurrence after
+        `after` (default: now), without the full recomputation and
+        notifications of Schedule.save.  The computed fields of the unified
+        job templates involved are updated once per template.
+        '''
+        from awx.main.models.unified_jobs import UnifiedJobTemplate
+        if after is None:
+            after = now()
+        advanced = []
+        for schedule in schedules:
+            try:
+                rruleset = self.model.compile_rrule(schedule.rrule).rruleset
+            except ValueError:
+                logger.exception('Could not advance schedule %s with rrule %s.', schedule.pk, schedule.rrule)
+                continue
+            schedule.next_run = self.model.next_run_after(rruleset, after)
+            advanced.append(schedule)
+        for i in range(0, len(advanced), 500):
+            chunk = advanced[i:i + 500]
+            self.filter(pk__in=[schedule.pk for schedule in chunk]).update(next_run=Case(
+                *[When(pk=schedule.pk, then=Value(schedule.next_run)) for schedule in chunk],
+                output_field=models.DateTimeField()
+            ))
+        template_ids = set(schedule.unified_job_template_id for schedule in advanced)
+        with ignore_inventory_computed_fields():
+            for template in UnifiedJobTemplate.objects.filter(pk__in=template_ids):
+                template.update_computed_fields()
+        return advanced
+
 
 class Schedule(CommonModel, LaunchTimeConfig):
 
@@ -98,6 +136,7 @@ class Schedule(CommonModel, LaunchTimeConfig):
         null=True,
         default=None,
         editable=False,
+        db_index=True,
         help_text=_("The next time that the scheduled action will run.")
     )
 
@@ -209,6 +248,43 @@ class Schedule(CommonModel, LaunchTimeConfig):
                 pass
         return x
 
+    @classmethod
+    def compile_rrule(cls, rrule):
+        '''
+        Parse `rrule` and find its first and (for COUNT and UNTIL rules) last
+        occurrence, once per rrule text; the result is kept for the next
+        time the same schedule is evaluated
+        '''
+        try:
+            compiled = _compiled_rrules.pop(rrule)
+        except KeyError:
+            rruleset = Schedule.rrulestr(rrule)
+            try:
+                dtstart = rruleset[0].astimezone(pytz.utc)
+            except IndexError:
+                dtstart = None
+            dtend = None
+            if 'until' in rrule.lower() or 'count' in rrule.lower():
+                try:
+                    dtend = rruleset[-1].astimezone(pytz.utc)
+                except IndexError:
+                    dtend = None
+            compiled = CompiledRRule(rruleset, dtstart, dtend)
+            while len(_compiled_rrules) >= COMPILED_RRULE_CACHE_SIZE:
+                _compiled_rrules.popitem(last=False)
+        _compiled_rrules[rrule] = compiled
+        return compiled
+
+    @classmethod
+    def next_run_after(cls, rruleset, dt):
+        next_run = rruleset.after(dt)
+        if next_run is not None:
+            if not datetime_exists(next_run):
+                # skip imaginary dates, like 2:30 on DST boundaries
+                next_run = rruleset.after(next_run)
+            next_run = next_run.astimezone(pytz.utc)
+        return next_run
+
     def __unicode__(self):
         return u'%s_t%s_%s_%s' % (self.name, self.unified_job_template.id, self.id, self.next_run)
 
@@ -224,26 +300,10 @@ class Schedule(CommonModel, LaunchTimeConfig):
         return job_kwargs
 
     def update_computed_fields(self):
-        future_rs = Schedule.rrulestr(self.rrule)
-        next_run_actual = future_rs.after(now())
-
-        if next_run_actual is not None:
-            if not datetime_exists(next_run_actual):
-                # skip imaginary dates, like 2:30 on DST boundaries
-                next_run_actual = future_rs.after(next_run_actual)
-            next_run_actual = next_run_actual.astimezone(pytz.utc)
-
-        self.next_run = next_run_actual
-        try:
-            self.dtstart = future_rs[0].astimezone(pytz.utc)
-        except IndexError:
-            self.dtstart = None
-        self.dtend = None
-        if 'until' in self.rrule.lower() or 'count' in self.rrule.lower():
-            try:
-                self.dtend = future_rs[-1].astimezone(pytz.utc)
-            except IndexError:
-                self.dtend = None
+        compiled = Schedule.compile_rrule(self.rrule)
+        self.next_run = Schedule.next_run_after(compiled.rruleset, now())
+        self.dtstart = compiled.dtstart
+        self.dtend = compiled.dtend
         emit_channel_notification('schedules-changed', dict(id=self.id, group_name='schedules'))
         with ignore_inventory_computed_fields():
             self.unified_job_template.update_computed_fields()
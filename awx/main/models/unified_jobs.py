@@ -10,10 +10,12 @@ import re
 import subprocess
 import tempfile
 from collections import OrderedDict
+from datetime import timedelta
 
 # Django
 from django.conf import settings
-from django.db import models, connection
+from django.db import models, connection, transaction
+from django.db.models.query import QuerySet
 from django.core.exceptions import NON_FIELD_ERRORS
 from django.utils.translation import ugettext_lazy as _
 from django.utils.timezone import now
@@ -35,10 +37,12 @@ from awx.main.models.base import * # noqa
 from awx.main.models.mixins import ResourceMixin, TaskManagerUnifiedJobMixin
 from awx.main.utils import (
     encrypt_dict, decrypt_field, _inventory_updates,
-    copy_model_by_class, copy_m2m_relationships,
+    copy_model_by_class, copy_m2m_relationships, bulk_create_m2m,
     get_type_for_model, parse_yaml_or_json
 )
 from awx.main.utils import polymorphic
+from awx.main.utils.cancel import notify_cancel
+from awx.main.utils.partitions import is_partitioned
 from awx.main.constants import ACTIVE_STATES, CAN_CANCEL
 from awx.main.redact import UriCleaner, REPLACE_STR
 from awx.main.consumers import emit_channel_notification
@@ -50,6 +54,10 @@ logger = logging.getLogger('awx.main.models.unified_jobs')
 
 # NOTE: ACTIVE_STATES moved to constants because it is used by parent modules
 
+# how long before a job was created its events may be (by the clocks of the
+# hosts it ran on)
+EVENT_CLOCK_ALLOWANCE = timedelta(days=1)
+
 
 class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, NotificationFieldsModel):
     '''
@@ -324,9 +332,10 @@ class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, Notificatio
         # NOTE: Derived classes should implement
         return NotificationTemplate.objects.none()
 
-    def create_unified_job(self, **kwargs):
+    def _build_unified_job(self, kwargs):
         '''
-        Create a new unified job based on this unified job template.
+        Return a new, unsaved unified job based on this unified job template,
+        along with `kwargs` as amended for creating its relationships.
         '''
         new_job_passwords = kwargs.pop('survey_passwords', {})
         eager_fields = kwargs.pop('_eager_fields', None)
@@ -361,16 +370,30 @@ class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, Notificatio
             unified_job.survey_passwords = new_job_passwords
             kwargs['survey_passwords'] = new_job_passwords  # saved in config object for relaunch
 
-        unified_job.save()
+        return unified_job, kwargs
 
-        # Labels and credentials copied here
+    def _combine_credentials(self, kwargs, template_credentials=None):
         if kwargs.get('credentials'):
             Credential = UnifiedJob._meta.get_field('credentials').related_model
-            cred_dict = Credential.unique_dict(self.credentials.all())
+            if template_credentials is None:
+                template_credentials = self.credentials.all()
+            cred_dict = Credential.unique_dict(template_credentials)
             prompted_dict = Credential.unique_dict(kwargs['credentials'])
             # combine prompted credentials with JT
             cred_dict.update(prompted_dict)
             kwargs['credentials'] = [cred for cred in cred_dict.values()]
+        return kwargs
+
+    def create_unified_job(self, **kwargs):
+        '''
+        Create a new unified job based on this unified job template.
+        '''
+        unified_job, kwargs = self._build_unified_job(kwargs)
+        unified_job.save()
+
+        # Labels and credentials copied here
+        kwargs = self._combine_credentials(kwargs)
+        fields = self._get_unified_job_field_names()
 
         from awx.main.signals import disable_activity_stream
         with disable_activity_stream():
@@ -385,6 +408,79 @@ class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, Notificatio
 
         return unified_job
 
+    def create_unified_jobs(self, launches):
+        '''
+        Create a unified job for each of `launches`, a list of the keyword
+        arguments `create_unified_job` takes, and return them in order.
+
+        Each job is still saved on its own (a multi-table inherited model
+        can't be bulk inserted), but the many-to-many relationships and launch
+        configurations of all of them are inserted together, and this
+        template's own credentials and labels are only read once.
+        '''
+        unified_job_class = self._get_unified_job_class()
+        fields = self._get_unified_job_field_names()
+        m2m_fields = [
+            field_name for field_name in fields
+            if hasattr(self, field_name) and isinstance(self._meta.get_field(field_name), models.ManyToManyField)
+        ]
+        template_credentials = None
+        if 'credentials' in m2m_fields:
+            template_credentials = list(self.credentials.select_related('credential_type'))
+
+        jobs = []
+        with transaction.atomic():
+            for kwargs in launches:
+                kwargs = dict(kwargs)
+                # set per launch by the bulk launch view, which shares one template object
+                deprecated_credential_launch = kwargs.pop(
+                    '_deprecated_credential_launch', getattr(self, '_deprecated_credential_launch', False)
+                )
+                unified_job, kwargs = self._build_unified_job(kwargs)
+                unified_job.save()
+                unified_job._launch_kwargs = self._combine_credentials(kwargs, template_credentials)
+                unified_job._deprecated_credential_launch = deprecated_credential_launch
+                jobs.append(unified_job)
+
+            # Labels and credentials copied here, as in copy_m2m_relationships
+            for field_name in m2m_fields:
+                template_pks = None
+                related = []
+                for unified_job in jobs:
+                    override = unified_job._launch_kwargs.get(field_name)
+                    if isinstance(override, (set, list, QuerySet)):
+                        related.append((unified_job, override))
+                    elif override.__class__.__name__ == 'ManyRelatedManager':
+                        related.append((unified_job, override.values_list('id', flat=True)))
+                    else:
+                        if template_pks is None:
+                            template_pks = list(getattr(self, field_name).values_list('id', flat=True))
+                        related.append((unified_job, template_pks))
+                bulk_create_m2m(unified_job_class._meta.get_field(field_name), related)
+
+            configs = []
+            for unified_job in jobs:
+                kwargs = unified_job._launch_kwargs
+                if 'extra_vars' in kwargs:
+                    unified_job.handle_extra_data(kwargs['extra_vars'])
+                if not unified_job._deprecated_credential_launch:
+                    # Create record of provided prompts for relaunch and rescheduling
+                    config, credentials = unified_job._build_config_from_prompts(kwargs, template_credentials)
+                    if config is not None:
+                        config._prompted_credentials = credentials
+                        configs.append(config)
+            if configs:
+                JobLaunchConfig = UnifiedJob._meta.get_field('launch_config').related_model
+                JobLaunchConfig.objects.bulk_create(configs)
+                if not connection.features.can_return_ids_from_bulk_insert:
+                    config_pks = dict(JobLaunchConfig.objects.filter(job__in=jobs).values_list('job_id', 'pk'))
+                    for config in configs:
+                        config.pk = config_pks[config.job_id]
+                bulk_create_m2m(JobLaunchConfig._meta.get_field('credentials'),
+                                [(config, config._prompted_credentials) for config in configs])
+
+        return jobs
+
     @classmethod
     def get_ask_mapping(cls):
         '''
@@ -529,6 +625,10 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
 
     class Meta:
         app_label = 'main'
+        indexes = [
+            # for cleaning up old jobs
+            models.Index(fields=['created'], name='main_unifiedjob_created_idx'),
+        ]
 
     old_pk = models.PositiveIntegerField(
         null=True,
@@ -539,6 +639,13 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
         default=0,
         editable=False,
     )
+    saved_events = models.PositiveIntegerField(
+        null=True,
+        default=0,
+        editable=False,
+        help_text=_("Number of events from this job that have been saved to "
+                    "the database (null for jobs that predate event counting)."),
+    )
     unified_job_template = models.ForeignKey(
         'UnifiedJobTemplate',
         null=True, # Some jobs can be run without a template.
@@ -631,6 +738,20 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
         editable=False,
         help_text=_("A status field to indicate the state of the job if it wasn't able to run and capture stdout"),
     )
+    phase_timing = JSONField(
+        blank=True,
+        default={},
+        editable=False,
+        help_text=_("Seconds spent in each phase of launching and running this job, from being "
+                    "dispatched by the task manager to its events being saved."),
+    )
+    resource_usage = JSONField(
+        blank=True,
+        default={},
+        editable=False,
+        help_text=_("What the processes run by this job consumed: CPU seconds, block IO bytes, "
+                    "peak resident memory and the number of processes."),
+    )
     start_args = prevent_search(models.TextField(
         blank=True,
         default='',
@@ -862,8 +983,22 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
         Create a launch configuration entry for this job, given prompts
         returns None if it can not be created
         '''
-        if self.unified_job_template is None:
+        config, credentials = self._build_config_from_prompts(kwargs)
+        if config is None:
             return None
+        config.save()
+        if credentials:
+            config.credentials.add(*credentials)
+        return config
+
+    def _build_config_from_prompts(self, kwargs, template_credentials=None):
+        '''
+        Return an unsaved launch configuration for this job, given prompts,
+        and the prompted credentials to relate to it once it is saved.
+        Returns (None, None) if it can not be created
+        '''
+        if self.unified_job_template is None:
+            return None, None
         JobLaunchConfig = self._meta.get_field('launch_config').related_model
         config = JobLaunchConfig(job=self)
         valid_fields = self.unified_job_template.get_ask_mapping().keys()
@@ -881,13 +1016,12 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
             if key == 'extra_vars':
                 key = 'extra_data'
             setattr(config, key, value)
-        config.save()
 
+        if template_credentials is None:
+            template_credentials = self.unified_job_template.credentials.all()
         job_creds = (set(kwargs.get('credentials', [])) -
-                     set(self.unified_job_template.credentials.all()))
-        if job_creds:
-            config.credentials.add(*job_creds)
-        return config
+                     set(template_credentials))
+        return config, job_creds
 
     @property
     def event_class(self):
@@ -917,8 +1051,22 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
             'main_systemjob': 'system_job_id',
         }[tablename]
 
+    @property
+    def event_created_after(self):
+        '''
+        When the event table is partitioned by time, a time the events of this
+        job were created after, so that only the partitions that can hold them
+        are scanned (allowing for the clocks of the hosts it ran on).
+        '''
+        if self.created and is_partitioned(self.event_class._meta.db_table):
+            return self.created - EVENT_CLOCK_ALLOWANCE
+
     def get_event_queryset(self):
-        return self.event_class.objects.filter(**{self.event_parent_key: self.id})
+        qs = self.event_class.objects.filter(**{self.event_parent_key: self.id})
+        created_after = self.event_created_after
+        if created_after:
+            qs = qs.filter(created__gte=created_after)
+        return qs
 
     @property
     def event_processing_finished(self):
@@ -931,6 +1079,9 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
             event_qs = self.get_event_queryset()
         except NotImplementedError:
             return True  # Model without events, such as WFJT
+        if self.saved_events is not None:
+            # maintained in batches by the callback receiver
+            return self.saved_events >= self.emitted_events
         return self.emitted_events == event_qs.count()
 
     def result_stdout_raw_handle(self, enforce_max_bytes=True):
@@ -999,11 +1150,14 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
                     if total > max_supported:
                         raise StdoutMaxBytesExceeded(total, max_supported)
 
+                created_after = self.event_created_after
+                created_after = " and created >= '{}'".format(created_after.isoformat()) if created_after else ''
                 cursor.copy_expert(
-                    "copy (select stdout from {} where {}={} order by start_line) to stdout".format(
+                    "copy (select stdout from {} where {}={}{} order by start_line) to stdout".format(
                         self._meta.db_table + 'event',
                         self.event_parent_key,
-                        self.id
+                        self.id,
+                        created_after
                     ),
                     fd
                 )
@@ -1231,10 +1385,16 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
         args = [self.pk]
         if ig.controller_id:
             if self.supports_isolation():  # case of jobs and ad hoc commands
-                isolated_instance = ig.instances.order_by('-capacity').first()
-                args.append(isolated_instance.hostname)
+                if self.execution_node:
+                    args.append(self.execution_node)
+                else:
+                    isolated_instance = ig.instances.order_by('-capacity').first()
+                    args.append(isolated_instance.hostname)
             else:  # proj & inv updates, system jobs run on controller
-                queue = ig.controller.name
+                queue = self.execution_node or ig.controller.name
+        elif self.execution_node:
+            # placed on a node by the task manager; every node consumes a queue named after itself
+            queue = self.execution_node
         kwargs['queue'] = queue
         task_class().apply_async(args, opts, **kwargs)
 
@@ -1249,23 +1409,9 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
 
     def signal_start(self, **kwargs):
         """Notify the task runner system to begin work on this task."""
-
-        # Sanity check: Are we able to start the job? If not, do not attempt
-        # to do so.
-        if not self.can_start:
+        if not self.mark_pending(**kwargs):
             return False
 
-        # Get any passwords or other data that are prerequisites to running
-        # the job.
-        needed = self.get_passwords_needed_to_start()
-        opts = dict([(field, kwargs.get(field, '')) for field in needed])
-        if not all(opts.values()):
-            return False
-
-        # Save the pending status, and inform the SocketIO listener.
-        self.update_fields(start_args=json.dumps(kwargs), status='pending')
-        self.websocket_emit_status("pending")
-
         from awx.main.scheduler.tasks import run_job_launch
         connection.on_commit(lambda: run_job_launch.delay(self.id))
 
@@ -1282,6 +1428,29 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
         # Done!
         return True
 
+    def mark_pending(self, **kwargs):
+        """
+        Move this task to pending without waking the task manager, for
+        callers which start many tasks and wake it once for all of them.
+        """
+
+        # Sanity check: Are we able to start the job? If not, do not attempt
+        # to do so.
+        if not self.can_start:
+            return False
+
+        # Get any passwords or other data that are prerequisites to running
+        # the job.
+        needed = self.get_passwords_needed_to_start()
+        opts = dict([(field, kwargs.get(field, '')) for field in needed])
+        if not all(opts.values()):
+            return False
+
+        # Save the pending status, and inform the SocketIO listener.
+        self.update_fields(start_args=json.dumps(kwargs), status='pending')
+        self.websocket_emit_status("pending")
+        return True
+
     @property
     def can_cancel(self):
         return bool(self.status in CAN_CANCEL)
@@ -1345,6 +1514,7 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
                     cancel_fields.append('job_explanation')
                 self.save(update_fields=cancel_fields)
                 self.websocket_emit_status("canceled")
+                notify_cancel(self.pk)
             if settings.BROKER_URL.startswith('amqp://'):
                 self._force_cancel()
         return self.cancel_flag
@@ -1,7 +1,7 @@
 # Copyright (c) 2015 Ansible, Inc.
 # All Rights Reserved.
 
-from django.db.models.signals import pre_save, post_save, pre_delete, m2m_changed
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, m2m_changed
 
 
 class ActivityStreamRegistrar(object):
@@ -11,10 +11,14 @@ class ActivityStreamRegistrar(object):
 
     def connect(self, model):
         # Always register model; the signal handlers will check if activity stream is enabled.
-        from awx.main.signals import activity_stream_create, activity_stream_update, activity_stream_delete, activity_stream_associate
+        from awx.main.signals import (
+            activity_stream_snapshot, activity_stream_create, activity_stream_update, activity_stream_delete,
+            activity_stream_associate
+        )
 
         if model not in self.models:
             self.models.append(model)
+            post_init.connect(activity_stream_snapshot, sender=model, dispatch_uid=str(self.__class__) + str(model) + "_snapshot")
             post_save.connect(activity_stream_create, sender=model, dispatch_uid=str(self.__class__) + str(model) + "_create")
             pre_save.connect(activity_stream_update, sender=model, dispatch_uid=str(self.__class__) + str(model) + "_update")
             pre_delete.connect(activity_stream_delete, sender=model, dispatch_uid=str(self.__class__) + str(model) + "_delete")
@@ -29,6 +33,7 @@ class ActivityStreamRegistrar(object):
 
     def disconnect(self, model):
         if model in self.models:
+            post_init.disconnect(dispatch_uid=str(self.__class__) + str(model) + "_snapshot")
             post_save.disconnect(dispatch_uid=str(self.__class__) + str(model) + "_create")
             pre_save.disconnect(dispatch_uid=str(self.__class__) + str(model) + "_update")
             pre_delete.disconnect(dispatch_uid=str(self.__class__) + str(model) + "_delete")
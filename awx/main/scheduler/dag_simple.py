@@ -1,4 +1,8 @@
 
+# Python
+from collections import defaultdict
+
+# AWX
 from awx.main.models import (
     Job,
     AdHocCommand,
@@ -9,17 +13,25 @@ from awx.main.models import (
 
 
 class SimpleDAG(object):
-    ''' A simple implementation of a directed acyclic graph '''
+    '''
+    A simple implementation of a directed acyclic graph
+
+    Nodes are indexed by their object and edges are kept as adjacency lists
+    in both directions, overall and per label, so looking up a node or its
+    neighbours doesn't scan the whole graph.
+    '''
 
     def __init__(self):
         self.nodes = []
         self.edges = []
+        self.node_obj_to_node_index = dict()
+        self.node_from_edges = defaultdict(list)
+        self.node_to_edges = defaultdict(list)
+        self.node_from_edges_by_label = defaultdict(lambda: defaultdict(list))
+        self.node_to_edges_by_label = defaultdict(lambda: defaultdict(list))
 
     def __contains__(self, obj):
-        for node in self.nodes:
-            if node['node_object'] == obj:
-                return True
-        return False
+        return obj in self.node_obj_to_node_index
 
     def __len__(self):
         return len(self.nodes)
@@ -66,6 +78,7 @@ class SimpleDAG(object):
 
     def add_node(self, obj, metadata=None):
         if self.find_ord(obj) is None:
+            self.node_obj_to_node_index[obj] = len(self.nodes)
             self.nodes.append(dict(node_object=obj, metadata=metadata))
 
     def add_edge(self, from_obj, to_obj, label=None):
@@ -74,51 +87,36 @@ class SimpleDAG(object):
         if from_obj_ord is None or to_obj_ord is None:
             raise LookupError("Object not found")
         self.edges.append((from_obj_ord, to_obj_ord, label))
+        self.node_from_edges[from_obj_ord].append(to_obj_ord)
+        self.node_to_edges[to_obj_ord].append(from_obj_ord)
+        self.node_from_edges_by_label[label][from_obj_ord].append(to_obj_ord)
+        self.node_to_edges_by_label[label][to_obj_ord].append(from_obj_ord)
 
     def add_edges(self, edgelist):
         for edge_pair in edgelist:
             self.add_edge(edge_pair[0], edge_pair[1], edge_pair[2])
 
     def find_ord(self, obj):
-        for idx in range(len(self.nodes)):
-            if obj == self.nodes[idx]['node_object']:
-                return idx
-        return None
+        return self.node_obj_to_node_index.get(obj, None)
 
     def get_dependencies(self, obj, label=None):
-        antecedents = []
         this_ord = self.find_ord(obj)
-        for node, dep, lbl in self.edges:
-            if label:
-                if node == this_ord and lbl == label:
-                    antecedents.append(self.nodes[dep])
-            else:
-                if node == this_ord:
-                    antecedents.append(self.nodes[dep])
-        return antecedents
+        if label:
+            deps = self.node_from_edges_by_label[label].get(this_ord, [])
+        else:
+            deps = self.node_from_edges.get(this_ord, [])
+        return [self.nodes[index] for index in deps]
 
     def get_dependents(self, obj, label=None):
-        decendents = []
         this_ord = self.find_ord(obj)
-        for node, dep, lbl in self.edges:
-            if label:
-                if dep == this_ord and lbl == label:
-                    decendents.append(self.nodes[node])
-            else:
-                if dep == this_ord:
-                    decendents.append(self.nodes[node])
-        return decendents
+        if label:
+            deps = self.node_to_edges_by_label[label].get(this_ord, [])
+        else:
+            deps = self.node_to_edges.get(this_ord, [])
+        return [self.nodes[index] for index in deps]
 
     def get_leaf_nodes(self):
-        leafs = []
-        for n in self.nodes:
-            if len(self.get_dependencies(n['node_object'])) < 1:
-                leafs.append(n)
-        return leafs
+        return [n for index, n in enumerate(self.nodes) if not self.node_from_edges.get(index)]
 
     def get_root_nodes(self):
-        roots = []
-        for n in self.nodes:
-            if len(self.get_dependents(n['node_object'])) < 1:
-                roots.append(n)
-        return roots
+        return [n for index, n in enumerate(self.nodes) if not self.node_to_edges.get(index)]
@@ -1,4 +1,7 @@
 
+# Django
+from django.db.models import F
+
 # AWX
 from awx.main.scheduler.dag_simple import SimpleDAG
 
@@ -11,7 +14,11 @@ class WorkflowDAG(SimpleDAG):
 
     def _init_graph(self, workflow_job):
         node_qs = workflow_job.workflow_job_nodes
-        workflow_nodes = node_qs.prefetch_related('success_nodes', 'failure_nodes', 'always_nodes').all()
+        # the status of each node's job comes along with the nodes, so walking
+        # the graph doesn't need a query per job
+        workflow_nodes = node_qs.prefetch_related(
+            'success_nodes', 'failure_nodes', 'always_nodes'
+        ).annotate(job_status=F('job__status')).all()
         for workflow_node in workflow_nodes:
             self.add_node(workflow_node)
 
@@ -28,35 +35,42 @@ class WorkflowDAG(SimpleDAG):
 
         for index, n in enumerate(nodes):
             obj = n['node_object']
-            job = obj.job
+            job_status = self.get_job_status(obj)
 
-            if not job:
+            if not obj.job_id:
                 nodes_found.append(n)
             # Job is about to run or is running. Hold our horses and wait for
             # the job to finish. We can't proceed down the graph path until we
             # have the job result.
-            elif job.status not in ['failed', 'successful']:
+            elif job_status not in ['failed', 'successful']:
                 continue
-            elif job.status == 'failed':
+            elif job_status == 'failed':
                 children_failed = self.get_dependencies(obj, 'failure_nodes')
                 children_always = self.get_dependencies(obj, 'always_nodes')
                 children_all = children_failed + children_always
                 nodes.extend(children_all)
-            elif job.status == 'successful':
+            elif job_status == 'successful':
                 children_success = self.get_dependencies(obj, 'success_nodes')
                 children_always = self.get_dependencies(obj, 'always_nodes')
                 children_all = children_success + children_always
                 nodes.extend(children_all)
         return [n['node_object'] for n in nodes_found]
 
+    def get_job_status(self, obj):
+        if not obj.job_id:
+            return None
+        if hasattr(obj, 'job_status'):
+            return obj.job_status
+        return obj.job.status
+
     def cancel_node_jobs(self):
         for n in self.nodes:
             obj = n['node_object']
-            job = obj.job
-
-            if not job:
+            if not obj.job_id:
                 continue
-            elif job.can_cancel:
+
+            job = obj.job
+            if job.can_cancel:
                 job.cancel()
 
     def is_workflow_done(self):
@@ -66,29 +80,29 @@ class WorkflowDAG(SimpleDAG):
 
         for index, n in enumerate(nodes):
             obj = n['node_object']
-            job = obj.job
+            job_status = self.get_job_status(obj)
 
-            if obj.unified_job_template is None:
+            if obj.unified_job_template_id is None:
                 continue
-            elif not job:
+            elif not obj.job_id:
                 return False, False
 
             children_success = self.get_dependencies(obj, 'success_nodes')
             children_failed = self.get_dependencies(obj, 'failure_nodes')
             children_always = self.get_dependencies(obj, 'always_nodes')
-            if not is_failed and job.status != 'successful':
+            if not is_failed and job_status != 'successful':
                 children_all = children_success + children_failed + children_always
                 for child in children_all:
-                    if child['node_object'].job:
+                    if child['node_object'].job_id:
                         break
                 else:
-                    is_failed = True if children_all else job.status in ['failed', 'canceled', 'error']
+                    is_failed = True if children_all else job_status in ['failed', 'canceled', 'error']
 
-            if job.status in ['canceled', 'error']:
+            if job_status in ['canceled', 'error']:
                 continue
-            elif job.status == 'failed':
+            elif job_status == 'failed':
                 nodes.extend(children_failed + children_always)
-            elif job.status == 'successful':
+            elif job_status == 'successful':
                 nodes.extend(children_success + children_always)
             else:
                 # Job is about to run or is running. Hold our horses and wait for
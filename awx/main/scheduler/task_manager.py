@@ -34,7 +34,8 @@ from awx.main.models import (
 )
 from awx.main.scheduler.dag_workflow import WorkflowDAG
 from awx.main.utils.pglock import advisory_lock
-from awx.main.utils import get_type_for_model
+from awx.main.utils import task_registry
+from awx.main.utils import get_type_for_model, PhaseTimer
 from awx.main.signals import disable_activity_stream
 
 from awx.main.scheduler.dependency_graph import DependencyGraph
@@ -47,15 +48,25 @@ from celery.app.control import Inspect
 
 logger = logging.getLogger('awx.main.scheduler')
 
+# workflow jobs whose node jobs changed this long before the last pass are
+# evaluated again, in case those changes hadn't been committed yet
+WORKFLOW_CHANGE_MARGIN = timedelta(seconds=60)
+
 
 class TaskManager():
 
     def __init__(self):
         self.graph = dict()
+        self.instances = dict()
         for rampart_group in InstanceGroup.objects.prefetch_related('instances'):
             self.graph[rampart_group.name] = dict(graph=DependencyGraph(rampart_group.name),
                                                   capacity_total=rampart_group.capacity,
-                                                  consumed_capacity=0)
+                                                  consumed_capacity=0,
+                                                  instances=[])
+            for instance in rampart_group.instances.all():
+                self.graph[rampart_group.name]['instances'].append(instance.hostname)
+                self.instances[instance.hostname] = dict(capacity_total=instance.capacity,
+                                                         consumed_capacity=0)
 
     def is_job_blocked(self, task):
         # TODO: I'm not happy with this, I think blocking behavior should be decided outside of the dependency graph
@@ -157,6 +168,26 @@ class TaskManager():
 
         return (active_task_queues, queues)
 
+    '''
+    Tasks that nodes have recorded as running on their Instance with their
+    heartbeat, and the time of the oldest record
+
+    {
+        "ec2-54-204-222-62.compute-1.amazonaws.com": set([
+            "5238466a-f8c7-43b3-9180-5b78e9da8304",
+            ...
+        ])
+    }
+    '''
+    def get_registered_tasks(self):
+        hostnames = Instance.objects.values_list('hostname', flat=True)
+        registered = task_registry.get_running_tasks(hostnames)
+        if not registered:
+            return (None, None)
+        oldest = min(published for published, _ in registered.values())
+        queues = dict((hostname, task_ids) for hostname, (_, task_ids) in registered.items())
+        return (oldest, queues)
+
     def get_latest_project_update_tasks(self, all_sorted_tasks):
         project_ids = Set()
         for task in all_sorted_tasks:
@@ -176,6 +207,29 @@ class TaskManager():
                                WorkflowJob.objects.filter(status='running')]
         return graph_workflow_jobs
 
+    def get_changed_workflow_jobs(self):
+        '''
+        Running workflow jobs which could have progressed since the last
+        pass: those which were modified themselves (started, canceled), or
+        which have a node job that started or finished (jobs are updated
+        with `modified` in update_fields, which leaves it alone).  All running
+        workflow jobs are evaluated every
+        AWX_WORKFLOW_FULL_EVALUATION_INTERVAL seconds regardless.
+        '''
+        now = tz_now()
+        last = cache.get('last_workflow_progression')
+        full_interval = timedelta(seconds=settings.AWX_WORKFLOW_FULL_EVALUATION_INTERVAL)
+        if last is None or now - last['full'] >= full_interval:
+            cache.set('last_workflow_progression', {'since': now, 'full': now})
+            return self.get_running_workflow_jobs()
+        since = last['since'] - WORKFLOW_CHANGE_MARGIN
+        cache.set('last_workflow_progression', {'since': now, 'full': last['full']})
+        return [wf for wf in WorkflowJob.objects.filter(status='running').filter(
+            Q(modified__gte=since) |
+            Q(workflow_job_nodes__job__started__gte=since) |
+            Q(workflow_job_nodes__job__finished__gte=since)
+        ).distinct()]
+
     def get_inventory_source_tasks(self, all_sorted_tasks):
         inventory_ids = Set()
         for task in all_sorted_tasks:
@@ -268,12 +322,23 @@ class TaskManager():
             else:
                 task.instance_group = rampart_group
                 logger.info('Submitting %s to instance group %s.', task.log_format, task.instance_group_id)
+            if task.instance_group is not None:
+                task.execution_node = self.place_task(task, task.instance_group.name)
+                if task.execution_node:
+                    logger.info('Placed %s on %s (remaining_capacity=%s).', task.log_format, task.execution_node,
+                                self.get_remaining_instance_capacity(task.execution_node))
+            # the rest of the launch is timed by BaseTask.run
+            timer = PhaseTimer()
+            timer.record('scheduler_wait', (tz_now() - task.created).total_seconds())
+            task.phase_timing = timer.timing
             with disable_activity_stream():
                 task.celery_task_id = str(uuid.uuid4())
                 task.save()
 
             if rampart_group is not None:
                 self.consume_capacity(task, rampart_group.name)
+            if task.execution_node:
+                self.instances[task.execution_node]['consumed_capacity'] += task.task_impact
 
         def post_commit():
             task.websocket_emit_status(task.status)
@@ -521,8 +586,13 @@ class TaskManager():
             return
 
         logger.debug("Failing inconsistent running jobs.")
-        celery_task_start_time = tz_now()
-        active_task_queues, active_queues = self.get_active_tasks()
+        if settings.AWX_RUNNING_TASK_REGISTRY:
+            # only jobs which were already running when every node published
+            # its running tasks can be judged
+            celery_task_start_time, active_queues = self.get_registered_tasks()
+        else:
+            celery_task_start_time = tz_now()
+            active_task_queues, active_queues = self.get_active_tasks()
         cache.set('last_celery_task_cleanup', tz_now())
 
         if active_queues is None:
@@ -576,6 +646,43 @@ class TaskManager():
 
     def calculate_capacity_consumed(self, tasks):
         self.graph = InstanceGroup.objects.capacity_values(tasks=tasks, graph=self.graph)
+        for instance in self.instances.values():
+            instance['consumed_capacity'] = 0
+        for task in tasks:
+            if task.execution_node in self.instances:
+                self.instances[task.execution_node]['consumed_capacity'] += task.task_impact
+
+    def place_task(self, task, instance_group):
+        '''
+        Pick the node in `instance_group` which should run `task`, according
+        to AWX_INSTANCE_PLACEMENT:
+
+         - 'most_remaining': the node with the most remaining capacity
+         - 'best_fit': the node with the least remaining capacity that still
+           fits the task, so that large jobs can find room elsewhere; the node
+           with the most remaining capacity if none fit
+
+        Returns '' (any node in the group may run the task) if placement is
+        disabled or the group has no node with capacity.
+        '''
+        policy = settings.AWX_INSTANCE_PLACEMENT
+        if not policy or instance_group not in self.graph:
+            return ''
+        candidates = [
+            (self.get_remaining_instance_capacity(hostname), hostname)
+            for hostname in self.graph[instance_group].get('instances', [])
+            if self.instances[hostname]['capacity_total'] > 0
+        ]
+        if not candidates:
+            return ''
+        if policy == 'best_fit':
+            fits = [c for c in candidates if c[0] >= task.task_impact]
+            if fits:
+                return min(fits)[1]
+        return max(candidates)[1]
+
+    def get_remaining_instance_capacity(self, hostname):
+        return (self.instances[hostname]['capacity_total'] - self.instances[hostname]['consumed_capacity'])
 
     def would_exceed_capacity(self, task, instance_group):
         current_capacity = self.graph[instance_group]['consumed_capacity']
@@ -603,6 +710,11 @@ class TaskManager():
         pending_tasks = filter(lambda t: t.status in 'pending', all_sorted_tasks)
         self.process_pending_tasks(pending_tasks)
 
+        for hostname in sorted(self.instances):
+            logger.debug(six.text_type('Instance {} consumed_capacity={} remaining_capacity={}').format(
+                         hostname, self.instances[hostname]['consumed_capacity'],
+                         self.get_remaining_instance_capacity(hostname)))
+
     def _schedule(self):
         finished_wfjs = []
         all_sorted_tasks = self.get_tasks()
@@ -616,7 +728,7 @@ class TaskManager():
 
             self.all_inventory_sources = self.get_inventory_source_tasks(all_sorted_tasks)
 
-            running_workflow_tasks = self.get_running_workflow_jobs()
+            running_workflow_tasks = self.get_changed_workflow_jobs()
             finished_wfjs = self.process_finished_workflow_jobs(running_workflow_tasks)
 
             self.spawn_workflow_graph_jobs(running_workflow_tasks)
@@ -9,6 +9,7 @@ import json
 
 # Django
 from django.conf import settings
+from django.db import connection
 from django.db.models.signals import (
     post_init,
     post_save,
@@ -32,7 +33,8 @@ from awx.main.models import * # noqa
 from django.contrib.sessions.models import Session
 from awx.api.serializers import * # noqa
 from awx.main.constants import TOKEN_CENSOR
-from awx.main.utils import model_instance_diff, model_to_dict, camelcase_to_underscore
+from awx.main.utils import model_instance_diff, model_to_dict, camelcase_to_underscore, bulk_create_m2m
+from awx.main.utils.common import get_allowed_fields
 from awx.main.utils import ignore_inventory_computed_fields, ignore_inventory_group_removal, _inventory_updates
 from awx.main.tasks import update_inventory_computed_fields
 from awx.main.fields import (
@@ -161,6 +163,12 @@ def rebuild_role_ancestor_list(reverse, model, instance, pk_set, action, **kwarg
             model.rebuild_role_ancestor_list([], [instance.id])
 
 
+def bump_rbac_generation_on_membership_change(action, **kwargs):
+    'When users are added to or removed from a role, what they can access changes'
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        bump_rbac_generation()
+
+
 def sync_superuser_status_to_rbac(instance, **kwargs):
     'When the is_superuser flag is changed on a user, reflect that in the membership of the System Admnistrator role'
     update_fields = kwargs.get('update_fields', None)
@@ -250,6 +258,7 @@ post_save.connect(emit_project_update_event_detail, sender=ProjectUpdateEvent)
 post_save.connect(emit_inventory_update_event_detail, sender=InventoryUpdateEvent)
 post_save.connect(emit_system_job_event_detail, sender=SystemJobEvent)
 m2m_changed.connect(rebuild_role_ancestor_list, Role.parents.through)
+m2m_changed.connect(bump_rbac_generation_on_membership_change, Role.members.through)
 m2m_changed.connect(rbac_activity_stream, Role.members.through)
 m2m_changed.connect(rbac_activity_stream, Role.parents.through)
 post_save.connect(sync_superuser_status_to_rbac, sender=User)
@@ -368,6 +377,101 @@ def disable_activity_stream():
         activity_stream_enabled.enabled = previous_value
 
 
+class ActivityStreamWriter(threading.local):
+    '''
+    Writes activity stream entries, along with the objects they relate to.
+
+    With ACTIVITY_STREAM_BATCH_WRITES, the entries recorded in a transaction
+    are held and written in bulk when it commits, or whenever
+    ACTIVITY_STREAM_BATCH_SIZE of them are waiting.  The entries held are
+    those of one savepoint; entering or leaving a savepoint writes them (if
+    it was not rolled back) and starts a new batch, so entries never outlive
+    a rollback of the changes they record.
+    '''
+
+    def __init__(self):
+        self.entries = []
+        # the on-commit callback of the batch held, and where it is in the
+        # connection's on-commit callbacks
+        self.batch = None
+        self.batch_index = None
+        self.savepoint_ids = None
+
+    def write(self, entry, related=()):
+        '''
+        Write `entry` and relate it to `related`, (ActivityStream field name,
+        object) pairs.
+        '''
+        if not connection.in_atomic_block or not settings.ACTIVITY_STREAM_BATCH_WRITES:
+            self.write_entries([(entry, related)])
+            return
+        if self.savepoint_ids != connection.savepoint_ids or not self.batch_alive():
+            self.flush()
+            self.start_batch()
+        self.entries.append((entry, related))
+        if len(self.entries) >= settings.ACTIVITY_STREAM_BATCH_SIZE:
+            self.flush()
+
+    def start_batch(self):
+        def flush_batch():
+            if self.batch is flush_batch:
+                entries, self.entries = self.entries, []
+                self.batch = None
+                self.write_entries(entries, held=True)
+        self.batch = flush_batch
+        self.batch_index = len(connection.run_on_commit)
+        self.savepoint_ids = list(connection.savepoint_ids)
+        connection.on_commit(flush_batch)
+
+    def batch_alive(self):
+        # rolling back discards the on-commit callbacks registered since
+        if self.batch is None:
+            return False
+        callbacks = connection.run_on_commit
+        if self.batch_index < len(callbacks) and callbacks[self.batch_index][1] is self.batch:
+            return True
+        return any(func is self.batch for sids, func in callbacks)
+
+    def flush(self):
+        '''
+        Write the entries held now, unless they were rolled back.
+        '''
+        entries, self.entries = self.entries, []
+        if entries and self.batch_alive():
+            self.write_entries(entries, held=True)
+
+    def write_entries(self, entries, held=False):
+        if len(entries) > 1 and connection.features.can_return_ids_from_bulk_insert:
+            ActivityStream.objects.bulk_create([entry for entry, related in entries])
+            if post_save.has_listeners(ActivityStream):
+                for entry, related in entries:
+                    post_save.send(sender=ActivityStream, instance=entry, created=True, update_fields=None,
+                                   raw=False, using=ActivityStream.objects.db)
+        else:
+            for entry, related in entries:
+                entry.save()
+        links = {}
+        for entry, related in entries:
+            for field_name, obj in related:
+                links.setdefault(field_name, {}).setdefault(entry, []).append(obj)
+        for field_name, related_by_entry in links.items():
+            field = ActivityStream._meta.get_field(field_name)
+            if held:
+                # entries are not related to objects deleted since they were
+                # recorded, as the relations would have been deleted with them
+                pks = set(obj.pk for objs in related_by_entry.values() for obj in objs)
+                pks.discard(None)
+                existing = set(field.related_model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+                related_by_entry = dict(
+                    (entry, [obj for obj in objs if obj.pk in existing])
+                    for entry, objs in related_by_entry.items()
+                )
+            bulk_create_m2m(field, related_by_entry.items())
+
+
+activity_stream_writer = ActivityStreamWriter()
+
+
 @contextlib.contextmanager
 def disable_computed_fields():
     post_save.disconnect(emit_update_inventory_on_created_or_deleted, sender=Host)
@@ -412,7 +516,74 @@ model_serializer_mapping = {
 }
 
 
+activity_stream_fields_by_model = {}
+
+
+def activity_stream_fields(instance):
+    '''
+    The concrete fields of an instance that model_instance_diff compares
+    when it is updated, and its primary key.
+    '''
+    model = type(instance)
+    if model not in activity_stream_fields_by_model:
+        allowed_fields = set(get_allowed_fields(instance, model_serializer_mapping))
+        activity_stream_fields_by_model[model] = [
+            f for f in model._meta.concrete_fields if f.primary_key or f.name in allowed_fields
+        ]
+    return activity_stream_fields_by_model[model]
+
+
+def field_values(instance, fields):
+    values = {}
+    for field in fields:
+        if field.attname in instance.__dict__:
+            value = instance.__dict__[field.attname]
+            # JSON values may be changed in place, and can be large; they are
+            # fetched again if needed rather than copied on every load
+            if not isinstance(value, (dict, list)):
+                values[field.attname] = value
+    return values
+
+
+def activity_stream_snapshot(sender, instance, **kwargs):
+    '''
+    Remember the values an instance was loaded with of the fields
+    activity_stream_update diffs, which it diffs against (rather than
+    fetching the row again) if the instance is saved.
+    '''
+    if instance.pk is not None and activity_stream_enabled:
+        instance._activity_stream_snapshot = field_values(instance, activity_stream_fields(instance))
+
+
+def update_activity_stream_snapshot(instance, update_fields=None):
+    if not activity_stream_enabled:
+        instance.__dict__.pop('_activity_stream_snapshot', None)
+    elif update_fields and hasattr(instance, '_activity_stream_snapshot'):
+        fields = [f for f in activity_stream_fields(instance) if f.name in update_fields or f.attname in update_fields]
+        instance._activity_stream_snapshot.update(field_values(instance, fields))
+    else:
+        instance._activity_stream_snapshot = field_values(instance, activity_stream_fields(instance))
+
+
+def activity_stream_original(sender, instance):
+    '''
+    The instance as last loaded or saved, or None if it no longer exists.
+    Fields missing from its snapshot are deferred, so they are fetched only
+    if the diff needs them.
+    '''
+    snapshot = getattr(instance, '_activity_stream_snapshot', None)
+    # instances made with a primary key rather than loaded are not snapshots
+    if snapshot is not None and not instance._state.adding and sender._meta.pk.attname in snapshot:
+        fields = [f for f in sender._meta.concrete_fields if f.attname in snapshot]
+        return sender.from_db(instance._state.db, [f.attname for f in fields], [snapshot[f.attname] for f in fields])
+    try:
+        return sender.objects.get(id=instance.id)
+    except sender.DoesNotExist:
+        return None
+
+
 def activity_stream_create(sender, instance, created, **kwargs):
+    update_activity_stream_snapshot(instance, kwargs.get('update_fields'))
     if created and activity_stream_enabled:
         # TODO: remove deprecated_group conditional in 3.3
         # Skip recording any inventory source directly associated with a group.
@@ -438,11 +609,10 @@ def activity_stream_create(sender, instance, created, **kwargs):
         #      it might actually be a good idea to remove all of these FK references since
         #      we don't really use them anyway.
         if instance._meta.model_name != 'setting':  # Is not conf.Setting instance
-            activity_entry.save()
-            getattr(activity_entry, object1).add(instance)
+            activity_stream_writer.write(activity_entry, [(object1, instance)])
         else:
             activity_entry.setting = conf_to_dict(instance)
-            activity_entry.save()
+            activity_stream_writer.write(activity_entry)
 
 
 def activity_stream_update(sender, instance, **kwargs):
@@ -450,9 +620,8 @@ def activity_stream_update(sender, instance, **kwargs):
         return
     if not activity_stream_enabled:
         return
-    try:
-        old = sender.objects.get(id=instance.id)
-    except sender.DoesNotExist:
+    old = activity_stream_original(sender, instance)
+    if old is None:
         return
 
     new = instance
@@ -469,11 +638,10 @@ def activity_stream_update(sender, instance, **kwargs):
         changes=json.dumps(changes),
         actor=get_current_user_or_none())
     if instance._meta.model_name != 'setting':  # Is not conf.Setting instance
-        activity_entry.save()
-        getattr(activity_entry, object1).add(instance)
+        activity_stream_writer.write(activity_entry, [(object1, instance)])
     else:
         activity_entry.setting = conf_to_dict(instance)
-        activity_entry.save()
+        activity_stream_writer.write(activity_entry)
 
 
 def activity_stream_delete(sender, instance, **kwargs):
@@ -501,7 +669,7 @@ def activity_stream_delete(sender, instance, **kwargs):
         changes=json.dumps(changes),
         object1=object1,
         actor=get_current_user_or_none())
-    activity_entry.save()
+    activity_stream_writer.write(activity_entry)
 
 
 def activity_stream_associate(sender, instance, **kwargs):
@@ -555,9 +723,7 @@ def activity_stream_associate(sender, instance, **kwargs):
                 object2=object2,
                 object_relationship_type=obj_rel,
                 actor=get_current_user_or_none())
-            activity_entry.save()
-            getattr(activity_entry, object1).add(obj1)
-            getattr(activity_entry, object2).add(obj2_actual)
+            related = [(object1, obj1), (object2, obj2_actual)]
 
             # Record the role for RBAC changes
             if 'role' in kwargs:
@@ -570,11 +736,11 @@ def activity_stream_associate(sender, instance, **kwargs):
                 # If the m2m is from the User side we need to
                 # set the content_object of the Role for our entry.
                 if type(instance) == User and role.content_object is not None:
-                    getattr(activity_entry, role.content_type.name.replace(' ', '_')).add(role.content_object)
+                    related.append((role.content_type.name.replace(' ', '_'), role.content_object))
 
-                activity_entry.role.add(role)
+                related.append(('role', role))
                 activity_entry.object_relationship_type = obj_rel
-                activity_entry.save()
+            activity_stream_writer.write(activity_entry, related)
 
 
 @receiver(current_user_getter)
@@ -29,11 +29,11 @@ except Exception:
 
 # Celery
 from celery import Task, shared_task, Celery
-from celery.signals import celeryd_init, worker_shutdown, worker_ready, celeryd_after_setup
+from celery.signals import celeryd_init, worker_shutdown, worker_ready, celeryd_after_setup, task_prerun, task_postrun
 
 # Django
 from django.conf import settings
-from django.db import transaction, DatabaseError, IntegrityError
+from django.db import transaction, DatabaseError, IntegrityError, connection
 from django.db.models.fields.related import ForeignKey
 from django.utils.timezone import now, timedelta
 from django.utils.encoding import smart_str
@@ -58,11 +58,16 @@ from awx.main.expect import run, isolated_manager
 from awx.main.utils import (get_ansible_version, get_ssh_version, decrypt_field, update_scm_url,
                             check_proot_installed, build_proot_temp_dir, get_licenser,
                             wrap_args_with_proot, OutputEventFilter, OutputVerboseFilter, ignore_inventory_computed_fields,
-                            ignore_inventory_group_removal, get_type_for_model, extract_ansible_vars)
+                            ignore_inventory_group_removal, get_type_for_model, extract_ansible_vars,
+                            PhaseTimer)
 from awx.main.utils.safe_yaml import safe_dump, sanitize_jinja
 from awx.main.utils.reload import stop_local_services
 from awx.main.utils.pglock import advisory_lock
+from awx.main.utils.partitions import check_partitions_ahead, create_partitions, is_partitioned
+from awx.main.utils.cancel import CancelListener, CancelWatcher
+from awx.main.utils import task_registry
 from awx.main.utils.ha import register_celery_worker_queues
+from awx.main.utils.named_url_graph import reset_named_url_generation
 from awx.main.consumers import emit_channel_notification
 from awx.conf import settings_registry
 
@@ -132,6 +137,30 @@ def inform_cluster_of_shutdown(*args, **kwargs):
         logger.exception('Encountered problem with normal shutdown signal.')
 
 
+@task_prerun.connect
+def register_running_task(sender=None, task_id=None, **kwargs):
+    if isinstance(sender, BaseTask) and task_id:
+        try:
+            task_registry.register_task(task_id)
+        except Exception:
+            logger.exception(six.text_type('Could not register running task {}.').format(task_id))
+
+
+@task_prerun.connect
+def expire_settings_snapshot(**kwargs):
+    # a task sees the settings changed since the last task in this process
+    settings._awx_conf_settings.expire_snapshot()
+
+
+@task_postrun.connect
+def unregister_running_task(sender=None, task_id=None, **kwargs):
+    if isinstance(sender, BaseTask) and task_id:
+        try:
+            task_registry.unregister_task(task_id)
+        except Exception:
+            logger.exception(six.text_type('Could not unregister running task {}.').format(task_id))
+
+
 @shared_task(bind=True, queue=settings.CELERY_DEFAULT_QUEUE)
 def apply_cluster_membership_policies(self):
     with advisory_lock('cluster_policy_lock', wait=True):
@@ -194,6 +223,13 @@ def handle_setting_changes(self, setting_keys):
     cache_keys = set(setting_keys)
     logger.debug('cache delete_many(%r)', cache_keys)
     cache.delete_many(cache_keys)
+    settings._awx_conf_settings.invalidate_snapshot()
+
+
+@shared_task(exchange='tower_broadcast_all', bind=True)
+def handle_named_url_changes(self):
+    logger.debug('Starting a new named url generation.')
+    reset_named_url_generation()
 
 
 @shared_task(bind=True, exchange='tower_broadcast_all')
@@ -223,6 +259,13 @@ def handle_ha_toplogy_worker_ready(sender, **kwargs):
     apply_cluster_membership_policies.apply([])
 
 
+@worker_ready.connect
+def start_cancel_listener(sender, **kwargs):
+    # one connection LISTENs for cancellations on behalf of all of the jobs
+    # this node runs
+    CancelListener().start()
+
+
 @celeryd_after_setup.connect
 def handle_update_celery_hostname(sender, instance, **kwargs):
     (changed, tower_instance) = Instance.objects.get_or_register()
@@ -313,6 +356,8 @@ def cluster_node_heartbeat(self):
             instance_list.remove(inst)
     if this_inst:
         startup_event = this_inst.is_lost(ref_time=nowtime)
+        if settings.AWX_RUNNING_TASK_REGISTRY:
+            task_registry.publish_running_tasks()
         if this_inst.capacity == 0 and this_inst.enabled:
             logger.warning(six.text_type('Rejoining the cluster as instance {}.').format(this_inst.hostname))
         if this_inst.enabled:
@@ -398,10 +443,13 @@ def awx_periodic_scheduler(self):
     state.schedule_last_run = run_now
     state.save()
 
-    old_schedules = Schedule.objects.enabled().before(last_run)
-    for schedule in old_schedules:
-        schedule.save()
-    schedules = Schedule.objects.enabled().between(last_run, run_now)
+    # schedules which were missed, and then the ones due since the last run,
+    # are moved on to their next occurrence in bulk
+    Schedule.objects.advance_next_run(Schedule.objects.enabled().before(last_run), run_now)
+    schedules = Schedule.objects.advance_next_run(
+        Schedule.objects.enabled().between(last_run, run_now).select_related('unified_job_template'),
+        run_now
+    )
 
     invalid_license = False
     try:
@@ -409,9 +457,9 @@ def awx_periodic_scheduler(self):
     except PermissionDenied as e:
         invalid_license = e
 
+    started = False
     for schedule in schedules:
         template = schedule.unified_job_template
-        schedule.save() # To update next_run timestamp.
         if template.cache_timeout_blocked:
             logger.warn("Cache timeout is in the future, bypassing schedule for template %s" % str(template.id))
             continue
@@ -425,7 +473,7 @@ def awx_periodic_scheduler(self):
                 new_unified_job.save(update_fields=['status', 'job_explanation'])
                 new_unified_job.websocket_emit_status("failed")
                 raise invalid_license
-            can_start = new_unified_job.signal_start()
+            can_start = new_unified_job.mark_pending()
         except Exception:
             logger.exception('Error spawning scheduled job.')
             continue
@@ -434,7 +482,11 @@ def awx_periodic_scheduler(self):
             new_unified_job.job_explanation = "Scheduled job could not start because it was not in the right state or required manual credentials"
             new_unified_job.save(update_fields=['status', 'job_explanation'])
             new_unified_job.websocket_emit_status("failed")
+        started = started or can_start
         emit_channel_notification('schedules-changed', dict(id=schedule.id, group_name="schedules"))
+    if started:
+        from awx.main.scheduler.tasks import run_task_manager
+        connection.on_commit(lambda: run_task_manager.delay())
     state.save()
 
 
@@ -513,6 +565,39 @@ def update_inventory_computed_fields(inventory_id, should_update_hosts=True):
         raise
 
 
+@shared_task(queue=settings.CELERY_DEFAULT_QUEUE)
+def apply_role_ancestry_changes():
+    applied = Role.apply_role_ancestry_changes()
+    if applied:
+        logger.debug('Applied %d role ancestry changes.', applied)
+
+
+@shared_task(queue=settings.CELERY_DEFAULT_QUEUE)
+def update_dashboard_aggregates():
+    with advisory_lock('dashboard_aggregates_lock', wait=False) as acquired:
+        if acquired is False:
+            return
+        DashboardAggregate.refresh()
+        JobOutcomeRollup.refresh()
+
+
+@shared_task(queue=settings.CELERY_DEFAULT_QUEUE)
+def create_event_partitions():
+    with advisory_lock('event_partitions_lock', wait=False) as acquired:
+        if acquired is False:
+            return
+        for event_model in (JobEvent, AdHocCommandEvent, ProjectUpdateEvent, InventoryUpdateEvent, SystemJobEvent):
+            table = event_model._meta.db_table
+            try:
+                if is_partitioned(table):
+                    check_partitions_ahead(table, settings.EVENT_PARTITION_DAYS_AHEAD)
+                    create_partitions(table, settings.EVENT_PARTITION_DAYS, settings.EVENT_PARTITION_DAYS_AHEAD)
+            except Exception:
+                # inserts fail once the partitions run out, so keep trying for
+                # the other tables, and make noise
+                logger.exception('Could not create the partitions of %s.', table)
+
+
 @shared_task(queue=settings.CELERY_DEFAULT_QUEUE)
 def update_host_smart_inventory_memberships():
     try:
@@ -585,6 +670,27 @@ def with_path_cleanup(f):
     return _wrapped
 
 
+PROJECT_SYNC_STATS = ('project_sync_run', 'project_sync_skipped', 'project_sync_seconds_saved')
+
+
+def record_project_sync(skipped, seconds_saved=0):
+    '''
+    Tally pre-job project syncs that were run or skipped because the local
+    checkout was already current (see `manage.py stats`).
+    '''
+    updates = {'project_sync_skipped' if skipped else 'project_sync_run': 1}
+    if seconds_saved:
+        updates['project_sync_seconds_saved'] = int(round(seconds_saved))
+    for key, delta in updates.items():
+        try:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, delta)
+        except ValueError:
+            pass  # evicted between add() and incr()
+        except Exception:
+            logger.exception('Could not record project sync statistics.')
+
+
 class BaseTask(Task):
     name = None
     model = None
@@ -842,7 +948,12 @@ class BaseTask(Task):
                 event_data.setdefault(self.event_data_key, instance.id)
                 dispatcher.dispatch(event_data)
 
-            return OutputVerboseFilter(event_callback)
+            return OutputVerboseFilter(
+                event_callback,
+                max_lines=settings.VERBOSE_EVENT_MAX_LINES,
+                max_bytes=settings.VERBOSE_EVENT_MAX_BYTES,
+                max_delay=settings.VERBOSE_EVENT_MAX_DELAY,
+            )
 
     def pre_run_hook(self, instance, **kwargs):
         '''
@@ -869,16 +980,28 @@ class BaseTask(Task):
             execution_node = isolated_host
         instance = self.update_model(pk, status='running', execution_node=execution_node,
                                      start_args='')  # blank field to remove encrypted passwords
+        timer = PhaseTimer(instance.phase_timing)
+        run_started_at = timer.last_lap
+        if instance.started and 'scheduler_wait' in timer.timing:
+            timer.record('queue_wait', (instance.started - instance.created).total_seconds() -
+                         timer.timing['scheduler_wait'])
 
         instance.websocket_emit_status("running")
         status, rc, tb = 'error', None, ''
         output_replacements = []
         extra_update_fields = {}
+        resource_usage = {}
         event_ct = 0
         stdout_handle = None
+        spawned_at = None
+        cancel_watcher = CancelWatcher(
+            pk, lambda: self.update_model(pk).cancel_flag,
+            poll_interval=settings.AWX_CANCEL_POLL_INTERVAL
+        )
         try:
             kwargs['isolated'] = isolated_host is not None
             self.pre_run_hook(instance, **kwargs)
+            timer.lap('pre_run_hook')
             if instance.cancel_flag:
                 instance = self.update_model(instance.pk, status='canceled')
             if instance.status != 'running':
@@ -896,6 +1019,7 @@ class BaseTask(Task):
             # Fetch ansible version once here to support version-dependent features.
             kwargs['ansible_version'] = get_ansible_version()
             kwargs['private_data_dir'] = self.build_private_data_dir(instance, **kwargs)
+            timer.lap('private_data')
 
             # Fetch "cached" fact data from prior runs and put on the disk
             # where ansible expects to find it
@@ -904,10 +1028,12 @@ class BaseTask(Task):
                     os.path.join(kwargs['private_data_dir']),
                     kwargs.setdefault('fact_modification_times', {})
                 )
+                timer.lap('fact_cache')
 
             # May have to serialize the value
             kwargs['private_data_files'] = self.build_private_data_files(instance, **kwargs)
             kwargs['passwords'] = self.build_passwords(instance, **kwargs)
+            timer.lap('private_data')
             kwargs['proot_show_paths'] = self.proot_show_paths
             if getattr(instance, 'ansible_virtualenv_path', settings.ANSIBLE_VENV_PATH) != settings.ANSIBLE_VENV_PATH:
                 kwargs['proot_custom_virtualenv'] = instance.ansible_virtualenv_path
@@ -917,6 +1043,7 @@ class BaseTask(Task):
             cwd = self.build_cwd(instance, **kwargs)
             env = self.build_env(instance, **kwargs)
             safe_env = build_safe_env(env)
+            timer.lap('build_args')
 
             # handle custom injectors specified on the CredentialType
             credentials = []
@@ -936,6 +1063,7 @@ class BaseTask(Task):
                     credential.credential_type.inject_credential(
                         credential, env, safe_env, args, safe_args, kwargs['private_data_dir']
                     )
+            timer.lap('credentials')
 
             if isolated_host is None:
                 stdout_handle = self.get_stdout_handle(instance)
@@ -963,16 +1091,25 @@ class BaseTask(Task):
             expect_passwords = {}
             for k, v in self.get_password_prompts(**kwargs).items():
                 expect_passwords[k] = kwargs['passwords'].get(v, '') or ''
+            pexpect_timeout = getattr(settings, 'PEXPECT_TIMEOUT', 5)
+            if cancel_watcher.start().listening:
+                # checking for cancellation no longer costs a query, so check
+                # at least once per second
+                pexpect_timeout = min(pexpect_timeout, 1)
             _kw = dict(
                 expect_passwords=expect_passwords,
-                cancelled_callback=lambda: self.update_model(instance.pk).cancel_flag,
+                cancelled_callback=cancel_watcher,
                 job_timeout=self.get_instance_timeout(instance),
                 idle_timeout=self.get_idle_timeout(),
                 extra_update_fields=extra_update_fields,
-                pexpect_timeout=getattr(settings, 'PEXPECT_TIMEOUT', 5),
+                pexpect_timeout=pexpect_timeout,
                 proot_cmd=getattr(settings, 'AWX_PROOT_CMD', 'bwrap'),
+                raw_reads=settings.PEXPECT_RAW_READS,
+                resource_usage=resource_usage,
             )
             instance = self.update_model(instance.pk, output_replacements=output_replacements)
+            timer.lap('proot')
+            spawned_at = time.time()
             if isolated_host:
                 manager_instance = isolated_manager.IsolatedManager(
                     args, cwd, env, stdout_handle, ssh_key_path, **_kw
@@ -991,6 +1128,19 @@ class BaseTask(Task):
             tb = traceback.format_exc()
             logger.exception('%s Exception occurred while running task', instance.log_format)
         finally:
+            cancel_watcher.stop()
+            try:
+                first_event_at = getattr(stdout_handle, 'first_event_at', None)
+                if spawned_at and first_event_at:
+                    timer.record('first_event', first_event_at - spawned_at)
+                    timer.record('time_to_first_event', sum(
+                        timer.timing.get(phase, 0) for phase in ('scheduler_wait', 'queue_wait', 'first_event')
+                    ) + spawned_at - run_started_at)
+                # saved before stdout is closed (which sends EOF), so this
+                # can't race with the callback receiver's event_ingest_lag
+                self.update_model(pk, phase_timing=timer.timing)
+            except Exception:
+                logger.exception('Error saving job phase timing.')
             try:
                 if stdout_handle:
                     stdout_handle.flush()
@@ -1012,6 +1162,7 @@ class BaseTask(Task):
         instance = self.update_model(pk, status=status, result_traceback=tb,
                                      output_replacements=output_replacements,
                                      emitted_events=event_ct,
+                                     resource_usage=resource_usage,
                                      **extra_update_fields)
         try:
             self.final_run_hook(instance, status, **kwargs)
@@ -1325,37 +1476,60 @@ class RunJob(BaseTask):
             self.update_model(job.pk, status='failed', job_explanation=error)
             raise RuntimeError(error)
         if job.project and job.project.scm_type:
-            job_request_id = '' if self.request.id is None else self.request.id
-            pu_ig = job.instance_group
-            pu_en = job.execution_node
-            if kwargs['isolated']:
-                pu_ig = pu_ig.controller
-                pu_en = settings.CLUSTER_HOST_ID
-            local_project_sync = job.project.create_project_update(
-                _eager_fields=dict(
-                    launch_type="sync",
-                    job_type='run',
-                    status='running',
-                    instance_group = pu_ig,
-                    execution_node=pu_en,
-                    celery_task_id=job_request_id))
-            # save the associated job before calling run() so that a
-            # cancel() call on the job can cancel the project update
-            job = self.update_model(job.pk, project_update=local_project_sync)
-
-            project_update_task = local_project_sync._get_task_class()
+            project_update_task = ProjectUpdate._get_task_class()()
+            # hold the project lock from here until the sync (if any) is
+            # done, so that concurrent jobs for the same project on this node
+            # wait for one in-flight sync instead of each running their own
             try:
-                task_instance = project_update_task()
-                task_instance.request.id = job_request_id
-                task_instance.run(local_project_sync.id)
-                job = self.update_model(job.pk, scm_revision=job.project.scm_revision)
-            except Exception:
-                local_project_sync.refresh_from_db()
-                if local_project_sync.status != 'canceled':
-                    job = self.update_model(job.pk, status='failed',
-                                            job_explanation=('Previous Task Failed: {"job_type": "%s", "job_name": "%s", "job_id": "%s"}' %
-                                                             ('project_update', local_project_sync.name, local_project_sync.id)))
-                    raise
+                project_update_task.acquire_lock(job.project, log_format=job.log_format)
+                self._sync_project(job, project_update_task, **kwargs)
+            finally:
+                if project_update_task.lock_fd is not None:
+                    project_update_task.release_lock(job.project)
+
+    def _sync_project(self, job, project_update_task, **kwargs):
+        project = Project.objects.get(pk=job.project_id)
+        if project_update_task.checkout_is_current(project):
+            last_sync = ProjectUpdate.objects.filter(
+                project=project, launch_type='sync', status='successful'
+            ).order_by('-finished').values_list('elapsed', flat=True).first()
+            logger.info(six.text_type('{} skipping project sync, {} is already at revision {} '
+                                      '(saved ~{}s).').format(job.log_format, project.get_project_path(),
+                                                              project.scm_revision, last_sync or 0))
+            record_project_sync(skipped=True, seconds_saved=float(last_sync or 0))
+            self.update_model(job.pk, scm_revision=project.scm_revision)
+            return
+        record_project_sync(skipped=False)
+
+        job_request_id = '' if self.request.id is None else self.request.id
+        pu_ig = job.instance_group
+        pu_en = job.execution_node
+        if kwargs['isolated']:
+            pu_ig = pu_ig.controller
+            pu_en = settings.CLUSTER_HOST_ID
+        local_project_sync = job.project.create_project_update(
+            _eager_fields=dict(
+                launch_type="sync",
+                job_type='run',
+                status='running',
+                instance_group = pu_ig,
+                execution_node=pu_en,
+                celery_task_id=job_request_id))
+        # save the associated job before calling run() so that a
+        # cancel() call on the job can cancel the project update
+        job = self.update_model(job.pk, project_update=local_project_sync)
+
+        try:
+            project_update_task.request.id = job_request_id
+            project_update_task.run(local_project_sync.id)
+            job = self.update_model(job.pk, scm_revision=job.project.scm_revision)
+        except Exception:
+            local_project_sync.refresh_from_db()
+            if local_project_sync.status != 'canceled':
+                job = self.update_model(job.pk, status='failed',
+                                        job_explanation=('Previous Task Failed: {"job_type": "%s", "job_name": "%s", "job_id": "%s"}' %
+                                                         ('project_update', local_project_sync.name, local_project_sync.id)))
+                raise
 
 
     def final_run_hook(self, job, status, **kwargs):
@@ -1394,6 +1568,8 @@ class RunProjectUpdate(BaseTask):
     model = ProjectUpdate
     event_model = ProjectUpdateEvent
     event_data_key = 'project_update_id'
+    lock_fd = None
+    sync_revision = None
 
     @property
     def proot_show_paths(self):
@@ -1657,7 +1833,7 @@ class RunProjectUpdate(BaseTask):
     '''
     Note: We don't support blocking=False
     '''
-    def acquire_lock(self, instance, blocking=True):
+    def acquire_lock(self, instance, blocking=True, log_format=None):
         lock_path = instance.get_lock_file()
         if lock_path is None:
             raise RuntimeError(u'Invalid lock file path')
@@ -1675,23 +1851,62 @@ class RunProjectUpdate(BaseTask):
             if waiting_time > 1.0:
                 logger.info(six.text_type(
                     '{} spent {} waiting to acquire lock for local source tree '
-                    'for path {}.').format(instance.log_format, waiting_time, lock_path))
+                    'for path {}.').format(log_format or instance.log_format, waiting_time, lock_path))
         except IOError as e:
             os.close(self.lock_fd)
+            self.lock_fd = None
             logger.error(six.text_type("I/O error({0}) while trying to aquire lock on file [{1}]: {2}").format(e.errno, lock_path, e.strerror))
             raise
 
+    def checkout_is_current(self, project):
+        '''
+        Return True if the local checkout of `project` is known to be at the
+        revision that a sync would check out, so the sync can be skipped.
+        '''
+        if not settings.PROJECT_SYNC_SKIP_CURRENT_REVISION:
+            return False
+        # scm_clean asks for local modifications to be discarded before
+        # every job, which only a real sync does
+        if not project.scm_revision or project.scm_clean or not project.get_project_path():
+            return False
+        try:
+            with open(project.get_revision_file(), 'r') as f:
+                return f.read().strip() == project.scm_revision
+        except (IOError, TypeError):
+            return False
+
+    def set_checkout_revision(self, instance, revision):
+        revision_file = instance.get_revision_file()
+        if not revision_file:
+            return
+        try:
+            if revision:
+                tmp_path = revision_file + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    f.write(revision)
+                os.rename(tmp_path, revision_file)
+            elif os.path.exists(revision_file):
+                os.remove(revision_file)
+        except (IOError, OSError):
+            logger.exception(six.text_type('{} could not record checkout revision.').format(instance.log_format))
+
     def pre_run_hook(self, instance, **kwargs):
         # re-create root project folder if a natural disaster has destroyed it
         if not os.path.exists(settings.PROJECTS_ROOT):
             os.mkdir(settings.PROJECTS_ROOT)
-        if instance.launch_type == 'sync':
+        # a job that launched this sync already holds the lock
+        if instance.launch_type == 'sync' and self.lock_fd is None:
             self.acquire_lock(instance)
+        # the checkout is in flux until this update succeeds
+        self.set_checkout_revision(instance, None)
+        self.sync_revision = instance.project.scm_revision if instance.job_type == 'run' else None
 
     def post_run_hook(self, instance, status, **kwargs):
+        p = instance.project
+        if status == 'successful' and instance.job_type == 'run':
+            self.set_checkout_revision(instance, self.sync_revision)
         if instance.launch_type == 'sync':
             self.release_lock(instance)
-        p = instance.project
         if instance.job_type == 'check' and status not in ('failed', 'canceled',):
             fd = open(self.revision_path, 'r')
             lines = fd.readlines()
@@ -1702,6 +1917,8 @@ class RunProjectUpdate(BaseTask):
             p.playbook_files = p.playbooks
             p.inventory_files = p.inventories
             p.save()
+            if status == 'successful':
+                self.set_checkout_revision(instance, p.scm_revision)
 
         # Update any inventories that depend on this project
         dependent_inventory_sources = p.scm_inventory_sources.filter(update_on_project_update=True)
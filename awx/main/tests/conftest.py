@@ -25,6 +25,13 @@ def pytest_unconfigure(config):
     del sys._called_from_test
 
 
+@pytest.fixture(autouse=True)
+def expire_settings_snapshot():
+    # like a new request, each test sees the settings changed before it
+    from django.conf import settings
+    settings._awx_conf_settings.expire_snapshot()
+
+
 @pytest.fixture
 def mock_access():
     @contextmanager
@@ -0,0 +1,69 @@
+import datetime
+
+import pytest
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from awx.api.versioning import reverse
+from awx.main.models import DashboardAggregate, Inventory, Job, JobOutcomeRollup, ProjectUpdate, dashboard_counts
+
+
+@pytest.fixture(autouse=True)
+def clear_dashboard_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_dashboard_aggregates_match_counts(organization, inventory, project, host, job_template):
+    Inventory.objects.create(name='no-org-inventory')
+    DashboardAggregate.refresh()
+    assert DashboardAggregate.objects.filter(organization=organization).exists()
+    assert DashboardAggregate.totals() == dashboard_counts(lambda model: model.objects.all())
+
+
+@pytest.mark.django_db
+def test_dashboard_superuser_aggregates(get, admin_user, organization, inventory):
+    DashboardAggregate.refresh()
+    # not counted until the next refresh
+    Inventory.objects.create(name='new-inventory', organization=organization)
+    response = get(reverse('api:dashboard_view'), user=admin_user, expect=200)
+    assert response.data['inventories']['total'] == 1
+    assert response.data['organizations']['total'] == 1
+
+
+@pytest.mark.django_db
+def test_dashboard_user_counts(get, alice, organization, inventory):
+    DashboardAggregate.refresh()
+    Inventory.objects.create(name='hidden-inventory', organization=organization)
+    inventory.read_role.members.add(alice)
+    response = get(reverse('api:dashboard_view'), user=alice, expect=200)
+    assert response.data['inventories']['total'] == 1
+
+
+@pytest.mark.django_db
+def test_job_outcome_rollup(project):
+    finished = now()
+    for status in ('successful', 'successful', 'failed'):
+        Job.objects.create(status=status, finished=finished)
+    ProjectUpdate.objects.create(project=project, status='failed', finished=finished - datetime.timedelta(days=2))
+    Job.objects.create(status='running')
+    JobOutcomeRollup.refresh()
+
+    series = JobOutcomeRollup.time_series(finished - datetime.timedelta(days=1), finished, 'hours')
+    assert len(series['successful']) == 25
+    assert series['successful'][-1][1] == 2
+    assert series['failed'][-1][1] == 1
+    assert sum(n for dt, n in series['failed']) == 1
+
+    series = JobOutcomeRollup.time_series(finished - datetime.timedelta(weeks=1), finished, 'days')
+    assert len(series['failed']) == 8
+    assert sum(n for dt, n in series['failed']) == 2
+    series = JobOutcomeRollup.time_series(finished - datetime.timedelta(weeks=1), finished, 'days',
+                                          job_type='playbook_run')
+    assert sum(n for dt, n in series['failed']) == 1
+
+    # rolling up again recounts the latest hours rather than adding to them
+    JobOutcomeRollup.refresh()
+    series = JobOutcomeRollup.time_series(finished - datetime.timedelta(days=1), finished, 'hours')
+    assert series['successful'][-1][1] == 2
@@ -621,3 +621,86 @@ def test_callback_extra_var_takes_priority_over_host_name(mocker, get, job_templ
         r = get(reverse('api:job_template_callback', kwargs={'pk': job_template.pk}),
                 user=admin_user, expect=200)
         assert not r.data['matching_hosts']
+
+
+@pytest.mark.django_db
+@pytest.mark.job_runtime_vars
+def test_create_unified_jobs_matches_create_unified_job(runtime_data, job_template_prompts, label):
+    job_template = job_template_prompts(True)
+    job_template.labels.add(label)
+    kwargs = data_to_internal(runtime_data)
+
+    expected = job_template.create_unified_job(**kwargs)
+    jobs = job_template.create_unified_jobs([kwargs, {}])
+    assert len(jobs) == 2
+
+    prompted, unprompted = [Job.objects.get(pk=job.pk) for job in jobs]
+    for field_name in ('limit', 'job_type', 'job_tags', 'skip_tags', 'inventory', 'extra_vars', 'verbosity'):
+        assert getattr(prompted, field_name) == getattr(expected, field_name)
+    assert set(prompted.credentials.all()) == set(expected.credentials.all())
+    assert set(prompted.labels.all()) == set(expected.labels.all()) == set([label])
+    assert prompted.launch_config.prompts_dict() == expected.launch_config.prompts_dict()
+    assert set(prompted.launch_config.credentials.all()) == set(expected.launch_config.credentials.all())
+
+    assert unprompted.limit == job_template.limit
+    assert set(unprompted.credentials.all()) == set(job_template.credentials.all())
+    assert set(unprompted.labels.all()) == set([label])
+    assert unprompted.launch_config.prompts_dict() == {}
+
+
+@pytest.mark.django_db
+@pytest.mark.job_runtime_vars
+def test_bulk_launch(runtime_data, job_template_prompts, post, admin_user):
+    job_template = job_template_prompts(True)
+    launches = [
+        dict(job_template=job_template.pk),
+        dict(runtime_data, job_template=job_template.pk),
+        dict(job_template=job_template.pk, job_type='foobicate'),
+        dict(job_template=job_template.pk + 1000),
+    ]
+
+    with mock.patch.object(Job, 'mark_pending', return_value=True):
+        response = post(reverse('api:job_template_bulk_launch'), dict(launches=launches), admin_user, expect=200)
+
+    results = response.data['results']
+    assert [result['status'] for result in results] == [201, 201, 400, 404]
+    assert 'job_type' in results[2]['errors']
+    assert Job.objects.count() == 2
+    assert Job.objects.get(pk=results[0]['job']).limit == 'webservers'
+    prompted = Job.objects.get(pk=results[1]['job'])
+    assert prompted.limit == 'test-servers'
+    assert [cred.pk for cred in prompted.credentials.all()] == runtime_data['credentials']
+
+
+@pytest.mark.django_db
+@pytest.mark.job_runtime_vars
+def test_bulk_launch_checks_access_per_launch(runtime_data, job_template_prompts, post, rando):
+    job_template = job_template_prompts(True)
+    job_template.execute_role.members.add(rando)
+    hidden_template = job_template_prompts(True)
+    launches = [
+        dict(job_template=job_template.pk),
+        dict(job_template=job_template.pk, inventory=runtime_data['inventory']),
+        dict(job_template=hidden_template.pk),
+    ]
+
+    with mock.patch.object(Job, 'mark_pending', return_value=True):
+        response = post(reverse('api:job_template_bulk_launch'), dict(launches=launches), rando, expect=200)
+
+    assert [result['status'] for result in response.data['results']] == [201, 403, 404]
+    assert Job.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_launch_requires_passwords(machine_credential, deploy_jobtemplate, post, admin_user):
+    machine_credential.password = 'ASK'
+    machine_credential.save()
+    deploy_jobtemplate.credentials.add(machine_credential)
+
+    response = post(reverse('api:job_template_bulk_launch'),
+                    dict(launches=[dict(job_template=deploy_jobtemplate.pk)]), admin_user, expect=200)
+
+    result = response.data['results'][0]
+    assert result['status'] == 400
+    assert result['errors']['passwords_needed_to_start'] == ['ssh_password']
+    assert not Job.objects.exists()
@@ -0,0 +1,105 @@
+import mock
+import pytest
+from datetime import timedelta
+
+# Django
+from django.core.management import call_command
+from django.utils.timezone import now
+
+# AWX
+from awx.main.models import (
+    ActivityStream, Host, Job, JobEvent, JobHostSummary, Label, Organization,
+    UnifiedJob, WorkflowJob, WorkflowJobNode
+)
+from awx.main.utils.deletion import bulk_delete
+
+
+def make_old(obj, days=100):
+    type(obj).objects.filter(pk=obj.pk).update(created=now() - timedelta(days=days))
+
+
+@pytest.mark.django_db
+def test_cleanup_jobs(inventory, host, label):
+    old_job = Job.objects.create(status='successful', inventory=inventory)
+    running_job = Job.objects.create(status='running', inventory=inventory)
+    new_job = Job.objects.create(status='successful', inventory=inventory)
+    make_old(old_job)
+    make_old(running_job)
+    parent = JobEvent.objects.create(job=old_job, stdout='parent', start_line=0)
+    JobEvent.objects.create(job=old_job, parent=parent, stdout='child', start_line=1)
+    JobHostSummary.objects.create(job=new_job, host=host)
+    JobHostSummary.objects.create(job=old_job, host=host)
+    old_job.labels.add(label)
+    assert Host.objects.get(pk=host.pk).last_job == old_job
+
+    call_command('cleanup_jobs', days=90, only_jobs=True, chunk_size=1)
+
+    assert list(Job.objects.order_by('pk')) == [running_job, new_job]
+    assert not JobEvent.objects.exists()
+    assert JobHostSummary.objects.get().job == new_job
+    assert Host.objects.get(pk=host.pk).last_job == new_job
+    assert not Label.objects.filter(pk=label.pk).exists()
+
+
+@pytest.mark.django_db
+def test_cleanup_jobs_dry_run():
+    job = Job.objects.create(status='successful')
+    make_old(job)
+    call_command('cleanup_jobs', days=90, only_jobs=True, dry_run=True)
+    assert Job.objects.filter(pk=job.pk).exists()
+
+
+@pytest.mark.django_db
+def test_cleanup_jobs_keeps_partitions_of_kept_jobs(inventory):
+    old_job = Job.objects.create(status='successful', inventory=inventory)
+    running_job = Job.objects.create(status='running', inventory=inventory)
+    make_old(old_job, days=120)
+    make_old(running_job, days=100)
+    running_job.refresh_from_db()
+
+    with mock.patch('awx.main.management.commands.cleanup_jobs.is_partitioned', return_value=True), \
+            mock.patch('awx.main.management.commands.cleanup_jobs.drop_partitions', return_value=[]) as drop:
+        call_command('cleanup_jobs', days=90, only_jobs=True)
+        # the partitions the running job's events may be in are kept
+        assert drop.call_args[0][1] == running_job.created - timedelta(days=1)
+
+        running_job.status = 'successful'
+        running_job.save()
+        Job.objects.filter(pk=running_job.pk).update(created=now() - timedelta(days=100))
+        call_command('cleanup_jobs', days=90, only_jobs=True)
+        # only the newer jobs, whose events may be from up to a day before
+        # they were created, are kept now
+        cutoff = drop.call_args[0][1]
+        assert now() - timedelta(days=92) < cutoff < now() - timedelta(days=90)
+
+    assert not Job.objects.filter(pk__in=[old_job.pk, running_job.pk]).exists()
+
+
+@pytest.mark.django_db
+def test_bulk_delete_cascades():
+    workflow_job = WorkflowJob.objects.create(name='old-workflow')
+    job = Job.objects.create()
+    first = workflow_job.workflow_job_nodes.create(job=job)
+    second = workflow_job.workflow_job_nodes.create()
+    first.success_nodes.add(second)
+
+    assert bulk_delete(Job, [job.pk]) == 1
+    assert not UnifiedJob.objects.filter(pk=job.pk).exists()
+    assert WorkflowJobNode.objects.get(pk=first.pk).job is None
+
+    assert bulk_delete(WorkflowJob, [workflow_job.pk]) == 1
+    assert not UnifiedJob.objects.exists()
+    assert not WorkflowJobNode.objects.exists()
+
+
+@pytest.mark.django_db
+def test_cleanup_activitystream():
+    Organization.objects.create(name='old-org')
+    ActivityStream.objects.update(timestamp=now() - timedelta(days=100))
+    new_org = Organization.objects.create(name='new-org')
+
+    call_command('cleanup_activitystream', days=90, dry_run=True)
+    assert ActivityStream.objects.count() == 2
+
+    call_command('cleanup_activitystream', days=90, chunk_size=1)
+    assert ActivityStream.objects.get().organization.get() == new_org
@@ -15,12 +15,14 @@ from awx.main.models import (
 )
 
 # other AWX
+from awx.main.signals import activity_stream_writer
 from awx.main.utils import model_to_dict
 from awx.main.utils.common import get_allowed_fields
 from awx.api.serializers import InventorySourceSerializer
 
 # Django
 from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
 
 # Django-CRUM
 from crum import impersonate
@@ -199,3 +201,80 @@ def test_modified_not_allowed_field(somecloud_type):
 
     for Model in activity_stream_registrar.models:
         assert 'modified' not in get_allowed_fields(Model(), model_serializer_mapping), Model
+
+
+@pytest.mark.django_db
+def test_update_diffs_against_loaded_values(organization):
+    org = Organization.objects.get(pk=organization.pk)
+    Organization.objects.filter(pk=org.pk).update(description='changed elsewhere')
+    org.name = 'renamed'
+    org.save()
+    entry = org.activitystream_set.get(operation='update')
+    assert json.loads(entry.changes) == {'name': [organization.name, 'renamed']}
+
+    org.description = 'changed here'
+    org.save()
+    entry = org.activitystream_set.filter(operation='update').last()
+    assert json.loads(entry.changes) == {'description': [organization.description, 'changed here']}
+
+
+@pytest.mark.django_db
+def test_update_fetches_json_fields_left_out_of_snapshot(somecloud_type):
+    credential_type = CredentialType.objects.get(pk=somecloud_type.pk)
+    snapshot = credential_type._activity_stream_snapshot
+    assert snapshot['name'] == 'SomeCloud'
+    # read-only fields are never diffed, and JSON fields are not copied
+    assert 'modified' not in snapshot
+    assert 'inputs' not in snapshot
+
+    credential_type.inputs = {'fields': []}
+    credential_type.save()
+    entry = ActivityStream.objects.filter(operation='update', credential_type=credential_type).last()
+    assert json.loads(json.loads(entry.changes)['inputs'][0]) == somecloud_type.inputs
+
+
+class Rollback(Exception):
+    pass
+
+
+@pytest.mark.django_db
+class TestBatchWrites:
+
+    @pytest.fixture(autouse=True)
+    def batch_writes(self, settings):
+        settings.ACTIVITY_STREAM_BATCH_WRITES = True
+
+    def test_entries_held_until_flushed(self):
+        org = Organization.objects.create(name='batched-org')
+        org.name = 'renamed-org'
+        org.save()
+        assert not ActivityStream.objects.filter(changes__icontains='-org').exists()
+        activity_stream_writer.flush()
+        assert [entry.operation for entry in org.activitystream_set.all()] == ['create', 'update']
+
+    def test_batch_size(self, settings):
+        settings.ACTIVITY_STREAM_BATCH_SIZE = 2
+        Organization.objects.create(name='first-org')
+        assert not ActivityStream.objects.filter(changes__icontains='-org').exists()
+        Organization.objects.create(name='second-org')
+        assert ActivityStream.objects.filter(organization__isnull=False, changes__icontains='-org').count() == 2
+
+    def test_deleted_objects_not_related(self):
+        org = Organization.objects.create(name='short-lived-org')
+        org.delete()
+        activity_stream_writer.flush()
+        entries = ActivityStream.objects.filter(changes__icontains='short-lived-org')
+        assert [entry.operation for entry in entries] == ['create', 'delete']
+        assert not entries[0].organization.exists()
+
+    def test_rolled_back_entries_not_written(self):
+        try:
+            with transaction.atomic():
+                Organization.objects.create(name='rolled-back-org')
+                raise Rollback()
+        except Rollback:
+            pass
+        Organization.objects.create(name='kept-org')
+        activity_stream_writer.flush()
+        assert not ActivityStream.objects.filter(changes__icontains='rolled-back-org').exists()
+        assert ActivityStream.objects.filter(changes__icontains='kept-org').count() == 1
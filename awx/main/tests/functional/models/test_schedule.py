@@ -274,3 +274,38 @@ def test_empty_until_property(job_template):
     )
     s.save()
     assert s.until == ''
+
+
+@pytest.mark.django_db
+def test_compiled_rrule_reused(job_template):
+    rrule = 'DTSTART:20300112T210000Z RRULE:FREQ=DAILY;INTERVAL=1;COUNT=30'
+    s = Schedule(name='Some Schedule', rrule=rrule, unified_job_template=job_template)
+    s.save()
+    with mock.patch.object(Schedule, 'rrulestr') as rrulestr:
+        s.save()
+        Schedule.objects.get(pk=s.pk).save()
+    rrulestr.assert_not_called()
+    assert str(s.dtend) == '2030-02-10 21:00:00+00:00'
+
+
+@pytest.mark.django_db
+def test_advance_next_run(job_template):
+    schedules = []
+    for hour in (21, 22):
+        s = Schedule(
+            name='Schedule {}'.format(hour),
+            rrule='DTSTART:20300112T{}0000Z RRULE:FREQ=DAILY;INTERVAL=1'.format(hour),
+            unified_job_template=job_template
+        )
+        s.save()
+        schedules.append(s)
+
+    after = datetime(2030, 1, 20, 21, 30, tzinfo=pytz.utc)
+    with mock.patch('awx.main.models.schedules.emit_channel_notification') as emit:
+        advanced = Schedule.objects.advance_next_run(Schedule.objects.all(), after)
+    emit.assert_not_called()
+    assert len(advanced) == 2
+    assert str(Schedule.objects.get(pk=schedules[0].pk).next_run) == '2030-01-21 21:00:00+00:00'
+    assert str(Schedule.objects.get(pk=schedules[1].pk).next_run) == '2030-01-20 22:00:00+00:00'
+    job_template.refresh_from_db()
+    assert str(job_template.next_job_run) == '2030-01-21 21:00:00+00:00'
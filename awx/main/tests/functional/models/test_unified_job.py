@@ -106,6 +106,50 @@ class TestIsolatedRuns:
                                       queue='thepentagon',
                                       task_id='something')
 
+    def test_placed_isolated_instance_selected(self):
+        ig = InstanceGroup.objects.create(name='tower')
+        iso_ig = InstanceGroup.objects.create(name='thepentagon', controller=ig)
+        iso_ig.instances.create(hostname='iso1', capacity=50)
+        iso_ig.instances.create(hostname='iso2', capacity=200)
+        job = Job.objects.create(
+            instance_group=iso_ig,
+            celery_task_id='something',
+            execution_node='iso1',
+        )
+
+        mock_async = mock.MagicMock()
+
+        class MockTaskClass:
+            apply_async = mock_async
+
+        with mock.patch.object(job, '_get_task_class') as task_class:
+            task_class.return_value = MockTaskClass
+            job.start_celery_task([], None, None, 'thepentagon')
+        mock_async.assert_called_with([job.id, 'iso1'], [], link_error=None, link=None,
+                                      queue='thepentagon', task_id='something')
+
+
+@pytest.mark.django_db
+def test_placed_job_routed_to_instance_queue():
+    ig = InstanceGroup.objects.create(name='tower')
+    ig.instances.create(hostname='node1', capacity=100)
+    job = Job.objects.create(
+        instance_group=ig,
+        celery_task_id='something',
+        execution_node='node1',
+    )
+
+    mock_async = mock.MagicMock()
+
+    class MockTaskClass:
+        apply_async = mock_async
+
+    with mock.patch.object(job, '_get_task_class') as task_class:
+        task_class.return_value = MockTaskClass
+        job.start_celery_task([], None, None, 'tower')
+    mock_async.assert_called_with([job.id], [], link_error=None, link=None,
+                                  queue='node1', task_id='something')
+
 
 @pytest.mark.django_db
 class TestMetaVars:
@@ -154,3 +198,19 @@ def test_event_processing_not_finished():
 def test_event_model_undefined():
     wj = WorkflowJob.objects.create(name='foobar', status='finished')
     assert wj.event_processing_finished
+
+
+@pytest.mark.django_db
+def test_event_processing_finished_from_counter():
+    job = Job.objects.create(emitted_events=2, saved_events=2, status='finished')
+    assert job.event_processing_finished
+    job.saved_events = 1
+    assert not job.event_processing_finished
+
+
+@pytest.mark.django_db
+def test_event_processing_finished_legacy_job_counts_events():
+    job = Job.objects.create(emitted_events=1, saved_events=None, status='finished')
+    assert not job.event_processing_finished
+    job.event_class.objects.create(job=job)
+    assert job.event_processing_finished
@@ -54,6 +54,16 @@ class TestWorkflowDAGFunctional(TransactionTestCase):
         with self.assertNumQueries(4):
             dag._init_graph(wfj)
 
+    def test_walk_WFJT_dag_without_queries(self):
+        wfj = self.workflow_job(states=['successful', None, None, None, None])
+        dag = WorkflowDAG(workflow_job=wfj)
+        with self.assertNumQueries(0):
+            nodes_to_run = dag.bfs_nodes_to_run()
+            is_done = dag.is_workflow_done()
+        root = dag.get_root_nodes()[0]['node_object']
+        assert nodes_to_run == [n['node_object'] for n in dag.get_dependencies(root, 'success_nodes')]
+        assert is_done == (False, False)
+
     def test_workflow_done(self):
         wfj = self.workflow_job(states=['failed', None, None, 'successful', None])
         dag = WorkflowDAG(workflow_job=wfj)
@@ -7,6 +7,7 @@ from django.core.cache import cache
 from django.utils.timezone import now as tz_now
 
 from awx.main.scheduler import TaskManager
+from awx.main.tasks import RunJob
 from awx.main.utils import encrypt_field
 from awx.main.models import (
     Job,
@@ -375,3 +376,57 @@ class TestReaper():
         assert all_jobs[4] in waiting_jobs
         assert all_jobs[5] in waiting_jobs
         assert all_jobs[8] in waiting_jobs
+
+
+@pytest.mark.django_db
+class TestWorkflowProgression():
+
+    @pytest.fixture
+    def workflow_jobs(self, job_template):
+        cache.delete('last_workflow_progression')
+        workflow_jobs = []
+        for i in range(2):
+            wfj = WorkflowJob.objects.create(status='running')
+            wfj.workflow_job_nodes.create(unified_job_template=job_template, job=job_template.create_job())
+            workflow_jobs.append(wfj)
+        # nothing has changed for a while
+        an_hour_ago = tz_now() - timedelta(hours=1)
+        WorkflowJob.objects.update(modified=an_hour_ago)
+        Job.objects.update(modified=an_hour_ago)
+        return workflow_jobs
+
+    def test_only_changed_workflows_evaluated(self, workflow_jobs):
+        tm = TaskManager()
+        # the first pass evaluates everything
+        assert set(tm.get_changed_workflow_jobs()) == set(workflow_jobs)
+        assert tm.get_changed_workflow_jobs() == []
+
+        node_job = workflow_jobs[1].workflow_job_nodes.first().job
+        node_job.status = 'running'
+        node_job.save()
+        assert tm.get_changed_workflow_jobs() == [workflow_jobs[1]]
+        assert tm.get_changed_workflow_jobs() == []
+
+        workflow_jobs[0].cancel_flag = True
+        workflow_jobs[0].save()
+        assert set(tm.get_changed_workflow_jobs()) == set(workflow_jobs)
+
+    def test_node_job_finished_by_task(self, workflow_jobs):
+        tm = TaskManager()
+        tm.get_changed_workflow_jobs()
+        node_job = workflow_jobs[0].workflow_job_nodes.first().job
+        # jobs finish through update_model, which saves with 'modified' in
+        # update_fields, so their modified time stays put
+        RunJob().update_model(node_job.pk, status='successful')
+        assert Job.objects.get(pk=node_job.pk).modified < tz_now() - timedelta(minutes=30)
+        assert tm.get_changed_workflow_jobs() == [workflow_jobs[0]]
+
+    def test_full_evaluation_interval(self, workflow_jobs):
+        tm = TaskManager()
+        tm.get_changed_workflow_jobs()
+        last = cache.get('last_workflow_progression')
+        cache.set('last_workflow_progression', {
+            'since': last['since'],
+            'full': last['full'] - timedelta(minutes=10),
+        })
+        assert set(tm.get_changed_workflow_jobs()) == set(workflow_jobs)
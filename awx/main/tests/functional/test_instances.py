@@ -1,9 +1,14 @@
 import pytest
 import mock
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils.timezone import now
 
 from awx.main.models import AdHocCommand, InventoryUpdate, Job, JobTemplate, ProjectUpdate, Instance
 from awx.main.tasks import apply_cluster_membership_policies
 from awx.api.versioning import reverse
+from awx.main.utils import task_registry
 
 
 @pytest.mark.django_db
@@ -252,3 +257,21 @@ class TestInstanceGroupOrdering:
         assert job.preferred_instance_groups == [ig_inv, ig_org]
         job.job_template.instance_groups.add(ig_tmp)
         assert job.preferred_instance_groups == [ig_tmp, ig_inv, ig_org]
+
+
+@pytest.mark.django_db
+def test_running_tasks_shared_through_database(instance_factory, tmpdir):
+    node1, node2, stale = instance_factory('node1'), instance_factory('node2'), instance_factory('stale')
+    Instance.objects.filter(pk=stale.pk).update(running_tasks=['old'],
+                                                running_tasks_published=now() - timedelta(minutes=10))
+    for node, task_id in ((node1, 'task-1'), (node2, 'task-2')):
+        with mock.patch.object(settings, 'AWX_PROOT_BASE_PATH', tmpdir.strpath), \
+                mock.patch.object(settings, 'CLUSTER_HOST_ID', node.hostname):
+            task_registry.register_task(task_id)
+            task_registry.publish_running_tasks()
+    running = task_registry.get_running_tasks(['node1', 'node2', 'stale'])
+    assert sorted(running) == ['node1', 'node2']
+    assert running['node1'][1] == set(['task-1'])
+    assert running['node2'][1] == set(['task-2'])
+    # recording running tasks is not a heartbeat
+    assert Instance.objects.get(pk=node1.pk).modified == node1.modified
@@ -1,10 +1,19 @@
+import mock
 import pytest
 
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.http import Http404
+from django.test.utils import CaptureQueriesContext
 
 from awx.api.versioning import reverse
 from awx.main.middleware import URLModificationMiddleware
 from awx.main.models import * # noqa
+from awx.main.utils.named_url_graph import (
+    _commit_named_url_generation,
+    get_named_url_generation,
+    named_url_cache,
+)
 
 
 @pytest.fixture(scope='function', autouse=True)
@@ -18,6 +27,8 @@ def init_url_modification_middleware():
         URLModificationMiddleware()
     except ImproperlyConfigured:
         pass
+    # rolled back objects never invalidate the named urls resolved to them
+    named_url_cache.clear()
 
 
 @pytest.mark.django_db
@@ -188,3 +199,78 @@ def test_credential(get, admin_user, credentialtype_ssh):
     url = reverse('api:credential_detail', kwargs={'pk': test_cred.pk})
     response = get(url, user=admin_user, expect=200)
     assert response.data['related']['named_url'].endswith('/test_cred++Machine+ssh++/')
+
+
+@pytest.mark.django_db
+def test_named_url_resolution_cached():
+    middleware = URLModificationMiddleware()
+    test_org = Organization.objects.create(name='test_org')
+    test_inv = Inventory.objects.create(name='test_inv', organization=test_org)
+    org_path = '/api/v2/organizations/{}/'.format(test_org.pk)
+    inv_path = '/api/v2/inventories/{}/hosts/'.format(test_inv.pk)
+    assert middleware._convert_named_url('/api/v2/organizations/test_org/') == org_path
+    assert middleware._convert_named_url('/api/v2/inventories/test_inv++test_org/hosts/') == inv_path
+    with CaptureQueriesContext(connection) as queries:
+        assert middleware._convert_named_url('/api/v2/organizations/test_org/') == org_path
+        assert middleware._convert_named_url('/api/v2/inventories/test_inv++test_org/hosts/') == inv_path
+    assert len(queries) == 0
+
+    # saves that leave the named url alone keep the cache
+    test_org.description = 'changed'
+    test_org.save(update_fields=['description'])
+    with CaptureQueriesContext(connection) as queries:
+        middleware._convert_named_url('/api/v2/organizations/test_org/')
+    assert len(queries) == 0
+
+    # renaming the organization changes its named url and its inventories'
+    test_org.name = 'renamed_org'
+    test_org.save()
+    with pytest.raises(Http404):
+        middleware._convert_named_url('/api/v2/organizations/test_org/')
+    with pytest.raises(Http404):
+        middleware._convert_named_url('/api/v2/inventories/test_inv++test_org/hosts/')
+    assert middleware._convert_named_url('/api/v2/inventories/test_inv++renamed_org/hosts/') == inv_path
+
+    test_inv.delete()
+    with pytest.raises(Http404):
+        middleware._convert_named_url('/api/v2/inventories/test_inv++renamed_org/hosts/')
+
+
+@pytest.mark.django_db
+def test_named_url_changes_broadcast_on_commit():
+    test_org = Organization.objects.create(name='test_org')
+    test_org.name = 'renamed_org'
+    test_org.save()
+    test_org.name = 'renamed_again'
+    test_org.save()
+    commits = [func for sids, func in connection.run_on_commit if func is _commit_named_url_generation]
+    assert len(commits) == 1
+
+    generation = get_named_url_generation()
+    with mock.patch('awx.main.tasks.handle_named_url_changes.delay') as broadcast:
+        _commit_named_url_generation()
+    broadcast.assert_called_once_with()
+    assert get_named_url_generation() != generation
+
+
+def test_named_url_cache_bounded(settings):
+    settings.NAMED_URL_CACHE_SIZE = 2
+    named_url_cache.set(Organization, 'a', 'gen', '1')
+    named_url_cache.set(Organization, 'b', 'gen', '2')
+    assert named_url_cache.get(Organization, 'a', 'gen') == '1'
+    named_url_cache.set(Organization, 'c', 'gen', '3')
+    assert named_url_cache.get(Organization, 'b', 'gen') is None
+    assert named_url_cache.get(Organization, 'a', 'gen') == '1'
+    assert named_url_cache.get(Organization, 'c', 'gen') == '3'
+    assert named_url_cache.get(Organization, 'c', 'other-gen') is None
+
+
+def test_named_url_graph_loaded_from_cache(settings):
+    graph = settings.NAMED_URL_GRAPH
+    formats = dict(settings.NAMED_URL_FORMATS)
+    try:
+        URLModificationMiddleware()
+    except ImproperlyConfigured:
+        pass
+    assert settings.NAMED_URL_GRAPH[Host] is not graph[Host]
+    assert settings.NAMED_URL_FORMATS == formats
@@ -1,9 +1,24 @@
+import mock
 import pytest
+from crum import impersonate
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from awx.main.access import OrganizationAccess
 from awx.main.models import (
     Role,
     Organization,
     Project,
+    Team,
+)
+from awx.main.models.rbac import (
+    RoleAncestryChange,
+    RoleGeneration,
+    _commit_rbac_generation,
+    get_rbac_generation,
+    reset_rbac_generation,
+    tls,
 )
 from awx.main.fields import update_role_parentage_for_instance
 
@@ -69,6 +84,113 @@ def test_accessible_objects(organization, alice, bob):
     assert Organization.accessible_objects(bob, 'admin_role').count() == 0
 
 
+@pytest.mark.django_db
+def test_accessible_ids_cached(organization, alice, settings):
+    settings.AWX_RBAC_ACCESSIBLE_ID_CACHE = True
+    organization.admin_role.members.add(alice)
+    assert Organization.accessible_pk_qs(alice, 'admin_role') == [organization.pk]
+    with CaptureQueriesContext(connection) as queries:
+        assert Organization.accessible_pk_qs(alice, 'admin_role') == [organization.pk]
+    assert len(queries) == 0
+
+    # membership changes start a new generation
+    organization.admin_role.members.remove(alice)
+    assert Organization.accessible_pk_qs(alice, 'admin_role') == []
+
+    # and so do role hierarchy changes
+    team = Team.objects.create(name='cached-team', organization=organization)
+    team.member_role.members.add(alice)
+    assert Organization.accessible_pk_qs(alice, 'admin_role') == []
+    team.member_role.children.add(organization.admin_role)
+    assert Organization.accessible_pk_qs(alice, 'admin_role') == [organization.pk]
+
+
+@pytest.mark.django_db
+def test_rbac_generation_shared_through_database(organization, alice, settings):
+    settings.AWX_RBAC_ACCESSIBLE_ID_CACHE = True
+    organization.admin_role.members.add(alice)
+    # the test transaction never commits; do what commit does, on this
+    # node or any other
+    _commit_rbac_generation()
+    with mock.patch('awx.main.models.rbac._rbac_generation_pending', return_value=False):
+        assert Organization.accessible_pk_qs(alice, 'admin_role') == [organization.pk]
+        generation = get_rbac_generation()
+        assert RoleGeneration.objects.get().generation == generation
+
+        # another node commits a revocation
+        Role.members.through.objects.filter(user=alice).delete()
+        RoleGeneration.objects.update(generation=generation + 1)
+        reset_rbac_generation()
+        assert Organization.accessible_pk_qs(alice, 'admin_role') == []
+
+
+@pytest.mark.django_db
+def test_accessible_ids_over_limit(organization, alice, settings):
+    settings.AWX_RBAC_ACCESSIBLE_ID_CACHE = True
+    settings.AWX_RBAC_ACCESSIBLE_ID_CACHE_MAX = 1
+    other = Organization.objects.create(name='other-org')
+    organization.admin_role.members.add(alice)
+    other.admin_role.members.add(alice)
+    pk_qs = Organization.accessible_pk_qs(alice, 'admin_role')
+    assert not isinstance(pk_qs, list)
+    assert set(Organization.accessible_objects(alice, 'admin_role')) == set([organization, other])
+
+
+@pytest.mark.django_db
+def test_async_role_ancestry(organization, alice, settings):
+    settings.AWX_ROLE_ANCESTRY_ASYNC = True
+    A = Role.objects.create()
+    A.members.add(alice)
+    A.children.add(organization.admin_role)
+    assert RoleAncestryChange.objects.count() == 2
+    assert alice not in organization.admin_role
+
+    assert Role.apply_role_ancestry_changes() == 2
+    assert not RoleAncestryChange.objects.exists()
+    assert alice in organization.admin_role
+
+    A.children.remove(organization.admin_role)
+    assert alice in organization.admin_role
+    Role.apply_role_ancestry_changes()
+    assert alice not in organization.admin_role
+
+
+@pytest.mark.django_db
+def test_async_role_ancestry_read_your_writes(organization, alice, settings):
+    settings.AWX_ROLE_ANCESTRY_ASYNC = True
+    A = Role.objects.create()
+    A.members.add(alice)
+    A.children.add(organization.admin_role)
+    assert alice not in organization.admin_role
+    # checking access applies the changes this thread logged
+    OrganizationAccess(alice)
+    assert alice in organization.admin_role
+    assert not RoleAncestryChange.objects.exists()
+
+
+@pytest.mark.django_db
+def test_async_role_ancestry_applies_own_changes(organization, alice, bob, settings):
+    settings.AWX_ROLE_ANCESTRY_ASYNC = True
+    A = Role.objects.create()
+    A.members.add(alice)
+    B = Role.objects.create()
+    B.members.add(bob)
+    Role.apply_role_ancestry_changes()
+    with impersonate(alice):
+        A.children.add(organization.admin_role)
+    with impersonate(bob):
+        B.children.add(organization.auditor_role)
+    assert set(RoleAncestryChange.objects.values_list('user_id', flat=True)) == set([alice.pk, bob.pk])
+
+    # a later request by alice, in another thread, applies her change and
+    # leaves bob's to the background task
+    tls.pending_ancestry_roles = set()
+    Role.apply_pending_ancestry_changes(alice)
+    assert alice in organization.admin_role
+    assert bob not in organization.auditor_role
+    assert list(RoleAncestryChange.objects.values_list('user_id', flat=True)) == [bob.pk]
+
+
 @pytest.mark.django_db
 def test_team_symantics(organization, team, alice):
     assert alice not in organization.auditor_role
@@ -0,0 +1,13 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+
+from awx.main.management.commands.launch_timing import aggregate_phase_timing
+
+
+def test_aggregate_phase_timing():
+    rows = [('Deploy', {'queue_wait': float(i), 'first_event': 1.0}) for i in range(1, 21)]
+    rows.append(('Deploy', {}))  # a job which never reached the task manager
+    rows.append(('Backup', {'queue_wait': 0.5}))
+    results = aggregate_phase_timing(rows)
+    assert results['Deploy'] == (20, {'queue_wait': (11.0, 20.0), 'first_event': (1.0, 1.0)})
+    assert results['Backup'] == (1, {'queue_wait': (0.5, 0.5)})
@@ -0,0 +1,16 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+
+from awx.main.management.commands.resource_usage import aggregate_resource_usage
+
+
+def test_aggregate_resource_usage():
+    rows = [('Deploy', {'cpu_seconds': float(i), 'peak_rss_bytes': 1024}) for i in range(1, 21)]
+    rows.append(('Deploy', {}))  # a job which never ran
+    rows.append((None, {'cpu_seconds': 0.5}))
+    results = aggregate_resource_usage(rows)
+    assert results['Deploy'] == (20, {
+        'cpu_seconds': (11.0, 20.0, 20.0),
+        'peak_rss_bytes': (1024, 1024, 1024),
+    })
+    assert results[None] == (1, {'cpu_seconds': (0.5, 0.5, 0.5)})
@@ -1,10 +1,12 @@
 import cStringIO
+import json
 import mock
 import os
 import pytest
 import re
 import shutil
 import stat
+import sys
 import tempfile
 import time
 from collections import OrderedDict
@@ -68,6 +70,48 @@ def test_simple_spawn():
     assert FILENAME in stdout.getvalue()
 
 
+def test_resource_usage():
+    stdout = cStringIO.StringIO()
+    resource_usage = {}
+    # a parent which waits on a short-lived child that burns some CPU, holds
+    # 50MB and writes to disk
+    script = (
+        'import os, tempfile\n'
+        'pid = os.fork()\n'
+        'if pid == 0:\n'
+        '    sum(x * x for x in xrange(2000000))\n'
+        '    data = "x" * (50 * 1024 * 1024)\n'
+        '    with tempfile.TemporaryFile() as f:\n'
+        '        f.write("x" * 1024 * 1024); f.flush(); os.fsync(f.fileno())\n'
+        '    os._exit(0)\n'
+        'os.waitpid(pid, 0)\n'
+    )
+    status, rc = run.run_pexpect(
+        [sys.executable, '-c', script],
+        HERE,
+        {},
+        stdout,
+        cancelled_callback=lambda: False,
+        resource_usage=resource_usage,
+    )
+    assert status == 'successful'
+    assert resource_usage['cpu_seconds'] > 0
+    assert resource_usage['io_write_bytes'] >= 1024 * 1024
+    assert resource_usage['peak_rss_bytes'] >= 50 * 1024 * 1024
+    assert resource_usage['approx_processes'] >= 1
+    assert resource_usage['approx_peak_processes'] >= 1
+
+
+def test_resource_usage_peak_rss_not_raised():
+    # an earlier job run by this process had a larger process, so the peak
+    # of this one comes from the sampled high-water marks
+    usage = mock.Mock(ru_maxrss=1024 * 1024, ru_utime=0, ru_stime=0, ru_inblock=0, ru_oublock=0)
+    with mock.patch('awx.main.expect.run.resource.getrusage', return_value=usage):
+        sampler = run.ResourceSampler(os.getpid())
+        sampler.sample()
+        assert sampler.finish()['peak_rss_bytes'] == sampler.sampled_peak_rss > 0
+
+
 def test_error_rc():
     stdout = cStringIO.StringIO()
     status, rc = run.run_pexpect(
@@ -164,6 +208,64 @@ def test_manual_cancellation():
     assert status == 'canceled'
 
 
+@pytest.mark.parametrize('raw_reads', [False, True])
+def test_large_output(raw_reads):
+    stdout = cStringIO.StringIO()
+    status, rc = run.run_pexpect(
+        ['python', '-c', 'for i in xrange(20000): print "line %d" % i'],
+        HERE,
+        {},
+        stdout,
+        cancelled_callback=lambda: False,
+        raw_reads=raw_reads,
+    )
+    assert status == 'successful'
+    assert rc == 0
+    assert stdout.getvalue() == ''.join('line %d\r\n' % i for i in xrange(20000))
+
+
+def test_raw_reads_password_prompt():
+    stdout = cStringIO.StringIO()
+    expect_passwords = OrderedDict()
+    expect_passwords[re.compile(r'Password:\s*?$', re.M)] = 'secret123'
+    status, rc = run.run_pexpect(
+        ['python', '-c', 'import time; print "x" * 1000; print raw_input("Password: "); time.sleep(.05)'],
+        HERE,
+        {},
+        stdout,
+        cancelled_callback=lambda: False,
+        expect_passwords=expect_passwords,
+        raw_reads=True,
+    )
+    assert status == 'successful'
+    assert rc == 0
+    assert 'secret123' in stdout.getvalue()
+
+
+def test_raw_reads_prompt_split_across_reads():
+    child = mock.Mock(child_fd=None)
+    patterns = [re.compile(r'Password:\s*?$', re.M), run.pexpect.TIMEOUT, run.pexpect.EOF]
+    reader = run.RawReader(child, cStringIO.StringIO(), patterns)
+    assert reader.search(u'some output\r\nPass') is None
+    assert reader.search(u'word: ') == 0
+    # the matched prompt isn't found a second time
+    assert reader.search(u' ') is None
+
+
+def test_raw_reads_manual_cancellation():
+    stdout = cStringIO.StringIO()
+    status, rc = run.run_pexpect(
+        ['python', '-c', 'print raw_input("Password: ")'],
+        HERE,
+        {},
+        stdout,
+        cancelled_callback=lambda: True,  # this callable will cause cancellation
+        pexpect_timeout=0,
+        raw_reads=True,
+    )
+    assert status == 'canceled'
+
+
 def test_build_isolated_job_data(private_data_dir, rsa_key):
     pem, passphrase = rsa_key
     mgr = isolated_manager.IsolatedManager(
@@ -228,6 +330,58 @@ def test_run_isolated_job(private_data_dir, rsa_key):
     assert env['ANSIBLE_STDOUT_CALLBACK'] == 'awx_display'
     assert env['ANSIBLE_CALLBACK_PLUGINS'] == '/path/to/awx/lib/isolated_callbacks'
     assert env['AWX_ISOLATED_DATA_DIR'] == private_data_dir
+    assert 'AWX_ISOLATED_EVENT_LOG' not in env
+
+
+def test_run_isolated_job_event_log(private_data_dir):
+    env = {'JOB_ID': '1'}
+    mgr = isolated_manager.IsolatedManager(
+        ['ls', '-la'], HERE, env, cStringIO.StringIO(), ''
+    )
+    mgr.private_data_dir = private_data_dir
+    mgr.build_isolated_job_data()
+    with mock.patch('os.getenv') as env_mock:
+        env_mock.return_value = '/path/to/awx/lib'
+        run.run_isolated_job(private_data_dir, {'env': env, 'event_log': True}, cStringIO.StringIO())
+    assert env['AWX_ISOLATED_EVENT_LOG'] == os.path.join(private_data_dir, 'artifacts', 'stdout_events')
+
+
+def test_isolated_event_log(private_data_dir):
+    path = os.path.join(private_data_dir, 'stdout_events')
+    log = isolated_manager.IsolatedEventLog(path)
+    assert log.pop('missing') is None
+
+    def _record(**partial_event_data):
+        data = json.dumps(partial_event_data)
+        return '{}:{}\n'.format(len(data), data)
+
+    first = _record(uuid='abc', event='playbook_on_start')
+    second = _record(uuid='def', event='runner_on_ok', event_data={'res': u'\N{SNOWMAN}'})
+    with open(path, 'w') as f:
+        # the second record has only been partially synced
+        f.write(first + second[:10])
+    assert log.pop('def') is None
+    assert log.offset == len(first)
+    assert log.pop('abc') == {'uuid': 'abc', 'event': 'playbook_on_start'}
+    assert log.pop('abc') is None
+
+    with open(path, 'a') as f:
+        f.write(second[10:])
+    assert log.pop('def')['event_data'] == {'res': u'\N{SNOWMAN}'}
+    assert log.offset == len(first) + len(second)
+
+
+@pytest.mark.parametrize('garbage', ['12x:{}\n', '2:{}}\n', '8:{"a": 1}\n', '-3:{}\n'])
+def test_isolated_event_log_corrupt_record(private_data_dir, garbage):
+    path = os.path.join(private_data_dir, 'stdout_events')
+    good = json.dumps({'uuid': 'abc'})
+    with open(path, 'w') as f:
+        f.write('{}:{}\n{}'.format(len(good), good, garbage))
+    log = isolated_manager.IsolatedEventLog(path)
+    assert log.pop('def') is None
+    assert log.corrupt
+    assert log.offset == len(good) + len(str(len(good))) + 2
+    assert log.pop('abc') == {'uuid': 'abc'}
 
 
 def test_run_isolated_adhoc_command(private_data_dir, rsa_key):
@@ -263,6 +417,7 @@ def test_run_isolated_adhoc_command(private_data_dir, rsa_key):
     assert env['AWX_ISOLATED_DATA_DIR'] == private_data_dir
 
 
+@mock.patch.object(settings, 'AWX_ISOLATED_BATCH_CHECKS', False)
 def test_check_isolated_job(private_data_dir, rsa_key):
     pem, passphrase = rsa_key
     stdout = cStringIO.StringIO()
@@ -313,6 +468,7 @@ def test_check_isolated_job(private_data_dir, rsa_key):
         )
 
 
+@mock.patch.object(settings, 'AWX_ISOLATED_BATCH_CHECKS', False)
 def test_check_isolated_job_timeout(private_data_dir, rsa_key):
     pem, passphrase = rsa_key
     stdout = cStringIO.StringIO()
@@ -339,3 +495,138 @@ def test_check_isolated_job_timeout(private_data_dir, rsa_key):
         assert stdout.getvalue() == 'checking job status...'
 
     assert extra_update_fields['job_explanation'] == 'Job terminated due to timeout'
+
+
+def _batch_check_output(host, alive=(), finished=()):
+    # what `check_isolated_batch.yml` prints with the json stdout callback
+    alive_results = [{'item': src, 'rc': 0} for src in alive]
+    alive_results.extend({'item': src, 'rc': 1, 'failed': True} for src in finished)
+    tasks = [
+        ('Determine if daemon processes are alive.', alive_results),
+        ('Copy artifacts from the isolated host.', [{'item': r['item'], 'rc': 0} for r in alive_results]),
+        ('Look for gathered facts of finished jobs.', [
+            {'item': r, 'skipped': True} if r['rc'] == 0 else {'item': r, 'stat': {'exists': False}}
+            for r in alive_results
+        ]),
+    ]
+    return json.dumps({'plays': [{'tasks': [
+        {'task': {'name': name}, 'hosts': {host: {'results': results}}}
+        for name, results in tasks
+    ]}]})
+
+
+def test_check_isolated_job_batched(private_data_dir):
+    stdout = cStringIO.StringIO()
+    resource_usage = {}
+    mgr = isolated_manager.IsolatedManager(['ls', '-la'], HERE, {}, stdout, '',
+                                           resource_usage=resource_usage)
+    mgr.private_data_dir = private_data_dir
+    mgr.instance = mock.Mock(id=123, pk=123, verbosity=5, spec_set=['id', 'pk', 'verbosity'])
+    mgr.started_at = time.time()
+    mgr.host = 'isolated-host'
+
+    os.mkdir(os.path.join(private_data_dir, 'artifacts'))
+    with mock.patch.object(settings, 'AWX_PROOT_BASE_PATH', private_data_dir), \
+            mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+
+        def _synchronize_job_artifacts(args, cwd, env, buff, **kw):
+            for filename, data in (
+                ['status', 'failed'],
+                ['rc', '1'],
+                ['stdout', 'KABOOM!'],
+                ['resource_usage', '{"cpu_seconds": 1.5}'],
+            ):
+                with open(os.path.join(private_data_dir, 'artifacts', filename), 'w') as f:
+                    f.write(data)
+            buff.write(_batch_check_output('isolated-host', finished=[private_data_dir]))
+            return ('successful', 0)
+
+        run_pexpect.side_effect = _synchronize_job_artifacts
+        status, rc = mgr.check(interval=0)
+
+    assert status == 'failed'
+    assert rc == 1
+    assert stdout.getvalue() == 'KABOOM!'
+    assert resource_usage == {'cpu_seconds': 1.5}
+    args, cwd, env = run_pexpect.call_args[0][:3]
+    assert args[:2] == ['ansible-playbook', 'check_isolated_batch.yml']
+    assert json.loads(args[args.index('-e') + 1]) == {'srcs': [private_data_dir]}
+    assert env['ANSIBLE_STDOUT_CALLBACK'] == 'json'
+
+
+def test_isolated_status_poller_shares_playbook_run(private_data_dir):
+    running, finished = [os.path.join(private_data_dir, name) for name in ('running', 'finished')]
+    spool_dir = os.path.join(private_data_dir, 'spool')
+    for path in (running, finished, spool_dir):
+        os.mkdir(path)
+    poller = isolated_manager.IsolatedStatusPoller('isolated-host', spool_dir=spool_dir)
+
+    # another job on the same host is already waiting to be checked
+    poller._write(poller.path_to('1.request'), {'src': running})
+    with mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+
+        def _check(args, cwd, env, buff, **kw):
+            buff.write(_batch_check_output('isolated-host', alive=[running], finished=[finished]))
+            return ('successful', 0)
+
+        run_pexpect.side_effect = _check
+        status, output = poller.poll(2, finished)
+        assert status == 'successful'
+
+        # the waiting job's result was written by the same playbook run
+        assert run_pexpect.call_count == 1
+        args = run_pexpect.call_args[0][0]
+        assert json.loads(args[args.index('-e') + 1]) == {'srcs': sorted([running, finished])}
+        assert poller._read(poller.path_to('1.result'))['status'] == 'failed'
+        assert not os.path.exists(poller.path_to('1.request'))
+
+    assert sorted(os.listdir(spool_dir)) == ['.lock', '1.result']
+
+
+def test_isolated_status_poller_unreadable_output(private_data_dir):
+    poller = isolated_manager.IsolatedStatusPoller('isolated-host', spool_dir=private_data_dir)
+    with mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+        run_pexpect.side_effect = lambda args, cwd, env, buff, **kw: ('failed', 4)
+        assert poller.check(['/tmp/a', '/tmp/b']) == {
+            '/tmp/a': ('failed', ''),
+            '/tmp/b': ('failed', ''),
+        }
+
+
+def test_isolated_status_poller_output_preamble(private_data_dir):
+    poller = isolated_manager.IsolatedStatusPoller('isolated-host', spool_dir=private_data_dir)
+    with mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+
+        def _check(args, cwd, env, buff, **kw):
+            buff.write('Using /etc/ansible/ansible.cfg as config file\n')
+            buff.write(_batch_check_output('isolated-host', finished=['/tmp/a']))
+            return ('successful', 0)
+
+        run_pexpect.side_effect = _check
+        assert poller.check(['/tmp/a'])['/tmp/a'][0] == 'successful'
+
+
+def test_isolated_status_poller_bounded_batches(private_data_dir):
+    poller = isolated_manager.IsolatedStatusPoller('isolated-host', spool_dir=private_data_dir)
+    srcs = ['/tmp/job-{}'.format(i) for i in range(poller.BATCH_SIZE + 1)]
+    with mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+
+        def _check(args, cwd, env, buff, **kw):
+            batch = json.loads(args[args.index('-e') + 1])['srcs']
+            buff.write(_batch_check_output('isolated-host', finished=batch))
+            return ('successful', 0)
+
+        run_pexpect.side_effect = _check
+        results = poller.check(srcs, verbosity=2)
+
+    assert sorted(results) == sorted(srcs)
+    assert all(status == 'successful' for status, output in results.values())
+    assert run_pexpect.call_count == 2
+    (first_args, _, _, _), first_kw = run_pexpect.call_args_list[0]
+    (last_args, _, _, _), last_kw = run_pexpect.call_args_list[1]
+    assert len(json.loads(first_args[first_args.index('-e') + 1])['srcs']) == poller.BATCH_SIZE
+    assert json.loads(last_args[last_args.index('-e') + 1])['srcs'] == srcs[-1:]
+    # the check is not verbose, whatever the jobs' verbosity
+    assert not any(arg.startswith('-v') for arg in first_args + last_args)
+    # each job in a batch gets as long as a check of a single job
+    assert first_kw['job_timeout'] == last_kw['job_timeout'] * poller.BATCH_SIZE
@@ -11,6 +11,7 @@ class FakeObject(object):
 
 class Job(FakeObject):
     task_impact = 43
+    execution_node = ''
 
     def log_format(self):
         return 'job 382 (fake)'
@@ -73,6 +74,20 @@ def test_committed_capacity(sample_cluster):
     assert capacities['ig_small']['committed_capacity'] == 43
 
 
+def test_placed_waiting_capacity(sample_cluster):
+    tower, ig_large, ig_small = sample_cluster()
+    tasks = [
+        Job(status='waiting', instance_group=ig_large, execution_node='i3'),
+    ]
+    capacities = InstanceGroup.objects.capacity_values(
+        qs=[tower, ig_large, ig_small], tasks=tasks, breakdown=True
+    )
+    # i3 is not in the tower group, so a job placed on it doesn't count toward it
+    assert capacities['tower']['committed_capacity'] == 0
+    assert capacities['ig_large']['committed_capacity'] == 43
+    assert capacities['ig_small']['committed_capacity'] == 0
+
+
 def test_running_capacity(sample_cluster):
     tower, ig_large, ig_small = sample_cluster()
     tasks = [
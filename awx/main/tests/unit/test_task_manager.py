@@ -4,7 +4,8 @@
 import mock
 import pytest
 
-from django.utils.timezone import now as tz_now
+from django.conf import settings
+from django.utils.timezone import now as tz_now, timedelta
 from django.db import DatabaseError
 
 from awx.main.scheduler import TaskManager
@@ -16,6 +17,7 @@ from awx.main.models import (
 from django.core.cache import cache
 
 
+@mock.patch.object(settings, 'AWX_RUNNING_TASK_REGISTRY', False)
 class TestCleanupInconsistentCeleryTasks():
     @mock.patch.object(cache, 'get', return_value=None)
     @mock.patch.object(TaskManager, 'get_active_tasks', return_value=([], {}))
@@ -67,3 +69,82 @@ class TestCleanupInconsistentCeleryTasks():
         active_task_queues, queues = tm.get_active_tasks()
         assert 'host1' in queues
         assert 'host2' in queues
+
+
+@mock.patch.object(settings, 'AWX_RUNNING_TASK_REGISTRY', True)
+class TestCleanupWithTaskRegistry():
+
+    @mock.patch.object(cache, 'get', return_value=None)
+    @mock.patch.object(InstanceGroup.objects, 'prefetch_related', return_value=[])
+    @mock.patch.object(Instance.objects, 'values_list', return_value=['host1', 'host2'])
+    @mock.patch.object(TaskManager, 'get_running_tasks')
+    @mock.patch.object(TaskManager, 'get_active_tasks')
+    @mock.patch('awx.main.scheduler.task_manager.task_registry.get_running_tasks')
+    def test_orphans_found_without_inspect(self, get_registered, get_active_tasks, get_running_tasks, *args):
+        published = tz_now()
+        get_registered.return_value = {
+            'host1': (published, set(['running'])),
+        }
+        before = published - timedelta(minutes=5)
+        running = Job(id=2, modified=before, status='running', celery_task_id='running', execution_node='host1')
+        orphan = Job(id=3, modified=before, status='running', celery_task_id='orphan', execution_node='host1')
+        late = Job(id=4, modified=published + timedelta(seconds=1), status='running',
+                   celery_task_id='late', execution_node='host1')
+        get_running_tasks.return_value = ({'host1': [running, orphan, late]}, [])
+        tm = TaskManager()
+        with mock.patch.object(TaskManager, 'fail_jobs_if_not_in_celery') as fail_jobs:
+            tm.cleanup_inconsistent_celery_tasks()
+        get_active_tasks.assert_not_called()
+        node_jobs, active_tasks, start_time = fail_jobs.call_args_list[-1][0]
+        assert node_jobs == [running, orphan, late]
+        assert active_tasks == set(['running'])
+        assert orphan.modified < start_time < late.modified
+
+    @mock.patch.object(cache, 'get', return_value=None)
+    @mock.patch.object(InstanceGroup.objects, 'prefetch_related', return_value=[])
+    @mock.patch.object(Instance.objects, 'values_list', return_value=['host1'])
+    @mock.patch.object(TaskManager, 'get_running_tasks')
+    @mock.patch('awx.main.scheduler.task_manager.task_registry.get_running_tasks', return_value={})
+    def test_nothing_published(self, get_registered, get_running_tasks, *args):
+        tm = TaskManager()
+        assert tm.cleanup_inconsistent_celery_tasks() is None
+        get_running_tasks.assert_not_called()
+
+
+class TestInstancePlacement():
+
+    @pytest.fixture
+    def task_manager(self):
+        with mock.patch.object(InstanceGroup.objects, 'prefetch_related', return_value=[]):
+            tm = TaskManager()
+        tm.graph['ig'] = dict(instances=['i1', 'i2', 'i3', 'offline'])
+        tm.instances = {
+            'i1': dict(capacity_total=100, consumed_capacity=20),
+            'i2': dict(capacity_total=100, consumed_capacity=60),
+            'i3': dict(capacity_total=50, consumed_capacity=0),
+            'offline': dict(capacity_total=0, consumed_capacity=0),
+        }
+        return tm
+
+    @pytest.mark.parametrize('policy, impact, hostname', [
+        ('most_remaining', 30, 'i1'),
+        ('best_fit', 30, 'i2'),
+        ('best_fit', 45, 'i3'),
+        ('best_fit', 200, 'i1'),
+        (None, 30, ''),
+    ])
+    def test_place_task(self, task_manager, policy, impact, hostname):
+        task = mock.MagicMock(task_impact=impact)
+        with mock.patch.object(settings, 'AWX_INSTANCE_PLACEMENT', policy):
+            assert task_manager.place_task(task, 'ig') == hostname
+
+    def test_consumed_instance_capacity(self, task_manager):
+        with mock.patch.object(InstanceGroup.objects, 'capacity_values', return_value=task_manager.graph):
+            task_manager.calculate_capacity_consumed([
+                mock.MagicMock(execution_node='i2', status='running', task_impact=10),
+                mock.MagicMock(execution_node='i2', status='waiting', task_impact=5),
+                mock.MagicMock(execution_node='', status='waiting', task_impact=5),
+            ])
+        assert task_manager.instances['i1']['consumed_capacity'] == 0
+        assert task_manager.instances['i2']['consumed_capacity'] == 15
+        assert task_manager.get_remaining_instance_capacity('i2') == 85
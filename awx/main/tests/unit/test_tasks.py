@@ -3,12 +3,15 @@
 from contextlib import contextmanager
 from datetime import datetime
 from functools import partial
+import itertools
 import ConfigParser
 import json
 import os
 import re
 import shutil
 import tempfile
+import threading
+import time
 
 from backports.tempfile import TemporaryDirectory
 import fcntl
@@ -454,6 +457,41 @@ class TestGenericRun(TestJobExecution):
 
         assert self.task.update_model.call_args[-1]['emitted_events'] == 334
 
+    def test_resource_usage(self):
+        def _consume(args, cwd, env, stdout_handle, resource_usage=None, **kw):
+            resource_usage['cpu_seconds'] = 12.5
+            return ['successful', 0]
+
+        self.run_pexpect.side_effect = _consume
+        self.task.run(self.pk)
+        assert self.task.update_model.call_args[-1]['resource_usage'] == {'cpu_seconds': 12.5}
+
+    def test_phase_timing(self):
+        self.instance.phase_timing = {'scheduler_wait': 2.0}
+        with mock.patch.object(self.task, 'get_stdout_handle') as mock_stdout:
+            handle = OutputEventFilter(lambda event_data: None)
+            mock_stdout.return_value = handle
+
+            def _first_event(args, cwd, env, stdout_handle, **kw):
+                stdout_handle.first_event_at = time.time()
+                return ['successful', 0]
+
+            self.run_pexpect.side_effect = _first_event
+            with mock.patch.object(handle, 'close') as close:
+                close.side_effect = lambda: self.task.update_model(self.pk, stdout_closed=True)
+                self.task.run(self.pk)
+
+        calls = [c[1] for c in self.task.update_model.call_args_list]
+        timing_call = [c for c in calls if 'phase_timing' in c][0]
+        # timing is saved before stdout is closed and EOF is sent
+        assert calls.index(timing_call) < calls.index({'stdout_closed': True})
+        timing = timing_call['phase_timing']
+        assert timing['scheduler_wait'] == 2.0
+        for phase in ('pre_run_hook', 'private_data', 'build_args', 'credentials', 'proot',
+                      'first_event', 'time_to_first_event'):
+            assert phase in timing
+        assert timing['time_to_first_event'] >= 2.0
+
     def test_artifact_cleanup(self):
         path = tempfile.NamedTemporaryFile(delete=False).name
         try:
@@ -2197,3 +2235,92 @@ def test_aquire_lock_acquisition_fail_logged(fcntl_flock, logging_getLogger, os_
         ProjectUpdate.acquire_lock(instance)
     os_close.assert_called_with(3)
     assert logger.err.called_with("I/O error({0}) while trying to aquire lock on file [{1}]: {2}".format(3, 'this_file_does_not_exist', 'dummy message'))
+
+
+class TestJobProjectLock:
+
+    @pytest.fixture
+    def job(self):
+        return Job(pk=1, inventory=Inventory(), project=Project(pk=1, scm_type='git'))
+
+    @pytest.fixture
+    def lock_path(self, tmpdir):
+        lock_path = str(tmpdir.join('_1__demo.lock'))
+        with mock.patch.object(Project, 'get_lock_file', return_value=lock_path):
+            yield lock_path
+
+    def run_pre_run_hook(self, task, job, errors):
+        try:
+            task.pre_run_hook(job, isolated=False)
+        except Exception as e:
+            errors.append(e)
+
+    def test_job_waits_for_in_flight_sync(self, job, lock_path):
+        in_flight_sync = tasks.RunProjectUpdate()
+        in_flight_sync.acquire_lock(job.project, log_format='project_update 2')
+        synced_under_lock, errors = [], []
+        with mock.patch.object(tasks.RunJob, '_sync_project',
+                               lambda self, job, pu_task, **kw: synced_under_lock.append(pu_task.lock_fd)), \
+                mock.patch('awx.main.tasks.time.time', side_effect=itertools.count(step=2)):
+            waiter = threading.Thread(target=self.run_pre_run_hook, args=(tasks.RunJob(), job, errors))
+            waiter.start()
+            waiter.join(0.5)
+            assert waiter.is_alive()
+            assert synced_under_lock == []
+            in_flight_sync.release_lock(job.project)
+            waiter.join(5)
+        assert not waiter.is_alive()
+        assert errors == []
+        assert len(synced_under_lock) == 1 and synced_under_lock[0] is not None
+
+        # the job let go of the lock
+        fd = os.open(lock_path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
+
+    def test_lock_released_when_sync_fails(self, job, lock_path):
+        with mock.patch.object(tasks.RunJob, '_sync_project', side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                tasks.RunJob().pre_run_hook(job, isolated=False)
+        fd = os.open(lock_path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
+
+
+class TestProjectCheckoutRevision:
+
+    @pytest.fixture
+    def project(self, tmpdir):
+        project_path = tmpdir.mkdir('_1__demo')
+        return mock.Mock(
+            scm_revision='abc123', scm_clean=False, log_format='project_update 1',
+            get_project_path=lambda *a, **kw: str(project_path),
+            get_revision_file=lambda: str(project_path) + '.revision',
+        )
+
+    def test_no_revision_recorded(self, project):
+        assert tasks.RunProjectUpdate().checkout_is_current(project) is False
+
+    def test_recorded_revision_matches(self, project):
+        task = tasks.RunProjectUpdate()
+        task.set_checkout_revision(project, 'abc123')
+        assert task.checkout_is_current(project) is True
+        project.scm_revision = 'def456'
+        assert task.checkout_is_current(project) is False
+
+    def test_scm_clean_always_syncs(self, project):
+        task = tasks.RunProjectUpdate()
+        task.set_checkout_revision(project, 'abc123')
+        project.scm_clean = True
+        assert task.checkout_is_current(project) is False
+
+    def test_clear_revision(self, project):
+        task = tasks.RunProjectUpdate()
+        task.set_checkout_revision(project, 'abc123')
+        task.set_checkout_revision(project, None)
+        assert not os.path.exists(project.get_revision_file())
+        assert task.checkout_is_current(project) is False
@@ -0,0 +1,62 @@
+import os
+
+import mock
+import pytest
+
+from awx.main.utils import ansible
+from awx.main.utils.ansible import ProjectFileCatalog
+
+
+@pytest.fixture
+def project(tmpdir):
+    project_dir = tmpdir.mkdir('_1__demo')
+    project_dir.join('site.yml').write('- hosts: all\n')
+    project_dir.join('vars.yml').write('foo: bar\n')
+    project_dir.join('hosts').write('[web]\nweb1\n')
+    project_dir.mkdir('roles').join('main.yml').write('- hosts: all\n')
+    return str(project_dir)
+
+
+def test_catalog_scan(project):
+    catalog = ProjectFileCatalog(project, catalog_path=project + '.catalog')
+    assert catalog.playbooks == ['site.yml']
+    assert catalog.inventories == ['hosts']
+    assert os.path.exists(project + '.catalog')
+
+
+def test_catalog_save_uses_own_temporary_file(project):
+    catalog_path = project + '.catalog'
+    # another process in the middle of saving the same catalog
+    with open(catalog_path + '.tmp', 'w') as f:
+        f.write('partial')
+    catalog = ProjectFileCatalog(project, catalog_path=catalog_path)
+    assert catalog.playbooks == ['site.yml']
+    with open(catalog_path + '.tmp') as f:
+        assert f.read() == 'partial'
+    assert ProjectFileCatalog(project, catalog_path=catalog_path).entries == catalog.entries
+    assert sorted(os.listdir(os.path.dirname(project))) == sorted([
+        os.path.basename(project), os.path.basename(catalog_path), os.path.basename(catalog_path) + '.tmp'
+    ])
+
+
+def test_catalog_only_reads_changed_files(project):
+    catalog_path = project + '.catalog'
+    ProjectFileCatalog(project, catalog_path=catalog_path).playbooks
+
+    with mock.patch.object(ansible, 'could_be_playbook', side_effect=ansible.could_be_playbook) as could_be_playbook:
+        assert ProjectFileCatalog(project, catalog_path=catalog_path).playbooks == ['site.yml']
+        assert could_be_playbook.call_count == 0
+
+        with open(os.path.join(project, 'vars.yml'), 'w') as f:
+            f.write('- hosts: localhost\n  gather_facts: false\n')
+        assert ProjectFileCatalog(project, catalog_path=catalog_path).playbooks == ['site.yml', 'vars.yml']
+        assert could_be_playbook.call_count == 1
+
+
+def test_catalog_forgets_removed_files(project):
+    catalog_path = project + '.catalog'
+    ProjectFileCatalog(project, catalog_path=catalog_path).playbooks
+    os.remove(os.path.join(project, 'site.yml'))
+    catalog = ProjectFileCatalog(project, catalog_path=catalog_path)
+    assert catalog.playbooks == []
+    assert 'site.yml' not in catalog.entries
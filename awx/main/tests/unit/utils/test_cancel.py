@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# python
+import os
+import mock
+
+# AWX
+from awx.main.utils.cancel import CancelListener, CancelWatcher
+
+
+def test_cancel_watcher_polls_when_not_listening(tmpdir):
+    poll = mock.Mock(side_effect=[False, False, True])
+    watcher = CancelWatcher(1, poll, poll_interval=30, path=str(tmpdir.join('missing'))).start()
+    assert not watcher.listening
+    assert watcher() is False
+    assert watcher() is False
+    assert watcher() is True
+    assert poll.call_count == 3
+    # once canceled, the database is not consulted again
+    assert watcher() is True
+    assert poll.call_count == 3
+    watcher.stop()
+
+
+def test_cancel_watcher_notification_skips_poll(tmpdir):
+    poll = mock.Mock(return_value=False)
+    listener = CancelListener(path=str(tmpdir))
+    watcher = CancelWatcher(1, poll, poll_interval=30, path=str(tmpdir))
+    listener.heartbeat()
+    assert watcher.listening
+    assert watcher() is False
+    listener.dispatch('2')
+    assert watcher() is False
+    listener.dispatch('1')
+    assert watcher() is True
+    poll.assert_not_called()
+    watcher.stop()
+    assert not os.path.exists(watcher.marker)
+
+
+def test_cancel_watcher_stale_listener(tmpdir):
+    poll = mock.Mock(return_value=True)
+    watcher = CancelWatcher(1, poll, poll_interval=30, path=str(tmpdir))
+    os.utime(str(tmpdir), (0, 0))
+    assert not watcher.listening
+    assert watcher() is True
+    assert poll.call_count == 1
+
+
+def test_cancel_watcher_slow_fallback_poll(tmpdir):
+    poll = mock.Mock(return_value=True)
+    watcher = CancelWatcher(1, poll, poll_interval=30, path=str(tmpdir))
+    with mock.patch.object(CancelWatcher, 'listening', True):
+        assert watcher() is False
+        with mock.patch('awx.main.utils.cancel.time.time', return_value=watcher._last_poll + 31):
+            assert watcher() is True
+    assert poll.call_count == 1
+
+
+def test_cancel_listener_ignores_bad_payloads(tmpdir):
+    listener = CancelListener(path=str(tmpdir.join('notify')))
+    os.mkdir(listener.path)
+    for payload in ('../escaped', str(tmpdir.join('absolute')), 'x', ''):
+        listener.dispatch(payload)
+    assert os.listdir(str(tmpdir)) == ['notify']
+    assert os.listdir(listener.path) == []
+    listener.dispatch('42')
+    assert os.listdir(listener.path) == ['42']
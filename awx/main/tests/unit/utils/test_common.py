@@ -186,3 +186,47 @@ def test_region_sorting():
          ('Lewie', 'US1'),
          ('All', 'All')]
     assert [x[1] for x in sorted(s, key=common.region_sorting)] == ['All', 'US1', 'China1', 'UK1']
+
+
+def test_phase_timer():
+    with mock.patch('awx.main.utils.common.time.time') as time:
+        time.return_value = 100
+        timer = common.PhaseTimer({'scheduler_wait': 1.5})
+        time.return_value = 102.25
+        timer.lap('build_args')
+        time.return_value = 102.5
+        timer.lap('credentials')
+        time.return_value = 103
+        timer.lap('build_args')
+        timer.record('queue_wait', 0.1234)
+    assert timer.timing == {
+        'scheduler_wait': 1.5,
+        'queue_wait': 0.123,
+        'build_args': 2.75,
+        'credentials': 0.25,
+    }
+
+
+@pytest.mark.parametrize('consumed, load_average, available, current, capacity', [
+    (0, 0, 1.0, None, 61),      # idle: same as the static capacity
+    (20, 1, 0.1, None, 32),     # memory-heavy jobs: cut back to the CPU headroom
+    (50, 0.4, 1.0, None, 111),  # trivial jobs: room for more than the static capacity
+    (100, 0, 1.0, None, 122),   # ceiling
+    (0, 8, 0.0, None, 30),      # floor
+    (0, 0, 1.0, 58, 58),        # hysteresis
+    (0, 0, 1.0, 40, 61),
+])
+def test_adaptive_capacity(consumed, load_average, available, current, capacity):
+    gigabyte = 1024 * 1024 * 1024
+    load = {
+        'cpu': 4,
+        'load_average': load_average,
+        'mem_total': 8 * gigabyte,
+        'mem_available': int(6 * gigabyte * available),
+    }
+    with mock.patch.object(common, 'get_cpu_capacity', return_value=(4, 16)), \
+            mock.patch.object(common, 'get_mem_capacity', return_value=(8 * gigabyte, 61)), \
+            mock.patch.object(settings, 'AWX_ADAPTIVE_CAPACITY_FLOOR', 0.5), \
+            mock.patch.object(settings, 'AWX_ADAPTIVE_CAPACITY_CEILING', 2.0), \
+            mock.patch.object(settings, 'AWX_ADAPTIVE_CAPACITY_HYSTERESIS', 0.1):
+        assert common.get_adaptive_capacity(load, consumed, current=current) == capacity
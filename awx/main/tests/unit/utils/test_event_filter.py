@@ -197,3 +197,71 @@ def test_verbose_line_buffering():
     assert len(events) == 6
 
     assert events[5]['event'] == 'EOF'
+
+
+def _reconstruct_stdout(events):
+    # mirrors UnifiedJob.result_stdout_raw_handle, which concatenates event
+    # stdout (one row per line) and restores escaped \r\n sequences
+    return ''.join(
+        e['stdout'].replace('\r\n', '\n') + '\n'
+        for e in sorted(events, key=lambda e: e['start_line'])
+    )
+
+
+@pytest.mark.parametrize('max_lines, max_bytes, expected_events', [
+    (1, 0, 1000),
+    (100, 0, 10),
+    (1000, 512, 20),
+])
+def test_verbose_line_coalescing(max_lines, max_bytes, expected_events):
+    events = []
+    f = OutputVerboseFilter(events.append, max_lines=max_lines, max_bytes=max_bytes)
+    for i in xrange(1000):
+        f.write('line {}\r\n'.format(i))
+    f.close()
+
+    assert events.pop()['event'] == 'EOF'
+    assert len(events) == expected_events
+    assert events[0]['start_line'] == 0
+    assert events[-1]['end_line'] == 1000
+    for previous, current in zip(events, events[1:]):
+        assert current['start_line'] == previous['end_line']
+        assert current['counter'] == previous['counter'] + 1
+    assert _reconstruct_stdout(events) == ''.join(
+        'line {}\n'.format(i) for i in xrange(1000)
+    )
+
+
+def test_verbose_line_coalescing_flushed_on_delay(mocker):
+    events = []
+    f = OutputVerboseFilter(events.append, max_lines=100, max_delay=1)
+    now = mocker.patch('awx.main.utils.common.time.time', return_value=100)
+    f.write('one\r\ntwo\r\n')
+    f.flush()
+    assert events == []
+
+    now.return_value = 101
+    f.flush()
+    assert len(events) == 1
+    assert events[0]['stdout'] == 'one\r\ntwo'
+    assert events[0]['start_line'] == 0
+    assert events[0]['end_line'] == 2
+
+
+def test_verbose_line_coalescing_breaks_on_bare_carriage_return():
+    events = []
+    f = OutputVerboseFilter(events.append, max_lines=100)
+    f.write('one\r\n50%\rdone\r\ntwo\r\n')
+    f.close()
+    assert [e['stdout'] for e in events[:-1]] == ['one', '50', 'done\r\ntwo']
+
+
+@pytest.mark.parametrize('cls', [OutputEventFilter, OutputVerboseFilter])
+def test_first_event_at(cls, mocker):
+    f = cls(lambda event_data: None)
+    f.write('no newline yet')
+    assert f.first_event_at is None
+    mocker.patch('awx.main.utils.common.time.time', return_value=1234)
+    f.write('\r\n')
+    f.close()
+    assert f.first_event_at == 1234
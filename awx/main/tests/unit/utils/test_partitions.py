@@ -0,0 +1,74 @@
+import datetime
+
+import mock
+import pytest
+from django.db import models
+from django.utils.timezone import now, utc
+
+from awx.main.utils.partitions import check_partitions_ahead, drop_partitions, parse_partition_bound, partition_start
+
+
+@pytest.mark.parametrize('day, days, start', [
+    (datetime.date(2018, 6, 6), 1, datetime.date(2018, 6, 6)),
+    (datetime.date(2018, 6, 4), 7, datetime.date(2018, 6, 4)),
+    (datetime.date(2018, 6, 6), 7, datetime.date(2018, 6, 4)),
+    (datetime.date(2018, 6, 10), 7, datetime.date(2018, 6, 4)),
+    (datetime.date(2018, 6, 11), 7, datetime.date(2018, 6, 11)),
+])
+def test_partition_start(day, days, start):
+    assert partition_start(day, days) == start
+
+
+def test_parse_partition_bound():
+    start, end = parse_partition_bound(
+        "FOR VALUES FROM ('2018-06-04 00:00:00+00') TO ('2018-06-05 00:00:00+00')"
+    )
+    assert start == datetime.datetime(2018, 6, 4, tzinfo=utc)
+    assert end == datetime.datetime(2018, 6, 5, tzinfo=utc)
+
+
+def test_parse_legacy_partition_bound():
+    start, end = parse_partition_bound("FOR VALUES FROM (MINVALUE) TO ('2018-06-04 00:00:00+00')")
+    assert start is None
+    assert end == datetime.datetime(2018, 6, 4, tzinfo=utc)
+
+
+def test_parse_bad_partition_bound():
+    with pytest.raises(ValueError):
+        parse_partition_bound('FOR VALUES IN (1, 2)')
+
+
+@pytest.mark.parametrize('days_ahead, level', [
+    (7, None),
+    (5, 'error'),
+    (0, 'critical'),
+])
+def test_check_partitions_ahead(days_ahead, level):
+    end = now() + datetime.timedelta(days=days_ahead, minutes=-1)
+    with mock.patch('awx.main.utils.partitions.get_partitions', return_value=[('main_jobevent_x', None, end)]), \
+            mock.patch('awx.main.utils.partitions.logger') as logger:
+        check_partitions_ahead('main_jobevent', 7)
+    for method in ('error', 'critical'):
+        assert getattr(logger, method).called == (method == level)
+
+
+def test_drop_partitions_clears_references():
+    cutoff = datetime.datetime(2018, 6, 6, tzinfo=utc)
+    partitions = [
+        ('main_jobevent_legacy', None, datetime.datetime(2018, 6, 4, tzinfo=utc)),
+        ('main_jobevent_20180604', datetime.datetime(2018, 6, 4, tzinfo=utc), datetime.datetime(2018, 6, 11, tzinfo=utc)),
+    ]
+    references = [
+        ('main_jobevent_hosts', 'jobevent_id', models.CASCADE),
+        ('main_jobevent', 'parent_id', models.SET_NULL),
+    ]
+    with mock.patch('awx.main.utils.partitions.get_partitions', return_value=partitions), \
+            mock.patch('awx.main.utils.partitions.transaction'), \
+            mock.patch('awx.main.utils.partitions.connection') as connection:
+        assert drop_partitions('main_jobevent', cutoff, references=references) == ['main_jobevent_legacy']
+    cursor = connection.cursor.return_value.__enter__.return_value
+    assert [call[0][0] for call in cursor.execute.call_args_list] == [
+        'DELETE FROM main_jobevent_hosts WHERE jobevent_id IN (SELECT id FROM main_jobevent_legacy)',
+        'UPDATE main_jobevent SET parent_id = NULL WHERE parent_id IN (SELECT id FROM main_jobevent_legacy)',
+        'DROP TABLE main_jobevent_legacy',
+    ]
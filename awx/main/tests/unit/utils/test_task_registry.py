@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+# python
+import os
+
+import mock
+import pytest
+
+# Django
+from django.conf import settings
+
+# AWX
+from awx.main.utils import task_registry
+
+
+@pytest.fixture
+def registry(tmpdir):
+    with mock.patch.object(settings, 'AWX_PROOT_BASE_PATH', tmpdir.strpath), \
+            mock.patch.object(settings, 'CLUSTER_HOST_ID', 'node1'), \
+            mock.patch.object(task_registry.Instance.objects, 'filter') as instances:
+        yield instances
+
+
+def test_publish_running_tasks(registry):
+    task_registry.register_task('task-1')
+    task_registry.register_task('task-2')
+    task_registry.unregister_task('task-2')
+    task_registry.unregister_task('never-registered')
+    assert task_registry.publish_running_tasks() == ['task-1']
+    registry.assert_called_once_with(hostname='node1')
+    update = registry.return_value.update.call_args[1]
+    assert update['running_tasks'] == ['task-1']
+    assert update['running_tasks_published'] is not None
+
+
+def test_publish_drops_dead_workers(registry):
+    task_registry.register_task('task-1')
+    path = os.path.join(settings.AWX_PROOT_BASE_PATH, 'awx_running_tasks', 'node1', 'task-1')
+    with mock.patch('awx.main.utils.task_registry._pid_alive', return_value=False):
+        assert task_registry.publish_running_tasks() == []
+    assert not os.path.exists(path)
+
+
+def test_publish_nothing_registered(registry):
+    assert task_registry.publish_running_tasks() == []
+    assert registry.return_value.update.call_args[1]['running_tasks'] == []
@@ -2,15 +2,20 @@
 # All Rights Reserved.
 
 # Python
+import json
+import logging
 import re
 import os
+import tempfile
 from itertools import islice
 
 # Django
-from django.utils.encoding import smart_str
+from django.utils.encoding import smart_str, smart_text
 
 
-__all__ = ['skip_directory', 'could_be_playbook', 'could_be_inventory']
+__all__ = ['skip_directory', 'could_be_playbook', 'could_be_inventory', 'ProjectFileCatalog']
+
+logger = logging.getLogger('awx.main.utils.ansible')
 
 
 valid_playbook_re = re.compile(r'^\s*?-?\s*?(?:hosts|include|import_playbook):\s*?.*?$')
@@ -84,3 +89,112 @@ def could_be_inventory(project_path, dir_path, filename):
     except IOError:
         return None
     return inventory_rel_path
+
+
+class ProjectFileCatalog(object):
+    '''
+    Finds the playbooks and inventories in a project directory.
+
+    Deciding whether a file is a playbook or an inventory means opening and
+    reading it, so each file's classification is saved in a sidecar JSON file
+    at `catalog_path` along with its size, mtime and mode.  Later scans still
+    walk the directory tree, but only re-read files that changed since.
+    '''
+
+    VERSION = 1
+    MAX_INVENTORY_LISTING = 50
+
+    def __init__(self, project_path, catalog_path=None):
+        self.project_path = project_path
+        self.catalog_path = catalog_path
+        self.entries = {}
+        self.changed = False
+        self._load()
+
+    def _load(self):
+        if not self.catalog_path:
+            return
+        try:
+            with open(self.catalog_path, 'r') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return
+        if data.get('version') == self.VERSION and data.get('project_path') == self.project_path:
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        if not self.catalog_path or not self.changed:
+            return
+        tmp_path = None
+        try:
+            # a temporary file of its own, since other processes may be
+            # saving the same catalog at the same time
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.catalog_path),
+                                            prefix=os.path.basename(self.catalog_path) + '.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'version': self.VERSION,
+                    'project_path': self.project_path,
+                    'entries': self.entries,
+                }, f)
+            os.rename(tmp_path, self.catalog_path)
+            self.changed = False
+        except (IOError, OSError):
+            logger.debug('Could not save project file catalog {}'.format(self.catalog_path), exc_info=True)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _files(self):
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(smart_str(self.project_path)):
+            if skip_directory(dirpath):
+                continue
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                key = smart_text(os.path.relpath(path, smart_str(self.project_path)))
+                seen.add(key)
+                signature = [st.st_size, st.st_mtime, st.st_mode]
+                entry = self.entries.get(key)
+                if entry is None or entry['signature'] != signature:
+                    entry = self.entries[key] = {'signature': signature}
+                    self.changed = True
+                yield dirpath, filename, entry
+        else:
+            # only a complete walk tells us which files were removed
+            for key in set(self.entries) - seen:
+                del self.entries[key]
+                self.changed = True
+
+    def _classify(self, entry, kind, test, dirpath, filename):
+        if kind not in entry:
+            result = test(self.project_path, dirpath, filename)
+            entry[kind] = smart_text(result) if result is not None else None
+            self.changed = True
+        return entry[kind]
+
+    @property
+    def playbooks(self):
+        results = []
+        for dirpath, filename, entry in self._files():
+            playbook = self._classify(entry, 'playbook', could_be_playbook, dirpath, filename)
+            if playbook is not None:
+                results.append(playbook)
+        self.save()
+        return sorted(results, key=lambda x: smart_str(x).lower())
+
+    @property
+    def inventories(self):
+        results = []
+        # Cap the number of results, because it could include lots
+        for dirpath, filename, entry in self._files():
+            inv_path = self._classify(entry, 'inventory', could_be_inventory, dirpath, filename)
+            if inv_path is not None:
+                results.append(inv_path)
+                if len(results) > self.MAX_INVENTORY_LISTING:
+                    break
+        self.save()
+        return sorted(results, key=lambda x: smart_str(x).lower())
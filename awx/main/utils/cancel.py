@@ -0,0 +1,197 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import errno
+import logging
+import os
+import select
+import threading
+import time
+
+# Django
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('awx.main.utils.cancel')
+
+__all__ = ['CANCEL_CHANNEL', 'notify_cancel', 'CancelListener', 'CancelWatcher']
+
+CANCEL_CHANNEL = 'awx_job_cancel'
+
+# how often (in seconds) the listener shows it is alive, and how long
+# watchers wait to hear from it before polling instead
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = HEARTBEAT_INTERVAL * 3
+
+# cancellations of jobs that did not run on this node are forgotten after
+# this long (in seconds)
+MARKER_TTL = 60 * 60 * 24
+
+
+def notify_cancel(pk):
+    '''
+    Tell whichever node is running the unified job `pk` that it has been
+    canceled.  Postgres only delivers the notification once the current
+    transaction commits, so listeners never see a cancel_flag that hasn't been
+    saved yet.
+    '''
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CANCEL_CHANNEL, str(pk)])
+
+
+def cancel_notify_dir():
+    return settings.AWX_CANCEL_NOTIFY_DIR
+
+
+class CancelListener(object):
+    '''
+    LISTENs for `notify_cancel` messages on one database connection per node
+    (it is started in the main process of the celery worker), and passes them
+    on to the jobs running on the node: a canceled job gets a file named
+    after its pk in `path`, which its CancelWatcher looks for.
+
+    While listening, the mtime of `path` is touched every few seconds so that
+    watchers can tell when nobody is passing notifications on, and poll the
+    database instead.  The listener reconnects if its connection is lost.
+    '''
+
+    def __init__(self, path=None, reconnect_interval=5):
+        self.path = path or cancel_notify_dir()
+        self.reconnect_interval = reconnect_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._last_prune = 0
+
+    def start(self):
+        if connection.vendor != 'postgresql':
+            return self
+        try:
+            os.makedirs(self.path, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                logger.exception('Could not create %s, jobs will poll for cancellation.', self.path)
+                return self
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def dispatch(self, payload):
+        try:
+            pk = int(payload)
+        except (TypeError, ValueError):
+            logger.warning('Ignoring cancel notification with payload %r, not a job id.', payload)
+            return
+        with open(os.path.join(self.path, str(pk)), 'a'):
+            pass
+
+    def heartbeat(self):
+        os.utime(self.path, None)
+        if time.time() - self._last_prune > HEARTBEAT_INTERVAL * 60:
+            self._last_prune = time.time()
+            for name in os.listdir(self.path):
+                marker = os.path.join(self.path, name)
+                try:
+                    if time.time() - os.stat(marker).st_mtime > MARKER_TTL:
+                        os.remove(marker)
+                except OSError:
+                    pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception('Stopped listening for cancel notifications, reconnecting.')
+            finally:
+                self._close()
+            self._stop.wait(self.reconnect_interval)
+
+    def _listen(self):
+        self._conn = connection.get_new_connection(connection.get_connection_params())
+        self._conn.autocommit = True
+        with self._conn.cursor() as cursor:
+            cursor.execute('LISTEN {}'.format(CANCEL_CHANNEL))
+        last_heartbeat = 0
+        while not self._stop.is_set():
+            if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                self.heartbeat()
+                last_heartbeat = time.time()
+            if select.select([self._conn], [], [], 1) == ([], [], []):
+                continue
+            self._conn.poll()
+            while self._conn.notifies:
+                self.dispatch(self._conn.notifies.pop(0).payload)
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+class CancelWatcher(object):
+    '''
+    Callable suitable for use as the `cancelled_callback` of `run_pexpect`.
+
+    While the node's CancelListener is passing `notify_cancel` messages on,
+    checking for cancellation is a check for the job's file in its directory
+    instead of a query.  `poll` (a callable returning the job's cancel_flag)
+    is still consulted every `poll_interval` seconds as a fallback in case a
+    notification is missed, and on every call while the listener is not
+    running.
+    '''
+
+    def __init__(self, pk, poll, poll_interval=30, path=None):
+        self.path = path or cancel_notify_dir()
+        self.marker = os.path.join(self.path, str(pk))
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.canceled = threading.Event()
+        self._last_poll = time.time()
+
+    @property
+    def listening(self):
+        try:
+            return time.time() - os.stat(self.path).st_mtime < HEARTBEAT_TIMEOUT
+        except OSError:
+            return False
+
+    def start(self):
+        return self
+
+    def stop(self):
+        try:
+            os.remove(self.marker)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __call__(self):
+        if self.canceled.is_set():
+            return True
+        listening = self.listening
+        if listening and os.path.exists(self.marker):
+            self.canceled.set()
+        elif not listening or time.time() - self._last_poll >= self.poll_interval:
+            self._last_poll = time.time()
+            if self.poll():
+                self.canceled.set()
+        return self.canceled.is_set()
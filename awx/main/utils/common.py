@@ -14,6 +14,7 @@ import sys
 import urllib
 import urlparse
 import threading
+import time
 import contextlib
 import tempfile
 import six
@@ -45,14 +46,16 @@ logger = logging.getLogger('awx.main.utils')
 __all__ = ['get_object_or_400', 'get_object_or_403', 'camelcase_to_underscore', 'memoize', 'memoize_delete',
            'get_ansible_version', 'get_ssh_version', 'get_licenser', 'get_awx_version', 'update_scm_url',
            'get_type_for_model', 'get_model_for_type', 'copy_model_by_class', 'region_sorting',
-           'copy_m2m_relationships', 'prefetch_page_capabilities', 'to_python_boolean',
+           'copy_m2m_relationships', 'bulk_create_m2m', 'prefetch_page_capabilities', 'to_python_boolean',
            'ignore_inventory_computed_fields', 'ignore_inventory_group_removal',
            '_inventory_updates', 'get_pk_from_dict', 'getattrd', 'NoDefaultProvided',
            'get_current_apps', 'set_current_apps', 'OutputEventFilter', 'OutputVerboseFilter',
            'extract_ansible_vars', 'get_search_fields', 'get_system_task_capacity', 'get_cpu_capacity', 'get_mem_capacity',
+           'get_observed_load', 'get_adaptive_capacity',
            'wrap_args_with_proot', 'build_proot_temp_dir', 'check_proot_installed', 'model_to_dict',
            'model_instance_diff', 'timestamp_apiformat', 'parse_yaml_or_json', 'RequireDebugTrueOrTest',
-           'has_model_field_prefetched', 'set_environ', 'IllegalArgumentError', 'get_custom_venv_choices']
+           'has_model_field_prefetched', 'set_environ', 'IllegalArgumentError', 'get_custom_venv_choices',
+           'PhaseTimer']
 
 
 def get_object_or_400(klass, *args, **kwargs):
@@ -503,6 +506,27 @@ def copy_m2m_relationships(obj1, obj2, fields, kwargs=None):
                 dest_field.add(*list(src_field_value.all().values_list('id', flat=True)))
 
 
+def bulk_create_m2m(field, related):
+    '''
+    Given a ManyToManyField and (saved object, related objects or ids) pairs,
+    relate each object to its related objects with one insert into the
+    field's through table; like `add` on every object, without a query per
+    object (or the m2m_changed signals).
+    '''
+    through = field.remote_field.through
+    source = '%s_id' % field.m2m_field_name()
+    target = '%s_id' % field.m2m_reverse_field_name()
+    rows = []
+    for obj, related_objs in related:
+        related_pks = set()
+        for related_obj in related_objs:
+            related_pk = getattr(related_obj, 'pk', related_obj)
+            if related_pk not in related_pks:
+                related_pks.add(related_pk)
+                rows.append(through(**{source: obj.pk, target: related_pk}))
+    through.objects.bulk_create(rows)
+
+
 def get_type_for_model(model):
     '''
     Return type name for a given model class.
@@ -725,6 +749,57 @@ def get_system_task_capacity(scale=Decimal(1.0), cpu_capacity=None, mem_capacity
     return min(mem_cap, cpu_cap) + ((max(mem_cap, cpu_cap) - min(mem_cap, cpu_cap)) * scale)
 
 
+def get_observed_load():
+    '''
+    Measure how loaded this system actually is right now
+    '''
+    vm = psutil.virtual_memory()
+    return {
+        'cpu': psutil.cpu_count(),
+        'load_average': round(os.getloadavg()[0], 2),
+        'mem_total': vm.total,
+        'mem_available': vm.available,
+    }
+
+
+def get_adaptive_capacity(load, consumed, current=None, scale=Decimal(1.0)):
+    '''
+    Estimate the system's capacity from observed `load` (see
+    get_observed_load) rather than from its size alone: the capacity
+    `consumed` by the jobs running here, plus whatever CPU and memory
+    headroom they have left, measured in the same units as
+    get_system_task_capacity.
+
+    The result is kept between AWX_ADAPTIVE_CAPACITY_FLOOR and
+    AWX_ADAPTIVE_CAPACITY_CEILING times the static capacity, and `current`
+    is kept unless the estimate moved by more than
+    AWX_ADAPTIVE_CAPACITY_HYSTERESIS of the static capacity, so that the
+    scheduler isn't chasing noise from one heartbeat to the next.
+    '''
+    from django.conf import settings
+    static = get_system_task_capacity(scale)
+    _, cpu_cap = get_cpu_capacity()
+    _, mem_cap = get_mem_capacity()
+
+    cpu_headroom = 1.0
+    if load.get('cpu'):
+        cpu_headroom = max(0.0, 1.0 - float(load['load_average']) / load['cpu'])
+    mem_headroom = 1.0
+    usable_mem = load.get('mem_total', 0) - 2048 * 1024 * 1024
+    if usable_mem > 0:
+        mem_headroom = max(0.0, min(1.0, float(load['mem_available']) / usable_mem))
+
+    observed = get_system_task_capacity(scale,
+                                        cpu_capacity=int(consumed + cpu_cap * cpu_headroom),
+                                        mem_capacity=int(consumed + mem_cap * mem_headroom))
+    floor = static * Decimal(settings.AWX_ADAPTIVE_CAPACITY_FLOOR)
+    ceiling = static * Decimal(settings.AWX_ADAPTIVE_CAPACITY_CEILING)
+    observed = int(max(floor, min(ceiling, Decimal(observed))))
+    if current is not None and abs(observed - current) <= static * Decimal(settings.AWX_ADAPTIVE_CAPACITY_HYSTERESIS):
+        return current
+    return observed
+
+
 _inventory_updates = threading.local()
 
 
@@ -934,6 +1009,30 @@ def get_custom_venv_choices():
         return []
 
 
+class PhaseTimer(object):
+    '''
+    Records the number of seconds spent in each named phase of a process;
+    each phase ends when `lap` is called with its name:
+
+        timer = PhaseTimer()
+        build_args()
+        timer.lap('build_args')
+        timer.timing  # {'build_args': 0.012}
+    '''
+
+    def __init__(self, timing=None):
+        self.timing = dict(timing or {})
+        self.last_lap = time.time()
+
+    def lap(self, name):
+        now = time.time()
+        self.record(name, now - self.last_lap)
+        self.last_lap = now
+
+    def record(self, name, seconds):
+        self.timing[name] = round(self.timing.get(name, 0) + seconds, 3)
+
+
 class OutputEventFilter(object):
     '''
     File-like object that looks for encoded job events in stdout data.
@@ -944,6 +1043,7 @@ class OutputEventFilter(object):
     def __init__(self, event_callback):
         self._event_callback = event_callback
         self._event_ct = 0
+        self.first_event_at = None
         self._counter = 1
         self._start_line = 0
         self._buffer = StringIO()
@@ -1012,7 +1112,7 @@ class OutputEventFilter(object):
             self._start_line += n_lines
             if self._event_callback:
                 self._event_callback(event_data)
-                self._event_ct += 1
+                self._count_event()
 
         if next_event_data.get('uuid', None):
             self._current_event_data = next_event_data
@@ -1020,12 +1120,40 @@ class OutputEventFilter(object):
             self._current_event_data = None
 
 
+    def _count_event(self):
+        if self.first_event_at is None:
+            self.first_event_at = time.time()
+        self._event_ct += 1
+
+
 class OutputVerboseFilter(OutputEventFilter):
     '''
     File-like object that dispatches stdout data.
     Does not search for encoded job event data.
     Use for unified job types that do not encode job event data.
+
+    By default every line of stdout is dispatched as its own verbose event.
+    When `max_lines` is greater than one, consecutive complete lines are
+    coalesced into a single event until `max_lines` lines or `max_bytes`
+    bytes are pending, or the oldest pending line is `max_delay` seconds old.
     '''
+
+    def __init__(self, event_callback, max_lines=1, max_bytes=0, max_delay=0):
+        super(OutputVerboseFilter, self).__init__(event_callback)
+        self._max_lines = max(max_lines, 1)
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay
+        self._pending_lines = []
+        self._pending_bytes = 0
+        self._pending_since = None
+
+    def flush(self):
+        # pexpect flushes after every write; this is also where coalesced
+        # lines are emitted once they have been pending for too long
+        if self._pending_lines and self._max_delay and \
+                time.time() - self._pending_since >= self._max_delay:
+            self._emit_pending()
+
     def write(self, data):
         self._buffer.write(data)
 
@@ -1039,12 +1167,58 @@ class OutputVerboseFilter(OutputEventFilter):
                 remainder = lines.pop()
             # emit all complete lines
             for line in lines:
-                self._emit_event(line)
+                self._emit_line(line)
             self._buffer = StringIO()
             # put final partial line back on buffer
             if remainder:
                 self._buffer.write(remainder)
 
+    def close(self):
+        self._emit_pending()
+        super(OutputVerboseFilter, self).close()
+
+    def _emit_line(self, line):
+        if self._max_lines == 1:
+            self._emit_event(line)
+            return
+        if not line.endswith('\r\n'):
+            # the stdout API only restores \r\n line endings inside of an
+            # event, so anything else is dispatched on its own
+            self._emit_pending()
+            self._emit_event(line)
+            return
+        if not self._pending_lines:
+            self._pending_since = time.time()
+        self._pending_lines.append(line)
+        self._pending_bytes += len(line)
+        if len(self._pending_lines) >= self._max_lines or (
+            self._max_bytes and self._pending_bytes >= self._max_bytes
+        ):
+            self._emit_pending()
+
+    def _emit_pending(self):
+        if self._pending_lines:
+            self._dispatch(''.join(self._pending_lines))
+            self._pending_lines = []
+            self._pending_bytes = 0
+            self._pending_since = None
+
+    def _emit_event(self, buffered_stdout, next_event_data=None):
+        for stdout_chunk in buffered_stdout.splitlines(True):
+            self._dispatch(stdout_chunk)
+
+    def _dispatch(self, stdout_chunk):
+        event_data = dict(event='verbose', counter=self._counter)
+        self._counter += 1
+        event_data['stdout'] = stdout_chunk[:-2] if len(stdout_chunk) > 2 else ""
+        n_lines = stdout_chunk.count('\n')
+        event_data['start_line'] = self._start_line
+        event_data['end_line'] = self._start_line + n_lines
+        self._start_line += n_lines
+        if self._event_callback:
+            self._event_callback(event_data)
+            self._count_event()
+
 
 def is_ansible_variable(key):
     return key.startswith('ansible_')
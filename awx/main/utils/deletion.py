@@ -0,0 +1,160 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import datetime
+import logging
+import time
+from multiprocessing.pool import ThreadPool
+
+# Django
+from django.db import connection, models, transaction
+from django.db.models import Min
+from django.db.models.deletion import ProtectedError, get_candidate_relations_to_delete
+
+
+__all__ = ['bulk_delete', 'ChunkedDeletion']
+
+logger = logging.getLogger('awx.main.utils.deletion')
+
+
+def bulk_delete(model, pks):
+    '''
+    Delete the rows of `model` with the given primary keys, and what deleting
+    them cascades to, with one statement per table rather than by collecting
+    the objects with the ORM.  Rows of parent models are deleted too; rows of
+    subclasses of `model` are not, so `model` should be the concrete model of
+    the rows.  No delete signals are sent.
+
+    Returns the number of rows of `model` deleted.
+    '''
+    pks = list(pks)
+    if not pks:
+        return 0
+    return _delete_rows(model, model._base_manager.filter(pk__in=pks), pks, [])
+
+
+def _delete_rows(model, queryset, pks, path, from_child=False):
+    using = queryset.db
+    path = path + [model]
+    for related in get_candidate_relations_to_delete(model._meta):
+        field = related.field
+        # the rows of a parent model being deleted all belong to the child
+        # they are being deleted for
+        if from_child and field.remote_field.parent_link:
+            continue
+        on_delete = field.remote_field.on_delete
+        if on_delete is models.DO_NOTHING:
+            continue
+        related_model = related.related_model
+        related_rows = related_model._base_manager.using(using).filter(
+            **{'%s__in' % field.name: queryset.order_by().values('pk')}
+        )
+        if on_delete is models.CASCADE:
+            if related_model in path:
+                raise ValueError('Cannot bulk delete {}: it cascades to itself through {}'.format(
+                    model._meta.label, related_model._meta.label))
+            related_pks = None
+            if related_model._meta.parents:
+                related_pks = list(related_rows.values_list('pk', flat=True))
+            _delete_rows(related_model, related_rows, related_pks, path)
+        elif on_delete is models.SET_NULL:
+            if related_model is model:
+                related_rows = related_rows.exclude(pk__in=queryset.order_by().values('pk'))
+            related_rows.update(**{field.name: None})
+        elif on_delete is models.PROTECT:
+            if related_rows.exists():
+                raise ProtectedError('Cannot delete some {} rows because they are referenced by {} rows'.format(
+                    model._meta.label, related_model._meta.label), related_rows)
+        else:
+            raise ValueError('Cannot bulk delete {}: {}.{} is not CASCADE, SET_NULL, PROTECT or DO_NOTHING'.format(
+                model._meta.label, related_model._meta.label, field.name))
+
+    count = queryset._raw_delete(using)
+
+    for parent in model._meta.parents:
+        _delete_rows(parent, parent._base_manager.using(using).filter(pk__in=pks), pks, path, from_child=True)
+    return count
+
+
+class ChunkedDeletion(object):
+    '''
+    Delete the rows of a queryset whose `time_field` is before `cutoff`, a
+    chunk (of the oldest rows) at a time, each in its own transaction.
+
+    With more than one worker, the time range is split into ranges that are
+    deleted from in parallel, each by a thread with its own database
+    connection.  `rows_per_second` limits how fast the workers delete
+    altogether.  `delete` is called with the model and primary keys of each
+    chunk, and deletes them (and returns how many).
+    '''
+
+    def __init__(self, queryset, time_field, cutoff, chunk_size=1000, workers=1, rows_per_second=None,
+                 delete=bulk_delete):
+        self.queryset = queryset.filter(**{'%s__lt' % time_field: cutoff})
+        self.time_field = time_field
+        self.cutoff = cutoff
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.rows_per_second = rows_per_second
+        self.delete = delete
+
+    def count(self):
+        return self.queryset.count()
+
+    def ranges(self):
+        oldest = self.queryset.aggregate(oldest=Min(self.time_field))['oldest']
+        if oldest is None:
+            return []
+        n = self.workers * 4 if self.workers > 1 else 1
+        step = (self.cutoff - oldest) // n + datetime.timedelta(microseconds=1)
+        return [(oldest + step * i, min(oldest + step * (i + 1), self.cutoff)) for i in range(n)]
+
+    def delete_range(self, time_range):
+        start, end = time_range
+        deleted = 0
+        rows = self.queryset.filter(**{'%s__lt' % self.time_field: end}).order_by(self.time_field)
+        rows_per_second = self.rows_per_second and float(self.rows_per_second) / self.workers
+        while True:
+            chunk_start = time.time()
+            chunk = list(rows.filter(**{'%s__gte' % self.time_field: start}).values_list(
+                'pk', self.time_field)[:self.chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                count = self.delete(self.queryset.model, [pk for pk, timestamp in chunk])
+            deleted += count
+            if not count:
+                break
+            # rows deleted in this chunk are gone, so the next one starts at
+            # the last timestamp to include the rows that share it
+            start = chunk[-1][1]
+            logger.debug('Deleted %d %s rows up to %s', count, self.queryset.model._meta.verbose_name, start)
+            if rows_per_second:
+                time.sleep(max(len(chunk) / rows_per_second - (time.time() - chunk_start), 0))
+        return deleted
+
+    def delete_range_in_thread(self, time_range):
+        # each thread has its own database connection
+        try:
+            return self.delete_range(time_range)
+        finally:
+            connection.close()
+
+    def run(self):
+        '''
+        Delete the rows, returning how many were deleted and how long it
+        took.
+        '''
+        start = time.time()
+        ranges = self.ranges()
+        if self.workers > 1 and len(ranges) > 1:
+            pool = ThreadPool(self.workers)
+            try:
+                deleted = sum(pool.map(self.delete_range_in_thread, ranges))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            deleted = sum(self.delete_range(time_range) for time_range in ranges)
+        return deleted, time.time() - start
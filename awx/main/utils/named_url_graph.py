@@ -1,10 +1,17 @@
 # Python
+import hashlib
+import threading
+import uuid
 import six
-from collections import deque
+from collections import deque, OrderedDict
 # Django
-from django.db import models
+from django.core.cache import cache
+from django.db import connection, models
+from django.db.models.signals import post_save, post_delete
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+# AWX
+from awx import __version__
 
 
 NAMED_URL_RES_DILIMITER = "++"
@@ -20,6 +27,9 @@ NAME_EXCEPTIONS = {
     "custom_inventory_scripts": "inventory_scripts"
 }
 
+NAMED_URL_GRAPH_KEY = 'awx_named_url_graph_{}'
+NAMED_URL_GENERATION_KEY = 'awx_named_url_generation'
+
 
 class GraphNode(object):
 
@@ -65,6 +75,18 @@ class GraphNode(object):
                 stack.append(to_append)
         return NAMED_URL_RES_DILIMITER.join(named_url_components)
 
+    @property
+    def named_url_fields(self):
+        '''
+        Names of the fields whose values make up this node's named urls.
+        '''
+        if not hasattr(self, '_named_url_fields'):
+            self._named_url_fields = set(self.fields)
+            for fk_name, _ in self.adj_list:
+                self._named_url_fields.add(fk_name)
+                self._named_url_fields.add(self.model._meta.get_field(fk_name).attname)
+        return self._named_url_fields
+
     @property
     def named_url_repr(self):
         ret = {}
@@ -171,6 +193,101 @@ class GraphNode(object):
             settings.NAMED_URL_MAPPINGS.pop(self.model_url_name)
 
 
+class NamedURLCache(object):
+    '''
+    A least-recently-used map of (model, named url) to the primary key it
+    resolves to, holding at most NAMED_URL_CACHE_SIZE of them.  An entry is
+    only good for the named url generation it was added in, since it may be
+    stale after any named url changes (see `bump_named_url_generation`).
+    '''
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, model, named_url, generation):
+        key = (model, named_url)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or entry[0] != generation:
+                return None
+            self.entries[key] = entry
+            return entry[1]
+
+    def set(self, model, named_url, generation, pk):
+        key = (model, named_url)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (generation, pk)
+            while len(self.entries) > settings.NAMED_URL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+named_url_cache = NamedURLCache()
+
+
+def get_named_url_generation():
+    generation = cache.get(NAMED_URL_GENERATION_KEY)
+    if generation is None:
+        cache.add(NAMED_URL_GENERATION_KEY, uuid.uuid4().hex)
+        generation = cache.get(NAMED_URL_GENERATION_KEY)
+    return generation
+
+
+def reset_named_url_generation():
+    '''
+    Starts a new named url generation on this node.
+    '''
+    cache.set(NAMED_URL_GENERATION_KEY, uuid.uuid4().hex)
+
+
+def _commit_named_url_generation():
+    from awx.main.tasks import handle_named_url_changes
+    reset_named_url_generation()
+    handle_named_url_changes.delay()
+
+
+def bump_named_url_generation():
+    '''
+    Invalidates the named url caches of all processes on all nodes.  The
+    generation lives in each node's cache; it is bumped here right away, so
+    the rest of this transaction resolves named urls afresh.  On commit it
+    is bumped again, and the `handle_named_url_changes` task is broadcast to
+    bump it on every other node, so that lookups cached from the old data
+    in the meantime are not used anywhere.
+    '''
+    reset_named_url_generation()
+    if not any(func is _commit_named_url_generation for sids, func in connection.run_on_commit):
+        connection.on_commit(_commit_named_url_generation)
+
+
+def invalidate_named_urls(sender, instance, created=False, update_fields=None, **kwargs):
+    # a new object can only take a name no cached named url resolves to
+    if created:
+        return
+    node = settings.NAMED_URL_GRAPH.get(sender)
+    if update_fields and node is not None and not node.named_url_fields.intersection(update_fields):
+        return
+    bump_named_url_generation()
+
+
+def connect_named_url_signals(graph):
+    '''
+    Saving or deleting an object of a model with named urls may change what
+    they resolve to.  Objects of one model appear in the named urls of
+    others (e.g. an organization name in inventory named urls), so any such
+    change invalidates all cached named urls.
+    '''
+    for model in graph:
+        dispatch_uid = 'named_url_{}'.format(model._meta.label)
+        post_save.connect(invalidate_named_urls, sender=model, dispatch_uid=dispatch_uid)
+        post_delete.connect(invalidate_named_urls, sender=model, dispatch_uid=dispatch_uid)
+
+
 def _get_all_unique_togethers(model):
     queue = deque()
     queue.append(model)
@@ -289,10 +406,7 @@ def _generate_single_graph(configuration, dead_ends):
     return graph
 
 
-def generate_graph(models):
-    settings.NAMED_URL_FORMATS = {}
-    settings.NAMED_URL_GRAPH_NODES = {}
-    settings.NAMED_URL_MAPPINGS = {}
+def _generate_largest_graph(models):
     candidate_nodes = {}
     dead_ends = set()
     for model in models:
@@ -312,6 +426,25 @@ def generate_graph(models):
             largest_graph = candidate_graph
         if len(largest_graph) == len(candidate_nodes):
             break
-    settings.NAMED_URL_GRAPH = largest_graph
+    return largest_graph
+
+
+def _graph_cache_key(models):
+    unique_togethers = sorted((model._meta.label, _get_all_unique_togethers(model)) for model in models)
+    return NAMED_URL_GRAPH_KEY.format(hashlib.sha1(repr((__version__, unique_togethers))).hexdigest())
+
+
+def generate_graph(models):
+    settings.NAMED_URL_FORMATS = {}
+    settings.NAMED_URL_GRAPH_NODES = {}
+    settings.NAMED_URL_MAPPINGS = {}
+    # searching for the largest graph is slow; each process of a node loads
+    # the graph the first one generated
+    key = _graph_cache_key(models)
+    graph = cache.get(key)
+    if graph is None:
+        graph = _generate_largest_graph(models)
+        cache.set(key, graph, None)
+    settings.NAMED_URL_GRAPH = graph
     for node in settings.NAMED_URL_GRAPH.values():
         node.add_bindings()
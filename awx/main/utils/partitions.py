@@ -0,0 +1,231 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import datetime
+import logging
+import re
+
+from dateutil import parser as dateutil_parser
+
+# Django
+from django.db import connection, models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils.timezone import now, utc
+
+# AWX
+from awx.main.utils.common import memoize, memoize_delete
+
+
+__all__ = ['is_partitioned', 'get_partitions', 'partition_table', 'create_partitions', 'drop_partitions',
+           'check_partitions_ahead', 'foreign_key_references', 'partition_start', 'parse_partition_bound']
+
+logger = logging.getLogger('awx.main.utils.partitions')
+
+# a Monday, so that week long partitions start on Mondays
+PARTITION_EPOCH = datetime.date(1970, 1, 5)
+
+LEGACY_SUFFIX = '_legacy'
+
+PARTITION_BOUND_RE = re.compile(r"^FOR VALUES FROM \((.+)\) TO \((.+)\)$")
+INDEX_DEF_RE = re.compile(r'^CREATE (UNIQUE )?INDEX \S+ ON \S+ ')
+
+
+def partition_start(day, days):
+    '''
+    The first day of the `days` long partition `day` is in.
+    '''
+    return PARTITION_EPOCH + datetime.timedelta(days=(day - PARTITION_EPOCH).days // days * days)
+
+
+def partition_bound(day):
+    return datetime.datetime.combine(day, datetime.time()).replace(tzinfo=utc)
+
+
+def parse_partition_bound(bound):
+    '''
+    The (start, end) of a range partition by time, from its bound
+    expression; the start of a partition from MINVALUE is None.
+    '''
+    match = PARTITION_BOUND_RE.match(bound)
+    if match is None:
+        raise ValueError('Not a range partition bound: {}'.format(bound))
+
+    def parse(value):
+        if value == 'MINVALUE':
+            return None
+        return dateutil_parser.parse(value.strip("'"))
+    return parse(match.group(1)), parse(match.group(2))
+
+
+def partitioning_supported():
+    return connection.vendor == 'postgresql' and connection.pg_version >= 100000
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table])
+    return cursor.fetchone() is not None
+
+
+@memoize(ttl=300, track_function=True)
+def is_partitioned(table):
+    '''
+    Whether `table` is partitioned; cached for a few minutes, for routing
+    queries.
+    '''
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        return _is_partitioned(cursor, table)
+
+
+def get_partitions(table):
+    '''
+    The partitions of `table` as (name, start, end), oldest first.
+    '''
+    if not partitioning_supported():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+              FROM pg_inherits AS i
+                   INNER JOIN pg_class AS c ON (c.oid = i.inhrelid)
+             WHERE i.inhparent = to_regclass(%s)
+        ''', [table])
+        partitions = [(name,) + parse_partition_bound(bound) for name, bound in cursor.fetchall()]
+    return sorted(partitions, key=lambda partition: partition[2])
+
+
+def copy_indexes(cursor, source, target):
+    # partitions (in PostgreSQL 10) have their own indexes
+    cursor.execute('SELECT indexdef FROM pg_indexes WHERE tablename = %s ORDER BY indexname', [source])
+    for i, (indexdef,) in enumerate(cursor.fetchall()):
+        cursor.execute(INDEX_DEF_RE.sub(
+            lambda match: 'CREATE {}INDEX {}_{} ON {} '.format(match.group(1) or '', target, i, target),
+            indexdef
+        ))
+
+
+def partition_table(table, days, ahead):
+    '''
+    Turn `table` into a table partitioned by `created` into partitions
+    `days` long, with partitions for the next `ahead` days.
+
+    The rows already in the table are not copied: the table becomes the
+    partition of everything created before the first new partition, which
+    starts a few days from now (inserts go on while its rows are checked to
+    be older than that).  Foreign keys to the table are dropped, since they
+    cannot refer to a partitioned table.
+    '''
+    if not partitioning_supported():
+        raise RuntimeError('Partitioning requires PostgreSQL 10 or later.')
+    legacy = table + LEGACY_SUFFIX
+    boundary = partition_bound(partition_start((now() + datetime.timedelta(days=2)).date(), days) +
+                               datetime.timedelta(days=days))
+    with connection.cursor() as cursor:
+        if _is_partitioned(cursor, table):
+            return False
+        cursor.execute('ALTER TABLE {0} ADD CONSTRAINT {0}_created_check CHECK (created < %s) NOT VALID'.format(table),
+                       [boundary])
+        cursor.execute('ALTER TABLE {0} VALIDATE CONSTRAINT {0}_created_check'.format(table))
+        with transaction.atomic():
+            cursor.execute('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE'.format(table))
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT conrelid::regclass, conname FROM pg_constraint
+                 WHERE confrelid = to_regclass(%s) AND contype = 'f'
+            ''', [table])
+            for referencing_table, constraint in cursor.fetchall():
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(referencing_table, constraint))
+            cursor.execute('ALTER TABLE {} RENAME TO {}'.format(table, legacy))
+            cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE (created)'.format(
+                table, legacy))
+            # the sequence outlives the partition whose rows it numbered
+            if sequence:
+                cursor.execute('ALTER SEQUENCE {} OWNED BY NONE'.format(sequence))
+            cursor.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (MINVALUE) TO (%s)'.format(
+                table, legacy), [boundary])
+    memoize_delete('is_partitioned')
+    create_partitions(table, days, ahead)
+    return True
+
+
+def check_partitions_ahead(table, ahead):
+    '''
+    Log loudly if the partitions of `table` end more than a day short of
+    `ahead` days from now: PostgreSQL 10 has no default partition, so rows
+    created past the last partition cannot be inserted at all.  Partitions
+    are created hourly, so this means they have not been for a day.
+    '''
+    partitions = get_partitions(table)
+    if not partitions:
+        return
+    end = partitions[-1][2]
+    if end <= now():
+        logger.critical('%s has no partition for rows created since %s, inserts into it are failing.', table, end)
+    elif end < now() + datetime.timedelta(days=ahead - 1):
+        logger.error('The partitions of %s only reach %s, short of the %d days ahead they are kept; '
+                     'inserts into it will fail from then if its partitions are not created.', table, end, ahead)
+
+
+def create_partitions(table, days, ahead):
+    '''
+    Create the partitions of `table` for the next `ahead` days that do not
+    exist yet, returning their names.
+    '''
+    partitions = get_partitions(table)
+    if not partitions:
+        return []
+    template, start = partitions[-1][0], partitions[-1][2]
+    until = now() + datetime.timedelta(days=ahead)
+    created = []
+    with connection.cursor() as cursor:
+        while start < until:
+            end = partition_bound(partition_start(start.date(), days) + datetime.timedelta(days=days))
+            name = '{}_{}'.format(table, start.strftime('%Y%m%d'))
+            with transaction.atomic():
+                cursor.execute('CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)'.format(name, table),
+                               [start, end])
+                copy_indexes(cursor, template, name)
+            logger.info('Created partition %s of %s', name, table)
+            created.append(name)
+            start = end
+    return created
+
+
+def foreign_key_references(model):
+    '''
+    The (table, column, on_delete) of the foreign keys to `model`, including
+    those of its many-to-many tables; partitioning its table drops them.
+    '''
+    return [
+        (related.related_model._meta.db_table, related.field.column, related.field.remote_field.on_delete)
+        for related in get_candidate_relations_to_delete(model._meta)
+    ]
+
+
+def drop_partitions(table, cutoff, dry_run=False, references=()):
+    '''
+    Drop the partitions of `table` holding only rows created before
+    `cutoff`, returning their names.
+
+    With no foreign keys left to enforce them, the rows referring to the
+    rows of a partition (see `foreign_key_references`) are deleted, or set
+    to NULL, first.
+    '''
+    dropped = [name for name, start, end in get_partitions(table) if end <= cutoff]
+    if not dry_run:
+        with connection.cursor() as cursor:
+            for name in dropped:
+                with transaction.atomic():
+                    for referencing_table, column, on_delete in references:
+                        if on_delete is models.CASCADE:
+                            cursor.execute('DELETE FROM {0} WHERE {1} IN (SELECT id FROM {2})'.format(
+                                referencing_table, column, name))
+                        elif on_delete is models.SET_NULL:
+                            cursor.execute('UPDATE {0} SET {1} = NULL WHERE {1} IN (SELECT id FROM {2})'.format(
+                                referencing_table, column, name))
+                    cursor.execute('DROP TABLE {}'.format(name))
+                logger.info('Dropped partition %s of %s', name, table)
+    return dropped
@@ -0,0 +1,111 @@
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import errno
+import logging
+import os
+from datetime import timedelta
+
+# Django
+from django.conf import settings
+from django.utils.timezone import now
+
+# AWX
+from awx.main.models import Instance
+
+logger = logging.getLogger('awx.main.utils.task_registry')
+
+__all__ = ['register_task', 'unregister_task', 'publish_running_tasks', 'get_running_tasks']
+
+# a node which hasn't recorded its running tasks for this long is treated
+# like a node that didn't answer a celery Inspect broadcast; see
+# Instance.is_lost
+REGISTRY_TIMEOUT = 120
+
+
+def _registry_dir():
+    return os.path.join(settings.AWX_PROOT_BASE_PATH, 'awx_running_tasks', settings.CLUSTER_HOST_ID)
+
+
+def register_task(task_id):
+    '''
+    Record that the celery task `task_id` is running in this process, on
+    this node.  One file per task means worker processes never have to
+    coordinate with each other; `publish_running_tasks` collects them.
+    '''
+    path = _registry_dir()
+    try:
+        os.makedirs(path, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    with open(os.path.join(path, task_id), 'w') as f:
+        f.write(str(os.getpid()))
+
+
+def unregister_task(task_id):
+    try:
+        os.remove(os.path.join(_registry_dir(), task_id))
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def publish_running_tasks():
+    '''
+    Record the ids of the celery tasks running on this node on its Instance,
+    with the time they were collected, so that the task manager can find
+    orphaned jobs without a cluster-wide celery Inspect broadcast.
+    Registrations left behind by worker processes which died without
+    unregistering are removed.
+    '''
+    published = now()
+    path = _registry_dir()
+    task_ids = []
+    try:
+        filenames = os.listdir(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        filenames = []
+    for task_id in filenames:
+        try:
+            with open(os.path.join(path, task_id)) as f:
+                pid = int(f.read())
+        except (IOError, ValueError):
+            # unregistered since the listing, or still being written
+            continue
+        if _pid_alive(pid):
+            task_ids.append(task_id)
+        else:
+            logger.warning('Removing registration of task %s, its worker process %s is gone.', task_id, pid)
+            unregister_task(task_id)
+    # an update, so that the heartbeat time (modified) is left alone
+    Instance.objects.filter(hostname=settings.CLUSTER_HOST_ID).update(
+        running_tasks=task_ids, running_tasks_published=published
+    )
+    return task_ids
+
+
+def get_running_tasks(hostnames):
+    '''
+    Return {hostname: (published, set of task ids)} for each of `hostnames`
+    which has recorded its running tasks recently.  `published` is when they
+    were collected; tasks started after it are not listed.
+    '''
+    cutoff = now() - timedelta(seconds=REGISTRY_TIMEOUT)
+    return dict(
+        (hostname, (published, set(task_ids)))
+        for hostname, published, task_ids in Instance.objects.filter(
+            hostname__in=list(hostnames), running_tasks_published__gte=cutoff
+        ).values_list('hostname', 'running_tasks_published', 'running_tasks')
+    )
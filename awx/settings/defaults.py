@@ -139,10 +139,17 @@ LOCALE_PATHS = (
 # Graph of resources that can have named-url
 NAMED_URL_GRAPH = {}
 
+# Number of named urls each process remembers the primary key of
+NAMED_URL_CACHE_SIZE = 10000
+
 # Maximum number of the same job that can be waiting to run when launching from scheduler
 # Note: This setting may be overridden by database settings.
 SCHEDULE_MAX_JOBS = 10
 
+# Maximum number of launches accepted by one request to the job template
+# bulk launch endpoint
+BULK_JOB_LAUNCH_MAX = 1000
+
 SITE_ID = 1
 
 # Make this unique, and don't share it with anybody.
@@ -195,6 +202,15 @@ JOB_EVENT_WORKERS = 4
 # The maximum size of the job event worker queue before requests are blocked
 JOB_EVENT_MAX_QUEUE_SIZE = 10000
 
+# Consecutive lines of stdout from unified jobs that don't run playbooks
+# (inventory updates, system jobs) are coalesced into a single verbose event
+# of up to this many lines or bytes, and are held back no longer than
+# VERBOSE_EVENT_MAX_DELAY seconds; set VERBOSE_EVENT_MAX_LINES to 1 to emit
+# one event per line
+VERBOSE_EVENT_MAX_LINES = 100
+VERBOSE_EVENT_MAX_BYTES = 16384
+VERBOSE_EVENT_MAX_DELAY = 1
+
 # Disallow sending session cookies over insecure connections
 SESSION_COOKIE_SECURE = True
 
@@ -247,6 +263,7 @@ TEMPLATES = [
 ]
 
 MIDDLEWARE_CLASSES = (  # NOQA
+    'awx.main.middleware.SettingsSnapshotMiddleware',
     'awx.main.middleware.MigrationRanCheckMiddleware',
     'awx.main.middleware.TimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -417,6 +434,43 @@ EMAIL_USE_TLS = False
 # The number of seconds to sleep between status checks for jobs running on isolated nodes
 AWX_ISOLATED_CHECK_INTERVAL = 30
 
+# Check on all of the jobs running on an isolated node with one playbook run,
+# instead of one `ansible-playbook` process per job
+AWX_ISOLATED_BATCH_CHECKS = True
+
+# Jobs on isolated nodes append their event data to one log file, rather than
+# writing a file per event
+AWX_ISOLATED_EVENT_LOG = True
+
+# Set each node's capacity from the load observed at every heartbeat (load
+# average, available memory and the capacity consumed by its running jobs),
+# instead of from its CPU count and total memory alone.  Adaptive capacity
+# stays between FLOOR and CEILING times the static capacity, and only changes
+# when it moves by more than HYSTERESIS times the static capacity.
+AWX_ADAPTIVE_CAPACITY = False
+AWX_ADAPTIVE_CAPACITY_FLOOR = 0.5
+AWX_ADAPTIVE_CAPACITY_CEILING = 2.0
+AWX_ADAPTIVE_CAPACITY_HYSTERESIS = 0.1
+
+# Every node publishes the celery tasks it is running with its heartbeat, and
+# the task manager compares jobs against that rather than asking every celery
+# worker with an Inspect broadcast
+AWX_RUNNING_TASK_REGISTRY = True
+
+# How the task manager picks the node to run a task on, within the instance
+# group that has capacity for it; the task is then sent to that node's own
+# queue.  'most_remaining' picks the node with the most remaining capacity,
+# 'best_fit' the node with the least remaining capacity that still fits the
+# task.  None leaves it to whichever node in the group picks the task up first.
+AWX_INSTANCE_PLACEMENT = 'most_remaining'
+
+# Running jobs are told about cancellation with a Postgres NOTIFY, which one
+# listener per node passes on to its jobs through files in
+# AWX_CANCEL_NOTIFY_DIR; as a fallback, the job's cancel_flag is also read
+# from the database this often (in seconds)
+AWX_CANCEL_POLL_INTERVAL = 30
+AWX_CANCEL_NOTIFY_DIR = '/tmp/awx_job_cancel'
+
 # The timeout (in seconds) for launching jobs on isolated nodes
 AWX_ISOLATED_LAUNCH_TIMEOUT = 600
 
@@ -516,10 +570,43 @@ CELERYBEAT_SCHEDULE = {
         'task': 'awx.main.tasks.awx_isolated_heartbeat',
         'schedule': timedelta(seconds=AWX_ISOLATED_PERIODIC_CHECK),
         'options': {'expires': AWX_ISOLATED_PERIODIC_CHECK * 2},
-    }
+    },
+    'role_ancestry_changes': {
+        'task': 'awx.main.tasks.apply_role_ancestry_changes',
+        'schedule': timedelta(seconds=60),
+        'options': {'expires': 50},
+    },
+    'dashboard_aggregates': {
+        'task': 'awx.main.tasks.update_dashboard_aggregates',
+        'schedule': timedelta(seconds=60),
+        'options': {'expires': 50},
+    },
+    'event_partitions': {
+        'task': 'awx.main.tasks.create_event_partitions',
+        'schedule': timedelta(hours=1),
+        'options': {'expires': 3000},
+    },
 }
 AWX_INCONSISTENT_TASK_INTERVAL = 60 * 3
 
+# The task manager only re-evaluates running workflow jobs whose node jobs
+# changed since its last pass, except that all of them are evaluated this
+# often (in seconds); 0 evaluates all of them on every pass
+AWX_WORKFLOW_FULL_EVALUATION_INTERVAL = 60 * 5
+
+# Seconds a user's dashboard and jobs graph are cached for.  Superusers and
+# system auditors are shown the numbers the dashboard_aggregates task counts
+# every minute, other users numbers counted from what they can see.
+DASHBOARD_CACHE_TIMEOUT = 30
+
+# Event tables partitioned by the partition_event_tables command (PostgreSQL
+# 10 or later) are split into partitions of EVENT_PARTITION_DAYS days (7 for
+# weeks starting on Mondays); the event_partitions task keeps partitions for
+# the next EVENT_PARTITION_DAYS_AHEAD days created.  cleanup_jobs drops the
+# partitions whose events have all expired.
+EVENT_PARTITION_DAYS = 1
+EVENT_PARTITION_DAYS_AHEAD = 7
+
 # Celery queues that will always be listened to by celery workers
 # Note: Broadcast queues have unique, auto-generated names, with the alias
 # property value of the original queue name.
@@ -646,9 +733,29 @@ CAPTURE_JOB_EVENT_HOSTS = False
 # Rebuild Host Smart Inventory memberships.
 AWX_REBUILD_SMART_MEMBERSHIP = False
 
+# Cache the ids of the objects each user can access, for filtering list
+# queries with; users with more than AWX_RBAC_ACCESSIBLE_ID_CACHE_MAX of
+# one kind are filtered by subquery instead.
+AWX_RBAC_ACCESSIBLE_ID_CACHE = True
+AWX_RBAC_ACCESSIBLE_ID_CACHE_MAX = 10000
+
+# Log role hierarchy changes for a background task to rebuild role ancestry
+# from, rather than rebuilding it in the request that made them; the user
+# who made them sees them right away.
+AWX_ROLE_ANCESTRY_ASYNC = False
+
 # By default, allow arbitrary Jinja templating in extra_vars defined on a Job Template
 ALLOW_JINJA_IN_EXTRA_VARS = 'template'
 
+# Read job output straight from the pty in large chunks, only looking for
+# password prompts at the end of partial lines, rather than through
+# pexpect's expect() on every read.
+PEXPECT_RAW_READS = True
+
+# Skip the project sync before a job when the node's checkout of the project
+# is already at the project's current SCM revision.
+PROJECT_SYNC_SKIP_CURRENT_REVISION = True
+
 # Enable bubblewrap support for running jobs (playbook runs only).
 # Note: This setting may be overridden by database settings.
 AWX_PROOT_ENABLED = True
@@ -947,6 +1054,12 @@ SCM_EXCLUDE_EMPTY_GROUPS = True
 ACTIVITY_STREAM_ENABLED = True
 ACTIVITY_STREAM_ENABLED_FOR_INVENTORY_SYNC = False
 
+# Hold the activity stream entries recorded in a transaction and write them in
+# bulk when it commits (or once ACTIVITY_STREAM_BATCH_SIZE of them are held),
+# rather than one at a time as they are recorded.
+ACTIVITY_STREAM_BATCH_WRITES = False
+ACTIVITY_STREAM_BATCH_SIZE = 1000
+
 # Internal API URL for use by inventory scripts and callback plugin.
 INTERNAL_API_URL = 'http://127.0.0.1:%s' % DEVSERVER_DEFAULT_PORT
 
@@ -6,6 +6,13 @@ from awx.sso.backends import TACACSPlusBackend
 from awx.sso.models import UserEnterpriseAuth
 
 
+@pytest.fixture(autouse=True)
+def expire_settings_snapshot():
+    # like a new request, each test sees the settings changed before it
+    from django.conf import settings
+    settings._awx_conf_settings.expire_snapshot()
+
+
 @pytest.fixture
 def tacacsplus_backend():
     return TACACSPlusBackend()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+'''
+Measure one round of status checks for many jobs running on the same
+isolated host, polling each job with its own `check_isolated.yml` run vs.
+sharing `check_isolated_batch.yml` runs through `IsolatedStatusPoller`.
+
+`ansible-playbook` is replaced by a local stand-in which starts a Python
+interpreter, sleeps for `--latency` seconds (the SSH round-trip) and prints
+the output of the batch playbook, so no isolated host is needed.
+'''
+import multiprocessing
+import os
+import resource
+import shutil
+import StringIO
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+import django # noqa
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+from django.conf import settings # noqa
+from awx.main.expect.isolated_manager import IsolatedManager, IsolatedStatusPoller # noqa
+
+
+STAND_IN = '''#!{python}
+import json, sys, time
+with open({calls!r}, 'a') as f:
+    f.write('x')
+time.sleep({latency})
+srcs = json.loads(sys.argv[sys.argv.index('-e') + 1]).get('srcs', [])
+results = [{{'item': src, 'rc': 0}} for src in srcs]
+print(json.dumps({{'plays': [{{'tasks': [
+    {{'task': {{'name': 'Determine if daemon processes are alive.'}},
+     'hosts': {{'isolated-host': {{'results': results}}}}}}
+]}}]}}))
+'''
+
+
+def check_one(mode, job_id, src):
+    if mode == 'batched':
+        IsolatedStatusPoller('isolated-host').poll(job_id, src)
+    else:
+        args = IsolatedManager._build_args('check_isolated.yml', 'isolated-host,', {'src': src})
+        IsolatedManager.run_pexpect(
+            args, IsolatedManager.awx_playbook_path(), IsolatedManager._base_management_env(),
+            StringIO.StringIO(), idle_timeout=60, job_timeout=60, pexpect_timeout=5
+        )
+
+
+def benchmark(mode, jobs, work_dir):
+    calls = os.path.join(work_dir, 'calls')
+    open(calls, 'w').close()
+    srcs = []
+    for i in range(jobs):
+        srcs.append(tempfile.mkdtemp(dir=work_dir))
+    start = time.time()
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # every job is checked from its own worker process, as they are in celery
+    procs = [
+        multiprocessing.Process(target=check_one, args=(mode, i, src))
+        for i, src in enumerate(srcs)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (usage.ru_utime + usage.ru_stime) - (usage_before.ru_utime + usage_before.ru_stime)
+    with open(calls) as f:
+        playbook_runs = len(f.read())
+    return time.time() - start, cpu, playbook_runs
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--jobs', type='int', default=200)
+    parser.add_option('--latency', type='float', default=0.5)
+    options, _ = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='awx_isolated_check_benchmark')
+    try:
+        bin_dir = os.path.join(work_dir, 'bin')
+        os.mkdir(bin_dir)
+        stand_in = os.path.join(bin_dir, 'ansible-playbook')
+        with open(stand_in, 'w') as f:
+            f.write(STAND_IN.format(python=sys.executable, calls=os.path.join(work_dir, 'calls'),
+                                    latency=options.latency))
+        os.chmod(stand_in, 0o700)
+        os.environ['PATH'] = os.pathsep.join([bin_dir, os.environ.get('PATH', '')])
+        settings.AWX_PROOT_BASE_PATH = work_dir
+
+        for mode in ('per-job', 'batched'):
+            elapsed, cpu, playbook_runs = benchmark(mode, options.jobs, work_dir)
+            print('{:8}  {} jobs  {:.2f}s wall  {:.2f}s cpu  {} ansible-playbook runs'.format(
+                mode, options.jobs, elapsed, cpu, playbook_runs
+            ))
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+'''
+Measure how quickly `run_pexpect` drains a process that writes a lot of
+output, with and without `raw_reads`.
+'''
+import cStringIO
+import os
+import sys
+import time
+from optparse import OptionParser
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+from awx.main.expect import run # noqa
+
+
+DUMMY_PROCESS = (
+    'import sys\n'
+    'line = "ok: [host-%%06d] => {\\"changed\\": false, \\"msg\\": \\"%s\\"}\\n"\n'
+    'for i in xrange(%d):\n'
+    '    sys.stdout.write(line %% i)\n'
+)
+
+
+def benchmark(lines, width, raw_reads, with_prompts):
+    expect_passwords = {}
+    if with_prompts:
+        # the prompts registered for every playbook run
+        for p in ('Enter passphrase for .*:', 'Bad passphrase, try again for .*:',
+                  'sudo password.*:', 'SUDO password.*:', 'su password.*:',
+                  'SU password.*:', 'BECOME password.*:', 'SSH password:',
+                  'Password:', 'Vault password:'):
+            expect_passwords[run.re.compile(p + r'\s*?$', run.re.M)] = ''
+    stdout = cStringIO.StringIO()
+    start = time.time()
+    status, rc = run.run_pexpect(
+        ['python', '-c', DUMMY_PROCESS % ('x' * width, lines)],
+        os.getcwd(), dict(os.environ), stdout,
+        cancelled_callback=lambda: False,
+        expect_passwords=expect_passwords,
+        raw_reads=raw_reads,
+    )
+    elapsed = time.time() - start
+    assert status == 'successful', (status, rc)
+    return elapsed, len(stdout.getvalue())
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--lines', type='int', default=200000)
+    parser.add_option('--width', type='int', default=100)
+    parser.add_option('--no-prompts', action='store_true', default=False)
+    options, _ = parser.parse_args()
+
+    for raw_reads in (False, True):
+        elapsed, size = benchmark(options.lines, options.width, raw_reads, not options.no_prompts)
+        print('raw_reads={!s:5}  {:.2f}s  {:.1f} MB/s  {:.0f} lines/s'.format(
+            raw_reads, elapsed, size / elapsed / 1024 / 1024, options.lines / elapsed
+        ))
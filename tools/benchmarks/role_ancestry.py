@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+'''
+Measure role ancestry maintenance on a synthetic role graph (1M roles by
+default, a tree in which every role has `--fanout` children):
+
+  * `awx-manage rebuild_role_ancestry` rebuilding the whole table
+  * giving a role near the top of the tree a new parent, which gives every
+    role under it a new ancestor, the way a request does it:
+      - "sync": rebuilding the ancestry in the request
+      - "async": logging the change in the request (AWX_ROLE_ANCESTRY_ASYNC),
+        then applying it as the background task does
+
+Needs a development PostgreSQL database.  The roles it creates are deleted
+afterwards; the role edits are rolled back.
+'''
+import os
+import sys
+import time
+from optparse import OptionParser
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+import django # noqa
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+from django.core.management import call_command # noqa
+from django.db import connection, transaction # noqa
+from django.test.utils import override_settings # noqa
+
+from awx.main.models.rbac import Role, RoleAncestorEntry # noqa
+
+ROLE_FIELD = 'benchmark_role'
+SQL_PARAMS = {
+    'ancestors_table': RoleAncestorEntry._meta.db_table,
+    'parents_table': Role.parents.through._meta.db_table,
+    'roles_table': Role._meta.db_table,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_graph(roles, fanout):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO %(roles_table)s (role_field, implicit_parents)
+            SELECT %%s, '[]' FROM generate_series(1, %%s)
+        ''' % SQL_PARAMS, [ROLE_FIELD, roles])
+        cursor.execute('SELECT MIN(id) FROM %(roles_table)s WHERE role_field = %%s' % SQL_PARAMS, [ROLE_FIELD])
+        root = cursor.fetchone()[0]
+        cursor.execute('''
+            INSERT INTO %(parents_table)s (from_role_id, to_role_id)
+            SELECT id, %%s + (id - %%s - 1) / %%s
+              FROM %(roles_table)s
+             WHERE role_field = %%s AND id > %%s
+        ''' % SQL_PARAMS, [root, root, fanout, ROLE_FIELD, root])
+    return root
+
+
+def delete_graph():
+    with transaction.atomic(), connection.cursor() as cursor:
+        ids = 'SELECT id FROM %(roles_table)s WHERE role_field = %%s' % SQL_PARAMS
+        cursor.execute(('DELETE FROM %(ancestors_table)s WHERE descendent_id IN (' + ids + ')') % SQL_PARAMS, [ROLE_FIELD])
+        cursor.execute(('DELETE FROM %(parents_table)s WHERE from_role_id IN (' + ids + ') OR to_role_id IN (' + ids + ')') % SQL_PARAMS,
+                       [ROLE_FIELD, ROLE_FIELD])
+        cursor.execute('DELETE FROM %(roles_table)s WHERE role_field = %%s' % SQL_PARAMS, [ROLE_FIELD])
+
+
+def add_parent(mode, subtree_root):
+    timings = {}
+    try:
+        with transaction.atomic(), override_settings(AWX_ROLE_ANCESTRY_ASYNC=(mode == 'async')):
+            parent = Role.objects.create(role_field=ROLE_FIELD)
+            start = time.time()
+            Role.objects.get(pk=subtree_root).parents.add(parent)
+            timings['request'] = time.time() - start
+            if mode == 'async':
+                start = time.time()
+                Role.apply_role_ancestry_changes()
+                timings['background'] = time.time() - start
+            raise Rollback()
+    except Rollback:
+        pass
+    return timings
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--roles', type='int', default=1000000)
+    parser.add_option('--fanout', type='int', default=10)
+    parser.add_option('--workers', type='int', default=4)
+    options, _ = parser.parse_args()
+
+    start = time.time()
+    root = create_graph(options.roles, options.fanout)
+    print('created {} roles in {:.2f}s'.format(options.roles, time.time() - start))
+    try:
+        start = time.time()
+        call_command('rebuild_role_ancestry', workers=options.workers)
+        print('full rebuild ({} workers)  {:.2f}s'.format(options.workers, time.time() - start))
+
+        # the first child of the root has about 1/fanout of the roles under it
+        for mode in ('sync', 'async'):
+            timings = add_parent(mode, root + 1)
+            print('{:6} new parent  {:8.2f}ms in the request  {:8.2f}ms in the background'.format(
+                mode, timings['request'] * 1000, timings.get('background', 0) * 1000))
+    finally:
+        delete_graph()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+'''
+Measure one `awx_periodic_scheduler` tick's worth of schedule bookkeeping
+for many due schedules: recomputing each one with `Schedule.save` (as every
+tick used to, twice for due schedules) vs. `Schedule.objects.advance_next_run`.
+
+Needs a development database; the schedules it creates are rolled back.
+'''
+import datetime
+import os
+import sys
+import time
+from optparse import OptionParser
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+import django # noqa
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+from django.db import connection, transaction # noqa
+from django.test.utils import CaptureQueriesContext # noqa
+from django.utils.timezone import now # noqa
+
+from awx.main.models import JobTemplate, Schedule # noqa
+from awx.main.models import schedules as schedules_module # noqa
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_schedules(count, templates):
+    '''
+    Daily and hourly schedules, some with a COUNT, spread over `templates`
+    templates, all of them due now
+    '''
+    jts = [JobTemplate.objects.create(name='schedule-benchmark-{}'.format(i)) for i in range(templates)]
+    start = now() - datetime.timedelta(days=1)
+    rrules = [
+        'DTSTART:{:%Y%m%dT%H%M%S}Z RRULE:FREQ=DAILY;INTERVAL=1',
+        'DTSTART:{:%Y%m%dT%H%M%S}Z RRULE:FREQ=HOURLY;INTERVAL=4',
+        'DTSTART:{:%Y%m%dT%H%M%S}Z RRULE:FREQ=DAILY;INTERVAL=1;COUNT=365',
+    ]
+    schedules = []
+    for i in range(count):
+        dtstart = start + datetime.timedelta(seconds=i % 3600)
+        schedules.append(Schedule(
+            name='schedule-benchmark-{}'.format(i),
+            rrule=rrules[i % len(rrules)].format(dtstart),
+            unified_job_template=jts[i % templates],
+            next_run=now() - datetime.timedelta(seconds=1),
+        ))
+    Schedule.objects.bulk_create(schedules)
+    return Schedule.objects.filter(name__startswith='schedule-benchmark-')
+
+
+def benchmark(mode, count, templates):
+    try:
+        with transaction.atomic():
+            schedules = create_schedules(count, templates)
+            schedules_module._compiled_rrules.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                if mode == 'save':
+                    for schedule in schedules.select_related('unified_job_template'):
+                        schedule.save()
+                        schedule.save()
+                else:
+                    Schedule.objects.advance_next_run(schedules.select_related('unified_job_template'))
+                elapsed = time.time() - start
+            raise Rollback()
+    except Rollback:
+        pass
+    return elapsed, len(queries)
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--schedules', type='int', default=2000)
+    parser.add_option('--templates', type='int', default=100)
+    options, _ = parser.parse_args()
+
+    for mode in ('save', 'advance'):
+        elapsed, queries = benchmark(mode, options.schedules, options.templates)
+        print('{:8} {} schedules  {:.2f}s  {} queries'.format(mode, options.schedules, elapsed, queries))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+'''
+Measure the database-backed settings reads of a settings-heavy request: one
+that serializes a page of job events (`JobEventSerializer` reads
+EVENT_STDOUT_MAX_BYTES_DISPLAY for each) and logs along the way (the
+external logger's filter and handler read the LOG_AGGREGATOR_* settings for
+each record).
+
+"before" reads every setting the way `SettingsWrapper.__getattr__` used to,
+with a cache get and field validation each time; "after" reads them through
+the per-process snapshot, starting each request as the middleware does.
+
+Needs a development database, which the settings are preloaded from.
+'''
+import os
+import sys
+import time
+from optparse import OptionParser
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+import django # noqa
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+from django.conf import settings # noqa
+
+from awx.main.utils.handlers import PARAM_NAMES # noqa
+
+LOG_RECORD_SETTINGS = ['LOG_AGGREGATOR_ENABLED', 'LOG_AGGREGATOR_LEVEL', 'LOG_AGGREGATOR_LOGGERS'] + sorted(PARAM_NAMES.values())
+
+
+class CountingCache(object):
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.cache, name)
+        if name in ('get', 'get_many', 'set', 'set_many', 'add', 'delete', 'delete_many'):
+            def counted(*args, **kwargs):
+                self.round_trips += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+def request_reads(events, log_records):
+    return ['EVENT_STDOUT_MAX_BYTES_DISPLAY'] * events + LOG_RECORD_SETTINGS * log_records
+
+
+def benchmark(mode, reads, rounds):
+    wrapper = settings._awx_conf_settings
+    counting_cache = CountingCache(wrapper.cache.cache)
+    wrapper.cache.__dict__['cache'] = counting_cache
+    try:
+        start = time.time()
+        for i in range(rounds):
+            if mode == 'before':
+                for name in reads:
+                    wrapper._get_local(name)
+            else:
+                wrapper.expire_snapshot()
+                for name in reads:
+                    getattr(settings, name)
+        elapsed = time.time() - start
+    finally:
+        wrapper.cache.__dict__['cache'] = counting_cache.cache
+    return elapsed / rounds, float(counting_cache.round_trips) / rounds
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--events', type='int', default=100)
+    parser.add_option('--log-records', type='int', default=20)
+    parser.add_option('--rounds', type='int', default=50)
+    options, _ = parser.parse_args()
+
+    reads = request_reads(options.events, options.log_records)
+    # load the settings into the cache, and the snapshot, first
+    for name in set(reads):
+        getattr(settings, name)
+    print('{} settings reads per request'.format(len(reads)))
+    for mode in ('before', 'after'):
+        per_request, round_trips = benchmark(mode, reads, options.rounds)
+        print('{:6}  {:8.2f}ms per request  {:6.1f} cache round-trips'.format(mode, per_request * 1000, round_trips))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# Copyright (c) 2018 Ansible by Red Hat
+# All Rights Reserved
+'''
+Measure what the task manager does with a running workflow each cycle:
+build its `WorkflowDAG`, find the nodes to run next and check whether it
+is done, for generated workflows of 10, 100 and 1000 nodes.
+
+Nodes are stand-ins carrying the same attributes `_init_graph` loads in
+its single node query, so no database is needed and the numbers are the
+graph work alone.
+'''
+import os
+import sys
+import time
+from optparse import OptionParser
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+import django # noqa
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+from awx.main.scheduler.dag_workflow import WorkflowDAG # noqa
+
+
+class Node(object):
+
+    def __init__(self, pk, job_status):
+        self.pk = pk
+        self.unified_job_template_id = 1
+        self.job_id = pk + 1 if job_status else None
+        self.job_status = job_status
+
+    def __eq__(self, other):
+        return self.pk == other.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+def generate_workflow(size):
+    '''
+    A binary tree: every node has a success child and a failure child.  The
+    first half of the nodes have finished successfully, so the walk reaches
+    deep into the tree.
+    '''
+    nodes = [Node(i, 'successful' if i < size // 2 else None) for i in range(size)]
+    edges = []
+    for i in range(size):
+        for child, label in ((2 * i + 1, 'success_nodes'), (2 * i + 2, 'failure_nodes')):
+            if child < size:
+                edges.append((nodes[i], nodes[child], label))
+    return nodes, edges
+
+
+def benchmark(size, rounds):
+    nodes, edges = generate_workflow(size)
+    start = time.time()
+    for i in range(rounds):
+        dag = WorkflowDAG()
+        for node in nodes:
+            dag.add_node(node)
+        dag.add_edges(edges)
+        dag.bfs_nodes_to_run()
+        dag.is_workflow_done()
+    return (time.time() - start) / rounds
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--sizes', default='10,100,1000')
+    parser.add_option('--rounds', type='int', default=20)
+    options, _ = parser.parse_args()
+
+    for size in [int(s) for s in options.sizes.split(',')]:
+        print('{:5} nodes  {:9.2f}ms per scheduler cycle'.format(size, benchmark(size, options.rounds) * 1000))